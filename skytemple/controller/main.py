@@ -18,6 +18,7 @@
 import os
 import ssl
 import sys
+import time
 import traceback
 import urllib
 import webbrowser
@@ -39,6 +40,7 @@ from skytemple.core.error_handler import display_error
 from skytemple.core.events.events import EVT_VIEW_SWITCH, EVT_PROJECT_OPEN
 from skytemple.core.events.manager import EventManager
 from skytemple.core.module_controller import AbstractController
+from skytemple.core.module_tree import ModuleTree
 from skytemple.core.rom_project import RomProject
 from skytemple.core.settings import SkyTempleSettingsStore
 from skytemple.core.ssb_debugger.manager import DebuggerManager
@@ -105,8 +107,11 @@ class MainController:
         self._current_view_module = None
         self._current_view_controller_class = None
         self._current_view_item_id = None
+        # Owners of the pinned opened files of the views loaded (see RomProject.set_opened_files_view_owner),
+        # the last one is the one of the current view.
+        self._view_pin_owners = []
         self._resize_timeout_id = None
-        self._loaded_map_bg_module = None
+        self._module_tree = ModuleTree(self._item_store)
         self._current_breadcrumbs = []
 
         self._load_position_and_size()
@@ -123,6 +128,8 @@ class MainController:
 
     def on_destroy(self, *args):
         logger.debug('Window destroyed. Ending task runner.')
+        if RomProject.get_current() is not None:
+            RomProject.get_current().close()
         AsyncTaskRunner.end()
         Gtk.main_quit()
         self._debugger_manager.destroy()
@@ -281,11 +288,11 @@ class MainController:
             # Tell the debugger
             self._debugger_manager.handle_project_change()
 
-            # Load item tree items
-            for module in sorted(project.get_modules(False), key=lambda m: m.sort_order()):
-                module.load_tree_items(self._item_store, root_node)
-                if module.__class__.__name__ == 'MapBgModule':
-                    self._loaded_map_bg_module = module
+            # Load item tree items. Modules that were not created yet only get a placeholder node, the
+            # module is created when the node is expanded or opened (see load_module_tree_items).
+            start = time.perf_counter()
+            self._module_tree.fill(project, root_node)
+            logger.debug(f'Filled the item tree in {(time.perf_counter() - start) * 1000:.1f}ms.')
             # TODO: Load settings from ROM for history, bookmarks, etc? - separate module?
 
             # Trigger event
@@ -329,6 +336,13 @@ class MainController:
         self._set_title(os.path.basename(rom.filename), False)
         recursive_down_item_store_mark_as_modified(self._item_store[self._item_store.get_iter_first()], False)
 
+    def on_file_save_progress(self, filename: str, done: int, total: int, duration: float):
+        """Update the saving dialog after a modified file was serialized."""
+        if self._loading_dialog is not None:
+            self.builder.get_object('file_opening_dialog_label').set_label(
+                f'Saving ROM "{os.path.basename(RomProject.get_current().filename)}"... ({done}/{total} files)'
+            )
+
     def on_file_saved_error(self, exc_info, exception):
         """Handle errors during file saving."""
         logger.error('Error on save open.', exc_info=exception)
@@ -342,6 +356,34 @@ class MainController:
             "Error saving the ROM"
         )
 
+    def on_main_item_list_test_expand_row(self, tree: TreeView, treeiter: Gtk.TreeIter, path: Gtk.TreePath):
+        """Create the module of a placeholder node before it is expanded."""
+        store_iter = self._main_item_filter.convert_iter_to_child_iter(treeiter)
+        name = self._module_tree.get_placeholder_name(store_iter)
+        if name is None:
+            return False
+        module_root = self.load_module_tree_items(name)
+        if module_root is not None:
+            tree.expand_row(self._main_item_filter.convert_child_path_to_path(
+                self._item_store.get_path(module_root)
+            ), False)
+        # The placeholder node was removed.
+        return True
+
+    def load_module_tree_items(self, name: str) -> Optional[Gtk.TreeIter]:
+        """
+        Replace the placeholder node of a module in the item tree with the nodes of the module, creating the
+        module if needed. Returns the first node of the module or None if the module has no placeholder (anymore).
+        If called from another thread, this is done in the main thread later instead.
+        """
+        if current_thread() != main_thread:
+            def idle():
+                self.load_module_tree_items(name)
+                return False
+            GLib.idle_add(idle)
+            return None
+        return self._module_tree.load_module(RomProject.get_current(), name)
+
     def on_main_item_list_button_press_event(self, tree: TreeView, event: Gdk.Event):
         """Handle click on item: Switch view"""
         assert current_thread() == main_thread
@@ -354,6 +396,16 @@ class MainController:
         return self.load_view(self._item_store, treeiter, self._main_item_list)
 
     def load_view(self, model: Gtk.TreeModel, treeiter: Gtk.TreeIter, tree: Gtk.TreeView, scroll_into_view=True):
+        store_iter = treeiter
+        if model == self._main_item_filter:
+            store_iter = self._main_item_filter.convert_iter_to_child_iter(treeiter)
+        placeholder_name = self._module_tree.get_placeholder_name(store_iter)
+        if placeholder_name is not None:
+            # Create the module and open its main view instead.
+            module_root = self.load_module_tree_items(placeholder_name)
+            if module_root is None:
+                return
+            model, treeiter = self._item_store, module_root
         logger.debug('View selected. Locking and showing Loader.')
         path = model.get_path(treeiter)
         self._lock_trees()
@@ -365,6 +417,10 @@ class MainController:
         self._current_view_module = selected_node[2]
         self._current_view_controller_class = selected_node[3]
         self._current_view_item_id = selected_node[4]
+        # Pin the files opened by the new view, the files of the old view stay pinned until it's destroyed.
+        view_pin_owner = object()
+        self._view_pin_owners.append(view_pin_owner)
+        RomProject.get_current().set_opened_files_view_owner(view_pin_owner)
         # Fully load the view and the controller
         AsyncTaskRunner.instance().run_task(load_controller(
             self._current_view_module, self._current_view_controller_class, self._current_view_item_id,
@@ -407,6 +463,7 @@ class MainController:
         self._editor_stack.add_named(view, 'es__loaded_view')
         view.show_all()
         self._editor_stack.set_visible_child(view)
+        self._unpin_old_view_files()
         logger.debug('Unlocking view trees.')
         self._unlock_trees()
         EventManager.instance().trigger(EVT_VIEW_SWITCH, module=module, controller=controller,
@@ -419,8 +476,16 @@ class MainController:
         tb: TextBuffer = self.builder.get_object('es_error_text_buffer')
         tb.set_text(''.join(traceback.format_exception(etype=type(ex), value=ex, tb=ex.__traceback__)))
         self._editor_stack.set_visible_child(self.builder.get_object('es_error'))
+        self._unpin_old_view_files()
         self._unlock_trees()
 
+    def _unpin_old_view_files(self):
+        """Release the pinned opened files of all views, except the current one."""
+        project = RomProject.get_current()
+        for owner in self._view_pin_owners[:-1]:
+            project.unpin_opened_files(owner)
+        self._view_pin_owners = self._view_pin_owners[-1:]
+
     def on_item_store_row_changed(self, model, path, iter):
         """Update the window title for the current selected tree model row if it changed"""
         if model is not None and iter is not None:
@@ -432,6 +497,10 @@ class MainController:
     def on_main_item_list_search_search_changed(self, search: Gtk.SearchEntry):
         """Filter the main item view using the search field"""
         self._search_text = search.get_text()
+        if self._search_text != "":
+            # The nodes of all modules are needed to search them.
+            for name in self._module_tree.get_placeholder_names():
+                self.load_module_tree_items(name)
         self._filter__refresh_results()
 
     def on_settings_show_assistant_clicked(self, *args):
@@ -446,7 +515,7 @@ class MainController:
         self.settings_controller.run()
 
     def on_intro_dialog_created_with_clicked(self, *args):
-        if RomProject.get_current() is None or self._loaded_map_bg_module is None:
+        if RomProject.get_current() is None or 'map_bg' not in RomProject.get_current().get_module_classes():
             md = Gtk.MessageDialog(MainController.window(),
                                    Gtk.DialogFlags.DESTROY_WITH_PARENT, Gtk.MessageType.ERROR,
                                    Gtk.ButtonsType.OK, "A project must be opened to use this.")
@@ -454,7 +523,8 @@ class MainController:
             md.run()
             md.destroy()
             return
-        self._loaded_map_bg_module.add_created_with_logo()
+        self.load_module_tree_items('map_bg')
+        RomProject.get_current().get_module('map_bg').add_created_with_logo()
 
 
     def on_settings_about_clicked(self, *args):
@@ -668,6 +738,8 @@ class MainController:
     def _init_window_after_rom_load(self, rom_name):
         """Set the titlebar and make buttons sensitive after a ROM load"""
         self._item_store.clear()
+        self._module_tree.clear()
+        self._view_pin_owners = []
         self.builder.get_object('save_button').set_sensitive(True)
         self.builder.get_object('save_as_button').set_sensitive(True)
         self.builder.get_object('main_item_list_search').set_sensitive(True)
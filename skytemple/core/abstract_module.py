@@ -16,7 +16,7 @@
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 
 from abc import ABC, abstractmethod
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 import pkg_resources
 from gi.repository import Gtk
@@ -50,6 +50,22 @@ class AbstractModule(ABC):
         Where to sort this module in the item tree, lower numbers mean higher.
         """
 
+    @classmethod
+    def tree_placeholder(cls) -> Optional[Tuple[str, str]]:
+        """
+        Icon name and title of the root node this module adds to the item tree. Until the module is created,
+        a placeholder node with this icon and title is shown instead. None if the module has no nodes in the tree.
+        """
+        return None
+
+    @classmethod
+    def handled_request_types(cls) -> List[str]:
+        """
+        The OpenRequest types this module can handle (see handle_request). Requests are only forwarded to
+        the modules that handle their type.
+        """
+        return []
+
     @abstractmethod
     def load_tree_items(self, item_store: TreeStore, root_node: Optional[TreeIter]):
         """Add the module nodes to the item tree"""
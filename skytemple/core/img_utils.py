@@ -16,7 +16,11 @@
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 
+import math
+from typing import Optional, Sequence, List
+
 import cairo
+from PIL import Image
 
 
 def pil_to_cairo_surface(im, format=cairo.FORMAT_ARGB32) -> cairo.Surface:
@@ -28,3 +32,44 @@ def pil_to_cairo_surface(im, format=cairo.FORMAT_ARGB32) -> cairo.Surface:
     arr = bytearray(im.tobytes('raw', 'BGRa'))
     surface = cairo.ImageSurface.create_for_data(arr, format, im.width, im.height)
     return surface
+
+
+def pil_to_cairo_atlas(images: Sequence[Image.Image], columns: Optional[int] = None,
+                       format=cairo.FORMAT_ARGB32) -> cairo.Surface:
+    """
+    Converts many images of the same size into one surface (an atlas). This is much faster than converting
+    each image on its own.
+    The image with index i is at x = (i % columns) * width, y = (i // columns) * height.
+    :param images: Pillow Images, all must have the same size
+    :param columns: Number of images per row. By default the atlas is roughly square.
+    :param format: Pixel format for output surface
+    """
+    assert len(images) > 0, "At least one image is required."
+    width, height = images[0].size
+    if columns is None:
+        columns = _atlas_columns(len(images))
+    rows = math.ceil(len(images) / columns)
+    atlas = Image.new('RGBA', (width * columns, height * rows), (0, 0, 0, 0))
+    for i, im in enumerate(images):
+        atlas.paste(im, ((i % columns) * width, (i // columns) * height))
+    return pil_to_cairo_surface(atlas, format)
+
+
+def pil_to_cairo_atlas_surfaces(images: Sequence[Image.Image], columns: Optional[int] = None,
+                                format=cairo.FORMAT_ARGB32) -> List[cairo.Surface]:
+    """
+    Same as pil_to_cairo_atlas, but returns a sub-surface of the atlas for each image instead.
+    These can be drawn just like separate surfaces, but they all share the memory of one atlas.
+    """
+    if columns is None:
+        columns = _atlas_columns(len(images))
+    atlas = pil_to_cairo_atlas(images, columns, format)
+    width, height = images[0].size
+    return [
+        atlas.create_for_rectangle((i % columns) * width, (i // columns) * height, width, height)
+        for i in range(0, len(images))
+    ]
+
+
+def _atlas_columns(number_images: int) -> int:
+    return math.ceil(math.sqrt(number_images))
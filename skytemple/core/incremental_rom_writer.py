@@ -0,0 +1,151 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import os
+import struct
+from typing import Set, Optional, Iterable, List
+
+from ndspy.rom import NintendoDSRom
+
+logger = logging.getLogger(__name__)
+# Offset of the FAT offset & length in the ROM header
+ROM_HEADER_FAT_OFFSET = 0x48
+# Offsets of everything in the ROM header that points to data in the ROM, that is not a file in the FAT:
+# ARM9, ARM7, FNT, FAT, ARM9 & ARM7 overlay tables, icon/banner, debug ROM, ROM size / RSA signature
+ROM_HEADER_REGION_OFFSETS = [0x20, 0x30, 0x40, 0x48, 0x50, 0x58, 0x68, 0x160, 0x80]
+# Another pointer to the RSA signature, written by ndspy and NSMBe
+RSA_SIGNATURE_OFFSET_POINTER = 0x1000
+
+
+class IncrementalRomWriter:
+    """
+    Writes a NintendoDSRom to disk. Tracks which files of the ROM changed since the ROM was last written
+    and if possible, only patches those files into the existing ROM file, instead of re-building it.
+    The ROM is fully re-built, if the file table needs to be laid out again.
+    """
+    def __init__(self, rom: NintendoDSRom, filename: Optional[str]):
+        self.rom = rom
+        # IDs of files in the ROM that changed since the ROM was last written to disk.
+        self._dirty_file_ids: Set[int] = set()
+        # Whether or not changes were made that require the ROM to be fully re-built on the next save.
+        self._needs_full_save = False
+        # The filename the ROM on disk was last read from or written to.
+        self._filename_on_disk = filename
+
+    def mark_file_dirty(self, file_id: int):
+        """Mark a file in the FAT (by ID) as changed."""
+        self._dirty_file_ids.add(file_id)
+
+    def mark_needs_full_save(self):
+        """Mark that something changed, that is not a file in the FAT or changed the file table."""
+        self._needs_full_save = True
+
+    @property
+    def dirty_file_ids(self) -> Set[int]:
+        return self._dirty_file_ids
+
+    @property
+    def needs_full_save(self) -> bool:
+        return self._needs_full_save
+
+    def save(self, filename: str):
+        """
+        Write all changes to the ROM file. If possible, only the files that changed since the last save are
+        patched into the existing ROM file.
+        """
+        if not self._try_save_incremental(filename, self._dirty_file_ids):
+            logger.debug(f"Fully re-building ROM {filename}.")
+            self.rom.saveToFile(filename)
+        self._filename_on_disk = filename
+        self._dirty_file_ids = set()
+        self._needs_full_save = False
+
+    def save_files(self, filename: str, file_ids: Iterable[int]) -> bool:
+        """
+        Only write the given files (by ID) to the ROM file. Other changes are written on the next save.
+        If that is not possible, all changes are written, like save does.
+        Returns whether only the given files were written.
+        """
+        file_ids = set(file_ids)
+        if self._try_save_incremental(filename, file_ids):
+            self._dirty_file_ids -= file_ids
+            return True
+        self.save(filename)
+        return False
+
+    def _try_save_incremental(self, filename: str, file_ids: Set[int]) -> bool:
+        """
+        Patch the given files into the ROM file on disk in place.
+        Returns False (without writing anything), if that is not possible because a file doesn't fit in its
+        old allocation anymore or the ROM needs to be fully re-built for other reasons.
+        """
+        if self._needs_full_save or self._filename_on_disk != filename or not os.path.exists(filename):
+            return False
+        with open(filename, 'r+b') as f:
+            header = f.read(RSA_SIGNATURE_OFFSET_POINTER + 4)
+            fat_offset, fat_length = struct.unpack_from('<II', header, ROM_HEADER_FAT_OFFSET)
+            f.seek(fat_offset)
+            fat_data = f.read(fat_length)
+            fat = [struct.unpack_from('<II', fat_data, i * 8) for i in range(fat_length // 8)]
+            if len(fat) != len(self.rom.files):
+                return False
+            region_starts = self._region_starts(header, fat)
+
+            # Check that everything fits first, so we never leave a half written ROM.
+            patches = []
+            for file_id in sorted(file_ids):
+                start, end = fat[file_id]
+                data = self.rom.files[file_id]
+                capacity = self._file_capacity(region_starts, start, end)
+                if len(data) > capacity:
+                    logger.debug(f"File {file_id} doesn't fit in its old allocation anymore.")
+                    return False
+                patches.append((file_id, start, end, data))
+
+            logger.debug(f"Patching {len(patches)} files in ROM {filename}.")
+            for file_id, start, end, data in patches:
+                f.seek(start)
+                f.write(data)
+                if end > start + len(data):
+                    f.write(b'\xff' * (end - start - len(data)))
+                f.seek(fat_offset + file_id * 8)
+                f.write(struct.pack('<II', start, start + len(data)))
+        return True
+
+    @staticmethod
+    def _region_starts(header: bytes, fat: List[tuple]) -> List[int]:
+        """Returns the sorted start offsets of all files and other data in the ROM."""
+        starts = [start for start, end in fat if end > start]
+        for offset in ROM_HEADER_REGION_OFFSETS:
+            starts.append(struct.unpack_from('<I', header, offset)[0])
+        if len(header) >= RSA_SIGNATURE_OFFSET_POINTER + 4:
+            starts.append(struct.unpack_from('<I', header, RSA_SIGNATURE_OFFSET_POINTER)[0])
+        return sorted(start for start in starts if start > 0)
+
+    @staticmethod
+    def _file_capacity(sorted_region_starts: List[int], start: int, end: int) -> int:
+        """
+        Returns how much space the file at start has available, before the next file or other data starts.
+        There is always something after the last file (the RSA signature or the end of the ROM, see header 0x80).
+        """
+        if end <= start:
+            # Empty files may share their offset with the next file.
+            return 0
+        for other_start in sorted_region_starts:
+            if other_start > start:
+                return other_start - start
+        return end - start
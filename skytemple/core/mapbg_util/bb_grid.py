@@ -0,0 +1,95 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import math
+from typing import Dict, Tuple, Set, Hashable, Any, List, Union
+
+Num = Union[int, float]
+BoundingBox = Tuple[Num, Num, Num, Num]
+DEFAULT_CELL_SIZE = 64
+
+
+class BoundingBoxGrid:
+    """
+    A uniform grid of bounding boxes, to quickly find all items at a point.
+    Every item is registered in all grid cells its bounding box overlaps, so a point lookup only has to
+    check the items of one cell.
+    """
+    def __init__(self, cell_size: int = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        # key -> (item, bounding box (x, y, w, h), priority, cells)
+        self._entries: Dict[Hashable, Tuple[Any, BoundingBox, Any, List[Tuple[int, int]]]] = {}
+        self._cells: Dict[Tuple[int, int], Set[Hashable]] = {}
+
+    def __contains__(self, key: Hashable):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def insert(self, key: Hashable, item: Any, bb: BoundingBox, priority: Any = 0):
+        """Inserts an item with its bounding box. If the key already exists, the item is replaced."""
+        if key in self._entries:
+            self.remove(key)
+        cells = self._cells_for(bb)
+        for cell in cells:
+            if cell not in self._cells:
+                self._cells[cell] = set()
+            self._cells[cell].add(key)
+        self._entries[key] = (item, bb, priority, cells)
+
+    def remove(self, key: Hashable):
+        """Removes an item. Does nothing if the key doesn't exist."""
+        if key not in self._entries:
+            return
+        _, __, ___, cells = self._entries[key]
+        for cell in cells:
+            self._cells[cell].discard(key)
+            if len(self._cells[cell]) < 1:
+                del self._cells[cell]
+        del self._entries[key]
+
+    def get(self, key: Hashable) -> Tuple[Any, BoundingBox, Any]:
+        """Returns the item, bounding box and priority for the key."""
+        item, bb, priority, _ = self._entries[key]
+        return item, bb, priority
+
+    def clear(self):
+        self._entries = {}
+        self._cells = {}
+
+    def at(self, x: Num, y: Num) -> List[Tuple[Any, Any]]:
+        """Returns all items (and their priorities) whose bounding box contains the point, in no particular order."""
+        result = []
+        for key in self._cells.get(self._cell_at(x, y), ()):
+            item, (bb_x, bb_y, bb_w, bb_h), priority, _ = self._entries[key]
+            if bb_x <= x < bb_x + bb_w and bb_y <= y < bb_y + bb_h:
+                result.append((item, priority))
+        return result
+
+    def _cell_at(self, x: Num, y: Num) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _cells_for(self, bb: BoundingBox) -> List[Tuple[int, int]]:
+        x, y, w, h = bb
+        if w <= 0 or h <= 0:
+            # Contains no points, it never needs to be found.
+            return []
+        start_x, start_y = self._cell_at(x, y)
+        # The right and bottom edges are exclusive.
+        end_x = math.ceil((x + w) / self.cell_size)
+        end_y = math.ceil((y + h) / self.cell_size)
+        return [(cx, cy) for cx in range(start_x, end_x) for cy in range(start_y, end_y)]
@@ -0,0 +1,90 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+from typing import Dict, Optional, List, TYPE_CHECKING
+
+from gi.repository.Gtk import TreeStore, TreeIter
+
+if TYPE_CHECKING:
+    from skytemple.core.rom_project import RomProject
+
+
+class ModuleTree:
+    """
+    Manages the nodes of the modules in the main item tree.
+    Modules that were not created yet only get a placeholder node (see AbstractModule.tree_placeholder).
+    The placeholder is replaced with the real nodes of the module, once the module is needed (see load_module).
+    """
+    def __init__(self, item_store: TreeStore):
+        self._item_store = item_store
+        # Placeholder nodes for modules that were not created yet, by module name.
+        self._placeholders: Dict[str, TreeIter] = {}
+
+    def clear(self):
+        self._placeholders = {}
+
+    def fill(self, project: 'RomProject', root_node: TreeIter):
+        """Add the nodes of all modules (or their placeholders) to the item tree, sorted by their sort order."""
+        for name, module_class in sorted(project.get_module_classes().items(), key=lambda m: m[1].sort_order()):
+            if project.is_module_loaded(name):
+                project.get_module(name).load_tree_items(self._item_store, root_node)
+                continue
+            placeholder = module_class.tree_placeholder()
+            if placeholder is not None:
+                icon, title = placeholder
+                self._placeholders[name] = self._item_store.append(root_node, [
+                    icon, title, None, None, name, False, title, True
+                ])
+                # Dummy child, so that the node can be expanded.
+                self._item_store.append(self._placeholders[name], [
+                    '', '', None, None, None, False, '', True
+                ])
+
+    def load_module(self, project: 'RomProject', name: str) -> Optional[TreeIter]:
+        """
+        Replace the placeholder node of a module with the nodes of the module, creating the module if needed.
+        Returns the first node of the module or None if the module has no placeholder (anymore).
+        """
+        if name not in self._placeholders:
+            return None
+        placeholder = self._placeholders.pop(name)
+        # Create the module first, modules created because of its dependencies replace their placeholders too.
+        try:
+            module = project.get_module(name)
+        except BaseException:
+            self._placeholders[name] = placeholder
+            raise
+        root_node = self._item_store.iter_parent(placeholder)
+        n_nodes_before = self._item_store.iter_n_children(root_node)
+        module.load_tree_items(self._item_store, root_node)
+        new_nodes = [
+            self._item_store.iter_nth_child(root_node, i)
+            for i in range(n_nodes_before, self._item_store.iter_n_children(root_node))
+        ]
+        for node in new_nodes:
+            self._item_store.move_before(node, placeholder)
+        self._item_store.remove(placeholder)
+        return new_nodes[0] if len(new_nodes) > 0 else None
+
+    def get_placeholder_name(self, treeiter: TreeIter) -> Optional[str]:
+        """Returns the module name, if the node of the item store is a module placeholder."""
+        row = self._item_store[treeiter]
+        if row[2] is None and isinstance(row[4], str) and row[4] in self._placeholders:
+            return row[4]
+        return None
+
+    def get_placeholder_names(self) -> List[str]:
+        return list(self._placeholders.keys())
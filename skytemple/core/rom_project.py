@@ -16,19 +16,31 @@
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 import logging
+import os
+import pickle
+import re
 import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
 from enum import Enum, auto
-from typing import Union, Iterator, TYPE_CHECKING, Optional, Dict, Callable, Type, Tuple
+from typing import Union, Iterator, TYPE_CHECKING, Optional, Dict, Callable, Type, Set, List
 
 from gi.repository import GLib, Gtk
 from ndspy.rom import NintendoDSRom
 
 from skytemple.core.abstract_module import AbstractModule
+from skytemple.core.incremental_rom_writer import IncrementalRomWriter
 from skytemple.core.modules import Modules
 from skytemple.core.open_request import OpenRequest
+from skytemple.core.save_worker import serialize_pickled_model
 from skytemple.core.model_context import ModelContext
+from skytemple.core.settings import SkyTempleSettingsStore
 from skytemple.core.sprite_provider import SpriteProvider
 from skytemple.core.string_provider import StringProvider
+from skytemple.core.thumbnail_cache import ThumbnailCache, DEFAULT_THUMBNAIL_CACHE_SIZE
+from skytemple.core.worker_pool import WorkerPool
 from skytemple_files.common.ppmdu_config.data import Pmd2Binary
 from skytemple_files.common.project_file_manager import ProjectFileManager
 from skytemple_files.common.task_runner import AsyncTaskRunner
@@ -40,6 +52,13 @@ from skytemple_files.container.sir0.sir0_serializable import Sir0Serializable
 from skytemple_files.patch.patches import Patcher
 
 logger = logging.getLogger(__name__)
+OVERLAY_FILENAME_PATTERN = re.compile(r'overlay_(\d+)\.bin', re.IGNORECASE)
+# If at least this many files are modified, they are serialized in parallel in worker processes.
+PARALLEL_SAVE_MIN_FILES = 4
+# Default limit for the size of the unmodified opened files kept in memory (size of the files in the ROM).
+DEFAULT_OPENED_FILES_CACHE_LIMIT = 32 * 1024 * 1024
+# Name of the directory in the shared config directory for the thumbnail cache
+THUMBNAIL_CACHE_DIR = 'thumbnail_cache'
 
 if TYPE_CHECKING:
     from skytemple.controller.main import MainController
@@ -101,7 +120,10 @@ class RomProject:
 
     @classmethod
     async def _open_impl(cls, filename, main_controller: Optional['MainController']):
-        cls._current = RomProject(filename, main_controller.load_view_main_list)
+        if cls._current is not None:
+            cls._current.close()
+        cls._current = RomProject(filename, main_controller.load_view_main_list,
+                                  main_controller.load_module_tree_items)
         try:
             cls._current.load()
             if main_controller:
@@ -112,42 +134,105 @@ class RomProject:
             if main_controller:
                 GLib.idle_add(lambda ex=ex: main_controller.on_file_opened_error(exc_info, ex))
 
-    def __init__(self, filename: str, cb_open_view: Callable[[Gtk.TreeIter], None]):
+    def __init__(self, filename: str, cb_open_view: Callable[[Gtk.TreeIter], None],
+                 cb_load_module_tree_items: Callable[[str], None] = lambda name: None):
         self.filename = filename
         self._rom: NintendoDSRom = None
         self._rom_module: Optional['RomModule'] = None
+        # Module classes by name. Modules are only instantiated on first access (see get_module).
+        self._module_classes: Dict[str, Type[AbstractModule]] = {}
         self._loaded_modules: Dict[str, AbstractModule] = {}
+        # Modules may be requested from the main thread and the AsyncTaskRunner at the same time.
+        self._modules_lock = threading.RLock()
         self._sprite_renderer: Optional[SpriteProvider] = None
+        self._thumbnail_cache: Optional[ThumbnailCache] = None
         self._string_provider: Optional[StringProvider] = None
-        # Dict of filenames -> models
-        self._opened_files = {}
+        # Files are opened from the main thread and the AsyncTaskRunner, this guards all _opened_files* attributes
+        # and the file handlers.
+        self._opened_files_lock = threading.RLock()
+        # Dict of filenames -> models. Ordered from least to most recently used.
+        self._opened_files: Dict[str, object] = OrderedDict()
+        # Dict of filenames -> size of the file in the ROM, used to limit the size of _opened_files.
+        self._opened_files_sizes: Dict[str, int] = {}
+        # Dict of id(model) -> filenames, for looking up models in mark_as_modified.
+        self._opened_files_ids: Dict[int, str] = {}
+        self._opened_files_cache_limit = DEFAULT_OPENED_FILES_CACHE_LIMIT
+        self._opened_files_hits = 0
+        self._opened_files_misses = 0
         self._opened_files_contexts = {}
-        # List of filenames that were requested to be opened threadsafe.
-        self._files_threadsafe = []
-        self._files_unsafe = []
+        # Owners (eg. modules or views) -> filenames of the opened files they pinned, see pin_opened_file.
+        self._opened_files_pins: Dict[object, Set[str]] = {}
+        # Owner of the pins of the currently open view, see set_opened_files_view_owner.
+        self._opened_files_view_owner: Optional[object] = None
+        # Sets of filenames that were requested to be opened threadsafe / not threadsafe.
+        self._files_threadsafe: Set[str] = set()
+        self._files_unsafe: Set[str] = set()
         # Dict of filenames -> file handler object
         self._file_handlers = {}
         self._file_handler_kwargs = {}
-        # List of modified filenames
-        self._modified_files = []
+        # Modified filenames. Used as an ordered set, the values are always None.
+        self._modified_files: Dict[str, None] = {}
         self._forced_modified = False
+        # Callbacks that are called before modified files are written to the ROM on save.
+        self._pre_save_hooks: List[Callable[[], None]] = []
+        # Callbacks that are called when a file is marked as modified, see add_file_modified_listener.
+        self._file_modified_listeners: List[Callable[[Optional[str]], None]] = []
+        # Worker processes to serialize modified files in when saving. Started on the first save.
+        self._save_pool = WorkerPool(os.cpu_count() or 1)
+        # Writes the ROM to disk, keeps track of the files that changed since the last save, see save_as_is.
+        self._rom_writer: Optional[IncrementalRomWriter] = None
+        # Dict of binary filepaths -> shared buffers of the binaries (arm9, overlays), see get_binary.
+        self._binaries: Dict[str, bytearray] = {}
+        # Dict of binary filepaths -> generation counters, increased every time a binary changes.
+        self._binary_generations: Dict[str, int] = {}
         # Callback for opening views using iterators from the main view list.
         self._cb_open_view: Callable[[Gtk.TreeIter], None] = cb_open_view
+        # Callback for adding the items of a module to the main view list, after the module was created.
+        # May be called from any thread.
+        self._cb_load_module_tree_items: Callable[[str], None] = cb_load_module_tree_items
         self._project_fm = ProjectFileManager(filename)
 
     def load(self):
-        """Load the ROM into memory and initialize all modules"""
+        """
+        Load the ROM into memory and prepare all modules.
+        Only the ROM module is created right away, all other modules are created lazily on first access.
+        """
         self._rom = NintendoDSRom.fromFile(self.filename)
+        self._rom_writer = IncrementalRomWriter(self._rom, self.filename)
+        self._module_classes = {}
         self._loaded_modules = {}
         for name, module in Modules.all().items():
             if name == 'rom':
                 self._rom_module = module(self)
             else:
-                self._loaded_modules[name] = module(self)
+                self._module_classes[name] = module
 
+        self._thumbnail_cache = self._create_thumbnail_cache()
         self._sprite_renderer = SpriteProvider(self)
         self._string_provider = StringProvider(self)
 
+    def close(self):
+        """Stop the worker processes of this project. Called, when another project is opened."""
+        self._save_pool.shutdown()
+        if self._sprite_renderer is not None:
+            self._sprite_renderer.shutdown()
+
+    def _create_thumbnail_cache(self) -> Optional[ThumbnailCache]:
+        settings = SkyTempleSettingsStore()
+        if not settings.get_thumbnail_cache_enabled():
+            return None
+        try:
+            # Keyed by the game, not the ROM file: Hacks of the same game share the images of unmodified
+            # source data (see ThumbnailCache).
+            return ThumbnailCache(
+                os.path.join(ProjectFileManager.shared_config_dir(), THUMBNAIL_CACHE_DIR),
+                bytes(self._rom.idCode) + bytes(self._rom.name),
+                settings.get_thumbnail_cache_size(DEFAULT_THUMBNAIL_CACHE_SIZE)
+            )
+        except OSError as err:
+            logger.warning(f"Failed to create the thumbnail cache, it is disabled: {err}")
+            return None
+
     def get_rom_module(self) -> 'RomModule':
         return self._rom_module
 
@@ -155,13 +240,32 @@ class RomProject:
         return self._project_fm
 
     def get_modules(self, include_rom_module=True) -> Iterator[AbstractModule]:
-        """Iterate over loaded modules"""
+        """Iterate over loaded modules. Modules that were not created yet (see get_module) are skipped."""
+        with self._modules_lock:
+            modules = list(self._loaded_modules.values())
         if include_rom_module:
-            return iter(list(self._loaded_modules.values()) + [self._rom_module])
-        return iter(self._loaded_modules.values())
+            return iter(modules + [self._rom_module])
+        return iter(modules)
+
+    def get_module_classes(self) -> Dict[str, Type[AbstractModule]]:
+        """Returns the classes of all modules (except the ROM module) by name, whether they were created or not."""
+        return self._module_classes
 
     def get_module(self, name):
-        return self._loaded_modules[name]
+        """Returns the module with the given name. If it wasn't created yet, it is created now."""
+        with self._modules_lock:
+            if name in self._loaded_modules:
+                return self._loaded_modules[name]
+            start = time.perf_counter()
+            module = self._module_classes[name](self)
+            self._loaded_modules[name] = module
+        logger.debug(f"Created module {name} in {(time.perf_counter() - start) * 1000:.1f}ms.")
+        self._cb_load_module_tree_items(name)
+        return module
+
+    def is_module_loaded(self, name):
+        """Returns whether or not the module with the given name was already created."""
+        return name in self._loaded_modules
 
     def open_file_in_rom(self, file_path_in_rom: str, file_handler_class: Type[DataHandler[T]],
                          threadsafe=False, **kwargs) -> Union[T, ModelContext[T]]:
@@ -178,12 +282,18 @@ class RomProject:
         Additional keyword arguments are passed to the handler (if the model isn't already loaded!!)
         The keyword arguments will also be used for serializing again.
         """
-        if file_path_in_rom not in self._opened_files:
-            bin = self._rom.getFileByName(file_path_in_rom)
-            self._opened_files[file_path_in_rom] = file_handler_class.deserialize(bin, **kwargs)
-            self._file_handlers[file_path_in_rom] = file_handler_class
-            self._file_handler_kwargs[file_path_in_rom] = kwargs
-        return self._open_common(file_path_in_rom, threadsafe)
+        with self._opened_files_lock:
+            if self._opened_files_lookup(file_path_in_rom):
+                return self._open_common(file_path_in_rom, threadsafe)
+        bin = self._rom.getFileByName(file_path_in_rom)
+        model = file_handler_class.deserialize(bin, **kwargs)
+        with self._opened_files_lock:
+            # Another thread may have opened the file in the meantime, then that model is used.
+            if file_path_in_rom not in self._opened_files:
+                self._add_opened_file(file_path_in_rom, model, len(bin))
+                self._file_handlers[file_path_in_rom] = file_handler_class
+                self._file_handler_kwargs[file_path_in_rom] = kwargs
+            return self._open_common(file_path_in_rom, threadsafe)
 
     def open_sir0_file_in_rom(self, file_path_in_rom: str, sir0_serializable_type: Type[Sir0Serializable],
                               threadsafe=False):
@@ -197,15 +307,26 @@ class RomProject:
 
         If ``threadsafe`` is True, instead of returning the model, a ModelContext[T] is returned.
         """
-        if file_path_in_rom not in self._opened_files:
-            bin = self._rom.getFileByName(file_path_in_rom)
-            sir0 = FileType.SIR0.deserialize(bin)
-            self._opened_files[file_path_in_rom] = FileType.SIR0.unwrap_obj(sir0, sir0_serializable_type)
-            self._file_handlers[file_path_in_rom] = FileType.SIR0
-            self._file_handler_kwargs[file_path_in_rom] = {}
-        return self._open_common(file_path_in_rom, threadsafe)
+        with self._opened_files_lock:
+            if self._opened_files_lookup(file_path_in_rom):
+                return self._open_common(file_path_in_rom, threadsafe)
+        bin = self._rom.getFileByName(file_path_in_rom)
+        sir0 = FileType.SIR0.deserialize(bin)
+        model = FileType.SIR0.unwrap_obj(sir0, sir0_serializable_type)
+        with self._opened_files_lock:
+            # Another thread may have opened the file in the meantime, then that model is used.
+            if file_path_in_rom not in self._opened_files:
+                self._add_opened_file(file_path_in_rom, model, len(bin))
+                self._file_handlers[file_path_in_rom] = FileType.SIR0
+                self._file_handler_kwargs[file_path_in_rom] = {}
+            return self._open_common(file_path_in_rom, threadsafe)
 
     def _open_common(self, file_path_in_rom: str, threadsafe):
+        """Must be called with the _opened_files_lock held, right after the file was looked up or added."""
+        view_owner = self._opened_files_view_owner
+        if view_owner is not None:
+            self.pin_opened_file(file_path_in_rom, view_owner)
+        self._evict_opened_files(keep=file_path_in_rom)
         if threadsafe:
             if file_path_in_rom in self._files_unsafe:
                 raise ValueError(
@@ -215,26 +336,127 @@ class RomProject:
                 self._opened_files_contexts[file_path_in_rom] = ModelContext(self._opened_files[file_path_in_rom])
             return self._opened_files_contexts[file_path_in_rom]
         elif file_path_in_rom in self._files_threadsafe:
-            raise ValueError(f"Tried to open {file_path_in_rom} unsafe, but it was requested threadsafe somewhere else.")
+            raise ValueError(
+                f"Tried to open {file_path_in_rom} unsafe, but it was requested threadsafe somewhere else."
+            )
         return self._opened_files[file_path_in_rom]
 
     def is_opened(self, filename):
-        return filename in self._opened_files
+        with self._opened_files_lock:
+            return filename in self._opened_files
+
+    def pin_opened_file(self, filename: str, owner: object):
+        """
+        Pin an opened file for the owner: It is not evicted from the opened files, until the owner releases
+        its pins with unpin_opened_files. Modules that keep models of files for their lifetime must pin them.
+        """
+        with self._opened_files_lock:
+            self._opened_files_pins.setdefault(owner, set()).add(filename)
+
+    def unpin_opened_files(self, owner: object):
+        """Release all pins of the owner. The files may be evicted from the opened files again."""
+        with self._opened_files_lock:
+            self._opened_files_pins.pop(owner, None)
+            if self._opened_files_view_owner is owner:
+                self._opened_files_view_owner = None
+            self._evict_opened_files()
+
+    def set_opened_files_view_owner(self, owner: Optional[object]):
+        """
+        Set the owner of the pins of the currently open view. All files opened while an owner is set are
+        pinned to it, so that the models the view uses are not evicted. The main controller releases the pins
+        with unpin_opened_files, when the view is closed.
+        """
+        with self._opened_files_lock:
+            self._opened_files_view_owner = owner
+
+    def set_opened_files_cache_limit(self, limit: int):
+        """
+        Set the maximum size (in bytes of the files in the ROM) of unmodified opened files kept in memory.
+        Modified files, files opened threadsafe and pinned files (see pin_opened_file) are never evicted.
+        """
+        with self._opened_files_lock:
+            self._opened_files_cache_limit = limit
+            self._evict_opened_files()
+
+    def get_opened_files_cache_stats(self) -> Dict[str, Union[int, float]]:
+        """Returns diagnostic information about the cache of opened files."""
+        with self._opened_files_lock:
+            requests = self._opened_files_hits + self._opened_files_misses
+            return {
+                'count': len(self._opened_files),
+                'size': sum(self._opened_files_sizes.values()),
+                'limit': self._opened_files_cache_limit,
+                'hits': self._opened_files_hits,
+                'misses': self._opened_files_misses,
+                'hit_rate': self._opened_files_hits / requests if requests > 0 else 0.0
+            }
+
+    def _add_opened_file(self, filename: str, model: object, size: int):
+        if filename in self._opened_files:
+            self._opened_files_ids.pop(id(self._opened_files[filename]), None)
+        self._opened_files[filename] = model
+        self._opened_files_ids[id(model)] = filename
+        self._opened_files_sizes[filename] = size
+
+    def _opened_files_lookup(self, filename) -> bool:
+        """Checks if the file is opened and if so marks it as recently used."""
+        if filename in self._opened_files:
+            self._opened_files.move_to_end(filename)
+            self._opened_files_hits += 1
+            return True
+        self._opened_files_misses += 1
+        return False
+
+    def _evict_opened_files(self, keep: Optional[str] = None):
+        """
+        Evict the least recently used opened files until the cache limit is met. Files that are modified,
+        wrapped in a ModelContext or pinned (see pin_opened_file) are kept.
+        Must be called with the _opened_files_lock held.
+        """
+        size = sum(self._opened_files_sizes.values())
+        if size <= self._opened_files_cache_limit:
+            return
+        pinned = set().union(*self._opened_files_pins.values())
+        for filename in list(self._opened_files.keys()):
+            if size <= self._opened_files_cache_limit:
+                break
+            if filename == keep or filename in self._modified_files or filename in self._opened_files_contexts \
+                    or filename in pinned:
+                continue
+            logger.debug(f"Evicting {filename} from the opened files.")
+            size -= self._opened_files_sizes.pop(filename, 0)
+            self._opened_files_ids.pop(id(self._opened_files[filename]), None)
+            del self._opened_files[filename]
+            del self._file_handlers[filename]
+            del self._file_handler_kwargs[filename]
 
     def mark_as_modified(self, file: Union[str, object]):
-        """Mark a file as modified, either by filename or model. TODO: Input checking"""
-        if isinstance(file, str):
-            assert file in self._opened_files
-            if file not in self._modified_files:
-                self._modified_files.append(file)
-        else:
-            filename = list(self._opened_files.keys())[list(self._opened_files.values()).index(file)]
-            self._modified_files.append(filename)
-            if file not in self._modified_files:
-                self._modified_files.append(file)
+        """Mark a file as modified, either by filename or model."""
+        with self._opened_files_lock:
+            if isinstance(file, str):
+                assert file in self._opened_files
+                filename = file
+            else:
+                filename = self._opened_files_ids.get(id(file))
+                if filename is None or self._opened_files[filename] is not file:
+                    raise ValueError("The model is not an opened file.")
+            # Modified files are never evicted.
+            self._modified_files[filename] = None
+        for listener in self._file_modified_listeners:
+            listener(filename)
 
     def force_mark_as_modified(self):
+        """
+        Mark the ROM as modified, without a specific file. Since we don't know what changed,
+        the ROM is fully re-built on the next save.
+        """
         self._forced_modified = True
+        self._rom_writer.mark_needs_full_save()
+        # This may have been caused by changes to the binaries (eg. by a patch).
+        self.invalidate_binaries()
+        for listener in self._file_modified_listeners:
+            listener(None)
 
     def has_modifications(self):
         return len(self._modified_files) > 0 or self._forced_modified
@@ -250,12 +472,37 @@ class RomProject:
         for re-generated files which are otherwise not read by SkyTemple (only saved), such as the mappa_gs.bin file.
         """
         self._rom.setFileByName(filename, data)
+        self._mark_file_dirty(filename)
+
+    def add_pre_save_hook(self, hook: Callable[[], None]):
+        """
+        Register a callback that is called when the ROM is saved, before the modified files are written
+        to the ROM. This can be used to update files that are generated from other files.
+        The callback is called in the thread the ROM is saved in.
+        """
+        self._pre_save_hooks.append(hook)
+
+    def add_file_modified_listener(self, listener: Callable[[Optional[str]], None]):
+        """
+        Register a callback that is called with the filename, whenever a file is marked as modified.
+        If the ROM is marked as modified without a specific file (force_mark_as_modified), it is called with None.
+        This can be used to invalidate data that was derived from files.
+        """
+        self._file_modified_listeners.append(listener)
 
     async def _save_impl(self, main_controller: Optional['MainController']):
         try:
-            for name in self._modified_files:
-                self.prepare_save_model(name)
-            self._modified_files = []
+            for hook in self._pre_save_hooks:
+                hook()
+            if len(self._modified_files) >= PARALLEL_SAVE_MIN_FILES and self._save_pool.max_workers > 0:
+                self._prepare_save_models_parallel(list(self._modified_files), main_controller)
+            else:
+                for i, name in enumerate(self._modified_files):
+                    start = time.perf_counter()
+                    self.prepare_save_model(name)
+                    self._report_save_progress(main_controller, name, i + 1, len(self._modified_files),
+                                               time.perf_counter() - start)
+            self._modified_files = {}
             self._forced_modified = False
             logger.debug(f"Saving ROM to {self.filename}")
             self.save_as_is()
@@ -267,15 +514,64 @@ class RomProject:
                 exc_info = sys.exc_info()
                 GLib.idle_add(lambda err=err: main_controller.on_file_saved_error(exc_info, err))
 
+    def _prepare_save_models_parallel(self, names, main_controller: Optional['MainController']):
+        """
+        Serialize the models of the given files in worker processes and write the results to the ROM
+        object in memory, in the order of names.
+        Models that can not be sent to other processes are serialized in this process instead.
+        """
+        executor = self._save_pool.get_executor()
+        futures = {}
+        for name in names:
+            with self._model_context(name) as model:
+                handler = self._file_handlers[name]
+                if handler == FileType.SIR0:
+                    model = handler.wrap_obj(model)
+                try:
+                    # Pickle while holding the context, the model may be modified afterwards.
+                    pickled_model = pickle.dumps(model)
+                except Exception as ex:
+                    logger.debug(f"Can't serialize {name} in a worker process ({ex}), serializing directly.")
+                    continue
+            futures[name] = executor.submit(
+                serialize_pickled_model, handler, pickled_model, self._file_handler_kwargs[name]
+            )
+        for i, name in enumerate(names):
+            binary_data = None
+            if name in futures:
+                try:
+                    binary_data, duration = futures[name].result()
+                except BrokenProcessPool as ex:
+                    logger.warning(f"The worker processes failed, serializing {name} directly.", exc_info=ex)
+                    self._save_pool.discard(executor)
+            if binary_data is not None:
+                logger.debug(f"Saving {name} in ROM (serialized in worker process).")
+                self._rom.setFileByName(name, binary_data)
+                self._mark_file_dirty(name)
+            else:
+                start = time.perf_counter()
+                self.prepare_save_model(name)
+                duration = time.perf_counter() - start
+            self._report_save_progress(main_controller, name, i + 1, len(names), duration)
+
+    @staticmethod
+    def _report_save_progress(main_controller: Optional['MainController'],
+                              name: str, done: int, total: int, duration: float):
+        logger.debug(f"Serialized {name} in {duration * 1000:.1f}ms ({done}/{total}).")
+        if main_controller:
+            GLib.idle_add(lambda: main_controller.on_file_save_progress(name, done, total, duration))
+
+    def _model_context(self, name):
+        return self._opened_files_contexts[name] \
+            if name in self._opened_files_contexts \
+            else nullcontext(self._opened_files[name])
+
     def prepare_save_model(self, name, assert_that=None):
         """
         Write the binary model for this type to the ROM object in memory.
         If assert_that is given, it is asserted, that the model matches the one on record.
         """
-        context = self._opened_files_contexts[name] \
-            if name in self._opened_files_contexts \
-            else nullcontext(self._opened_files[name])
-        with context as model:
+        with self._model_context(name) as model:
             handler = self._file_handlers[name]
             logger.debug(f"Saving {name} in ROM. Model: {model}, Handler: {handler}")
             if handler == FileType.SIR0:
@@ -285,10 +581,39 @@ class RomProject:
                 assert assert_that is model, "The model that is being saved must match!"
             binary_data = handler.serialize(model, **self._file_handler_kwargs[name])
             self._rom.setFileByName(name, binary_data)
+            self._mark_file_dirty(name)
 
     def save_as_is(self):
-        """Simply save the current ROM to disk."""
-        self._rom.saveToFile(self.filename)
+        """
+        Simply save the current ROM to disk.
+        If possible, only the files that changed since the last save are patched into the existing ROM file.
+        The ROM is fully re-built, if the file table needs to be laid out again.
+        """
+        self._rom_writer.save(self.filename)
+
+    def save_single_file(self, filename: str, assert_that=None):
+        """
+        Write the binary model of a single opened file to the ROM object in memory and then only this file to the
+        ROM file on disk. Other files that changed are not written, they are written on the next save.
+        If the file can not be patched into the ROM on disk in place (eg. because it grew too big),
+        the entire ROM is saved instead, like save_as_is does.
+        If assert_that is given, it is asserted, that the model matches the one on record.
+        """
+        start = time.perf_counter()
+        self.prepare_save_model(filename, assert_that=assert_that)
+        file_id = self._rom.filenames.idOf(filename)
+        if file_id is not None:
+            self._rom_writer.save_files(self.filename, [file_id])
+        else:
+            self.save_as_is()
+        logger.debug(f"Saved {filename} to {self.filename} in {(time.perf_counter() - start) * 1000:.1f}ms.")
+
+    def _mark_file_dirty(self, filename: str):
+        file_id = self._rom.filenames.idOf(filename)
+        if file_id is None:
+            self._rom_writer.mark_needs_full_save()
+        else:
+            self._rom_writer.mark_file_dirty(file_id)
 
     def get_files_with_ext(self, ext):
         return get_files_from_rom_with_extension(self._rom, ext)
@@ -305,9 +630,12 @@ class RomProject:
         writes the serialized model data there"""
         copy_bin = file_handler_class.serialize(model, **kwargs)
         create_file_in_rom(self._rom, new_filename, copy_bin)
-        self._opened_files[new_filename] = file_handler_class.deserialize(copy_bin, **kwargs)
-        self._file_handlers[new_filename] = file_handler_class
-        self._file_handler_kwargs[new_filename] = kwargs
+        # The file table changes, so the ROM must be re-built.
+        self._rom_writer.mark_needs_full_save()
+        with self._opened_files_lock:
+            self._add_opened_file(new_filename, file_handler_class.deserialize(copy_bin, **kwargs), len(copy_bin))
+            self._file_handlers[new_filename] = file_handler_class
+            self._file_handler_kwargs[new_filename] = kwargs
         return copy_bin
 
     def file_exists(self, filename):
@@ -321,7 +649,12 @@ class RomProject:
         Handle a request to open a resource in the editor. If the resource was not found, nothing happens,
         unless raise_exception is true, in which case a ValueError is raised.
         """
-        for module in self._loaded_modules.values():
+        for name, module_class in self._module_classes.items():
+            if request.type not in module_class.handled_request_types():
+                continue
+            module = self.get_module(name)
+            # The module may have been created without its items being added to the main view list yet.
+            self._cb_load_module_tree_items(name)
             result = module.handle_request(request)
             if result is not None:
                 self._cb_open_view(result)
@@ -332,22 +665,65 @@ class RomProject:
     def get_sprite_provider(self) -> SpriteProvider:
         return self._sprite_renderer
 
+    def get_thumbnail_cache(self) -> Optional[ThumbnailCache]:
+        """Returns the persistent cache for rendered images or None, if it is disabled in the settings."""
+        return self._thumbnail_cache
+
     def get_string_provider(self) -> StringProvider:
         return self._string_provider
 
     def create_patcher(self):
         return Patcher(self._rom, self.get_rom_module().get_static_data())
 
-    def get_binary(self, binary: Union[Pmd2Binary, BinaryName, str]) -> bytes:
-        if not isinstance(binary, Pmd2Binary):
-            binary = self.get_rom_module().get_static_data().binaries[str(binary)]
-        return get_binary_from_rom_ppmdu(self._rom, binary)
+    def get_binary(self, binary: Union[Pmd2Binary, BinaryName, str]) -> bytearray:
+        """
+        Returns one of the binaries (such as arm9 or overlay). The returned buffer is shared and MUST NOT be
+        modified, use modify_binary instead.
+        """
+        binary = self._get_pmd2_binary(binary)
+        if binary.filepath not in self._binaries:
+            self._binaries[binary.filepath] = bytearray(get_binary_from_rom_ppmdu(self._rom, binary))
+        return self._binaries[binary.filepath]
+
+    def get_binary_generation(self, binary: Union[Pmd2Binary, BinaryName, str]) -> int:
+        """
+        Returns the generation of the binary. It changes every time the binary is modified, so callers can
+        use it to find out if data they parsed from the binary is outdated.
+        """
+        return self._binary_generations.get(self._get_pmd2_binary(binary).filepath, 0)
+
+    def invalidate_binaries(self):
+        """Drop all binary buffers. Must be called after the binaries in the ROM were changed directly."""
+        for filepath in self._binaries.keys():
+            self._binary_generations[filepath] = self._binary_generations.get(filepath, 0) + 1
+        self._binaries = {}
 
     def modify_binary(self, binary: Union[Pmd2Binary, BinaryName, str], modify_cb: Callable[[bytearray], None]):
         """Modify one of the binaries (such as arm9 or overlay) and save it to the ROM"""
-        if not isinstance(binary, Pmd2Binary):
-            binary = self.get_rom_module().get_static_data().binaries[str(binary)]
+        binary = self._get_pmd2_binary(binary)
         data = bytearray(self.get_binary(binary))
         modify_cb(data)
         set_binary_in_rom_ppmdu(self._rom, binary, data)
-        self.force_mark_as_modified()
+        self._binaries[binary.filepath] = data
+        self._binary_generations[binary.filepath] = self._binary_generations.get(binary.filepath, 0) + 1
+        self._mark_binary_dirty(binary)
+        self._forced_modified = True
+
+    def _get_pmd2_binary(self, binary: Union[Pmd2Binary, BinaryName, str]) -> Pmd2Binary:
+        if not isinstance(binary, Pmd2Binary):
+            binary = self.get_rom_module().get_static_data().binaries[str(binary)]
+        return binary
+
+    def _mark_binary_dirty(self, binary: Pmd2Binary):
+        """Overlays are regular files in the ROM, everything else (ARM9) requires a full re-build."""
+        parts = binary.filepath.split('/')
+        match = OVERLAY_FILENAME_PATTERN.match(parts[-1]) if parts[0] == 'overlay' else None
+        if match is None:
+            self._rom_writer.mark_needs_full_save()
+            return
+        ov_id = int(match.group(1))
+        overlays = self._rom.loadArm9Overlays([ov_id])
+        if ov_id in overlays:
+            self._rom_writer.mark_file_dirty(overlays[ov_id].fileID)
+        else:
+            self._rom_writer.mark_needs_full_save()
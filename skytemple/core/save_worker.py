@@ -0,0 +1,31 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+# Serializes the models of files in worker processes when saving, see RomProject._prepare_save_models_parallel.
+# Worker processes import this module, it must not import GTK.
+import pickle
+import time
+from typing import Tuple, Type, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from skytemple_files.common.types.data_handler import DataHandler
+
+
+def serialize_pickled_model(handler: Type['DataHandler'], pickled_model: bytes, kwargs: dict) -> Tuple[bytes, float]:
+    """Serializes a pickled model in a worker process. Returns the binary data and how long it took."""
+    start = time.perf_counter()
+    binary_data = handler.serialize(pickle.loads(pickled_model), **kwargs)
+    return binary_data, time.perf_counter() - start
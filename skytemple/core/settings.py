@@ -36,6 +36,10 @@ KEY_RECENT_5 = 'file5'
 
 KEY_ASSISTANT_SHOWN = 'assistant_shown'
 KEY_GTK_THEME = 'gtk_theme'
+KEY_SPRITE_DECODING_WORKERS = 'sprite_decoding_workers'
+KEY_THUMBNAIL_CACHE_ENABLED = 'thumbnail_cache_enabled'
+KEY_THUMBNAIL_CACHE_SIZE = 'thumbnail_cache_size'
+KEY_SCENE_BG_ANIMATED = 'scene_bg_animated'
 
 KEY_WINDOW_SIZE_X = 'width'
 KEY_WINDOW_SIZE_Y = 'height'
@@ -110,6 +114,57 @@ class SkyTempleSettingsStore:
         self.loaded_config[SECT_GENERAL][KEY_GTK_THEME] = value
         self._save()
 
+    def get_sprite_decoding_workers(self) -> int:
+        """Number of processes to decode sprites with. 0 means sprites are decoded in the task runner thread."""
+        if SECT_GENERAL in self.loaded_config:
+            if KEY_SPRITE_DECODING_WORKERS in self.loaded_config[SECT_GENERAL]:
+                return max(0, int(self.loaded_config[SECT_GENERAL][KEY_SPRITE_DECODING_WORKERS]))
+        return 0
+
+    def set_sprite_decoding_workers(self, value: int):
+        if SECT_GENERAL not in self.loaded_config:
+            self.loaded_config[SECT_GENERAL] = {}
+        self.loaded_config[SECT_GENERAL][KEY_SPRITE_DECODING_WORKERS] = str(value)
+        self._save()
+
+    def get_thumbnail_cache_enabled(self) -> bool:
+        if SECT_GENERAL in self.loaded_config:
+            if KEY_THUMBNAIL_CACHE_ENABLED in self.loaded_config[SECT_GENERAL]:
+                return int(self.loaded_config[SECT_GENERAL][KEY_THUMBNAIL_CACHE_ENABLED]) > 0
+        return False
+
+    def set_thumbnail_cache_enabled(self, value: bool):
+        if SECT_GENERAL not in self.loaded_config:
+            self.loaded_config[SECT_GENERAL] = {}
+        self.loaded_config[SECT_GENERAL][KEY_THUMBNAIL_CACHE_ENABLED] = '1' if value else '0'
+        self._save()
+
+    def get_thumbnail_cache_size(self, default: int) -> int:
+        """Maximum size of the thumbnail cache in bytes."""
+        if SECT_GENERAL in self.loaded_config:
+            if KEY_THUMBNAIL_CACHE_SIZE in self.loaded_config[SECT_GENERAL]:
+                return int(self.loaded_config[SECT_GENERAL][KEY_THUMBNAIL_CACHE_SIZE])
+        return default
+
+    def set_thumbnail_cache_size(self, value: int):
+        if SECT_GENERAL not in self.loaded_config:
+            self.loaded_config[SECT_GENERAL] = {}
+        self.loaded_config[SECT_GENERAL][KEY_THUMBNAIL_CACHE_SIZE] = str(value)
+        self._save()
+
+    def get_scene_bg_animated(self) -> bool:
+        """Whether or not the map backgrounds in the scene editor are animated."""
+        if SECT_GENERAL in self.loaded_config:
+            if KEY_SCENE_BG_ANIMATED in self.loaded_config[SECT_GENERAL]:
+                return int(self.loaded_config[SECT_GENERAL][KEY_SCENE_BG_ANIMATED]) > 0
+        return False
+
+    def set_scene_bg_animated(self, value: bool):
+        if SECT_GENERAL not in self.loaded_config:
+            self.loaded_config[SECT_GENERAL] = {}
+        self.loaded_config[SECT_GENERAL][KEY_SCENE_BG_ANIMATED] = '1' if value else '0'
+        self._save()
+
 
     def get_window_size(self) -> Optional[Tuple[int, int]]:
         if SECT_WINDOW in self.loaded_config:
@@ -15,22 +15,28 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
 import json
 import logging
 import os
 import threading
-from typing import TYPE_CHECKING, Tuple, Dict, List, Union
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Tuple, Dict, List, Union, Optional, Callable
 
 import cairo
 try:
-    from PIL import Image, ImageFilter
+    from PIL import Image, ImageFilter, ImageChops
 except ImportError:
-    from pil import Image, ImageFilter
+    from pil import Image, ImageFilter, ImageChops
 from gi.repository import Gdk, Gtk, GdkPixbuf
 
 from skytemple.core.img_utils import pil_to_cairo_surface
 from skytemple.core.model_context import ModelContext
+from skytemple.core.settings import SkyTempleSettingsStore
+from skytemple.core.sprite_worker import decode_monster_sprite, render_monster_sprite
 from skytemple.core.ui_utils import data_dir
+from skytemple.core.worker_pool import WorkerPool
 from skytemple_files.common.task_runner import AsyncTaskRunner
 from skytemple_files.common.types.file_types import FileType
 from skytemple_files.common.util import MONSTER_MD, MONSTER_BIN, open_utf8
@@ -108,7 +114,11 @@ STANDIN_ENTITIES_DEFAULT = {
     67: 4
 }
 FILE_NAME_STANDIN_SPRITES = '.standin_sprites.json'
-
+# How many decoded sprites from bin packs to keep in memory
+WAN_CACHE_SIZE = 64
+# Namespaces in the thumbnail cache. Change the version if the way these are rendered changes.
+THUMBNAIL_NS_MONSTER = 'monster_v1'
+THUMBNAIL_NS_ACTOR_PLACEHOLDER = 'actor_placeholder_v1'
 
 class SpriteProvider:
     """
@@ -134,6 +144,17 @@ class SpriteProvider:
         self._monster_bin: BinPack = self._project.open_file_in_rom(MONSTER_BIN, FileType.BIN_PACK, threadsafe=True)
 
         self._stripes = Image.open(os.path.join(data_dir(), 'stripes.png'))
+        # The stripes, tiled to the size of the biggest placeholder yet.
+        self._stripes_tiled = self._stripes.convert('RGBA')
+        # Generated placeholders by (monster sprite id, direction). Unlike the other loaded sprites these
+        # are kept on reset, they only depend on the sprite, which is shared by many actors.
+        self._placeholder_cache: Dict[Tuple[int, int], SpriteAndOffsetAndDims] = {}
+        # Decoded sprites from bin packs by (bin pack filename, sprite id), least recently used first.
+        self._wan_cache: 'OrderedDict[Tuple[str, int], Wan]' = OrderedDict()
+        self._project.add_file_modified_listener(self._on_file_modified)
+        # Worker processes to decode sprites with, if enabled in the settings.
+        self._decoding_pool = WorkerPool(SkyTempleSettingsStore().get_sprite_decoding_workers())
+        self._thumbnail_cache = self._project.get_thumbnail_cache()
         self._loaded_standins = None
 
         # init_loader MUST be called next!
@@ -160,6 +181,8 @@ class SpriteProvider:
         ctx.paint()
 
     def reset(self):
+        # Changes to the number of decoding processes in the settings are applied here.
+        self.set_decoding_workers(SkyTempleSettingsStore().get_sprite_decoding_workers())
         with sprite_provider_lock:
             self._loaded__monsters: Dict[int, cairo.Surface] = {}
             self._loaded__actor_placeholders: Dict[str, cairo.Surface] = {}
@@ -229,37 +252,18 @@ class SpriteProvider:
         if actor_id in self.get_standin_entities():
             md_index = self.get_standin_entities()[actor_id]
         try:
-            sprite_img, cx, cy, w, h = self._retrieve_monster_sprite(md_index, direction_id)
-
-            # Convert to outline + stripes
-            alpha_sprite = sprite_img.getchannel('A')
-
-            im_outline = sprite_img.filter(ImageFilter.FIND_EDGES)
-            alpha_outline = im_outline.getchannel('A')
-
-            out_sprite = Image.new('RGBA', im_outline.size)
-            for i in range(0, out_sprite.width, self._stripes.width):
-                for j in range(0, out_sprite.height, self._stripes.height):
-                    out_sprite.paste(self._stripes, (i, j))
-
-            im_outline = Image.new('RGBA', im_outline.size, color='white')
-            out_sprite.paste(im_outline, (0, 0, im_outline.width, im_outline.height), alpha_outline)
-
-            out_sprite.putalpha(alpha_sprite)
-            # Make red transparent
-            data = out_sprite.getdata()
-            new_data = []
-            for item in data:
-                if item[0] > 200 and item[1] < 200 and item[2] < 200:
-                    new_data.append((255, 255, 255, 0))
-                else:
-                    new_data.append(item)
-            out_sprite.putdata(new_data)
-
-            # /
-
-            surf = pil_to_cairo_surface(out_sprite)
-            loaded = surf, cx, cy, w, h
+            with self._monster_md as monster_md:
+                cache_key = monster_md[md_index].sprite_index, direction_id
+            with sprite_provider_lock:
+                loaded = self._placeholder_cache.get(cache_key)
+            if loaded is None:
+                placeholder_img, cx, cy, w, h = await self._retrieve_monster_image_cached(
+                    THUMBNAIL_NS_ACTOR_PLACEHOLDER, md_index, direction_id, self._make_placeholder
+                )
+                surf = pil_to_cairo_surface(placeholder_img)
+                loaded = surf, cx, cy, w, h
+                with sprite_provider_lock:
+                    self._placeholder_cache[cache_key] = loaded
         except BaseException:
             loaded = self.get_error()
         with sprite_provider_lock:
@@ -267,12 +271,47 @@ class SpriteProvider:
             self._requests__actor_placeholders.remove((actor_id, direction_id))
         after_load_cb()
 
+    def _make_placeholder(self, sprite_img: Image.Image) -> Image.Image:
+        """Converts a sprite to a placeholder: Stripes with a white outline, red parts are transparent."""
+        alpha_sprite = sprite_img.getchannel('A')
+
+        im_outline = sprite_img.filter(ImageFilter.FIND_EDGES)
+        alpha_outline = im_outline.getchannel('A')
+
+        out_sprite = self._get_stripes(*im_outline.size)
+        out_sprite.paste((255, 255, 255, 255), (0, 0, im_outline.width, im_outline.height), alpha_outline)
+
+        out_sprite.putalpha(alpha_sprite)
+        # Make red transparent
+        r, g, b, _ = out_sprite.split()
+        red_mask = ImageChops.multiply(
+            ImageChops.multiply(r.point(lambda v: 255 if v > 200 else 0), g.point(lambda v: 255 if v < 200 else 0)),
+            b.point(lambda v: 255 if v < 200 else 0)
+        )
+        out_sprite.paste((255, 255, 255, 0), (0, 0, out_sprite.width, out_sprite.height), red_mask)
+        return out_sprite
+
+    def _get_stripes(self, width: int, height: int) -> Image.Image:
+        """Returns a new image of the given size, filled with the stripes pattern."""
+        with sprite_provider_lock:
+            if self._stripes_tiled.width < width or self._stripes_tiled.height < height:
+                tiled = Image.new('RGBA', (
+                    max(width, self._stripes_tiled.width), max(height, self._stripes_tiled.height)
+                ))
+                for i in range(0, tiled.width, self._stripes.width):
+                    for j in range(0, tiled.height, self._stripes.height):
+                        tiled.paste(self._stripes, (i, j))
+                self._stripes_tiled = tiled
+            return self._stripes_tiled.crop((0, 0, width, height))
+
     def _load_monster(self, md_index, direction_id: int, after_load_cb):
         AsyncTaskRunner.instance().run_task(self._load_monster__impl(md_index, direction_id, after_load_cb))
 
     async def _load_monster__impl(self, md_index, direction_id: int, after_load_cb):
         try:
-            pil_img, cx, cy, w, h = self._retrieve_monster_sprite(md_index, direction_id)
+            pil_img, cx, cy, w, h = await self._retrieve_monster_image_cached(
+                THUMBNAIL_NS_MONSTER, md_index, direction_id, lambda img: img
+            )
             surf = pil_to_cairo_surface(pil_img)
             loaded = surf, cx, cy, w, h
         except BaseException:
@@ -287,7 +326,7 @@ class SpriteProvider:
 
     async def _load_monster_outline__impl(self, md_index, direction_id: int, after_load_cb):
         try:
-            sprite_img, cx, cy, w, h = self._retrieve_monster_sprite(md_index, direction_id)
+            sprite_img, cx, cy, w, h = await self._retrieve_monster_sprite_async(md_index, direction_id)
 
             # Convert to outline + stripes
 
@@ -307,24 +346,93 @@ class SpriteProvider:
             self._requests__monsters_outlines.remove((md_index, direction_id))
         after_load_cb()
 
-    def _retrieve_monster_sprite(self, md_index, direction_id: int) -> Tuple[Image.Image, int, int, int, int]:
+    async def _retrieve_monster_image_cached(
+            self, namespace: str, md_index, direction_id: int, convert: Callable[[Image.Image], Image.Image]
+    ) -> Tuple[Image.Image, int, int, int, int]:
+        """
+        Retrieves the monster sprite and converts it using convert. If the thumbnail cache is enabled,
+        the converted image is loaded from it or stored in it.
+        """
+        content_hash = self._monster_sprite_content_hash(md_index)
+        if content_hash is not None:
+            cached = self._thumbnail_cache.get(namespace, content_hash, str(direction_id))
+            if cached is not None:
+                img, cx, cy = cached
+                return img, cx, cy, img.width, img.height
+        sprite_img, cx, cy, w, h = await self._retrieve_monster_sprite_async(md_index, direction_id)
+        img = convert(sprite_img)
+        if content_hash is not None:
+            self._thumbnail_cache.put(namespace, content_hash, str(direction_id), img, cx, cy)
+        return img, cx, cy, w, h
+
+    def _monster_sprite_content_hash(self, md_index) -> Optional[str]:
+        """The hash of the sprite data of a monster for the thumbnail cache. None if the cache is disabled."""
+        if self._thumbnail_cache is None:
+            return None
         try:
             with self._monster_md as monster_md:
                 actor_sprite_id = monster_md[md_index].sprite_index
             with self._monster_bin as monster_bin:
-                sprite = self._load_sprite_from_bin_pack(monster_bin, actor_sprite_id)
-
-                ani_group = sprite.get_animations_for_group(sprite.anim_groups[0])
-                frame_id = direction_id - 1 if direction_id > 0 else 0
-                mfg_id = ani_group[frame_id].frames[0].frame_id
+                return self._thumbnail_cache.content_hash(monster_bin[actor_sprite_id])
+        except BaseException as e:
+            logger.warning(f"Error hashing the monster sprite for {md_index}.", exc_info=e)
+            return None
 
-                sprite_img, (cx, cy) = sprite.render_frame_group(sprite.frame_groups[mfg_id])
+    def _retrieve_monster_sprite(self, md_index, direction_id: int) -> Tuple[Image.Image, int, int, int, int]:
+        try:
+            with self._monster_md as monster_md:
+                actor_sprite_id = monster_md[md_index].sprite_index
+            with self._monster_bin as monster_bin:
+                sprite = self._load_sprite_from_bin_pack(monster_bin, actor_sprite_id, MONSTER_BIN)
+                sprite_img, cx, cy = render_monster_sprite(sprite, direction_id)
             return sprite_img, cx, cy, sprite_img.width, sprite_img.height
         except BaseException as e:
             # Error :(
             logger.warning(f"Error loading a monster sprite for {md_index}.", exc_info=e)
             raise RuntimeError(f"Error loading monster sprite for {md_index}") from e
 
+    async def _retrieve_monster_sprite_async(self, md_index, direction_id: int) -> Tuple[Image.Image, int, int, int, int]:
+        """
+        Same as _retrieve_monster_sprite, but if enabled in the settings, the sprite is decoded in the
+        process pool, so that multiple sprites can be decoded at the same time.
+        """
+        pool = self._decoding_pool.get_executor()
+        if pool is None:
+            return self._retrieve_monster_sprite(md_index, direction_id)
+        try:
+            with self._monster_md as monster_md:
+                actor_sprite_id = monster_md[md_index].sprite_index
+            with sprite_provider_lock:
+                if (MONSTER_BIN, actor_sprite_id) in self._wan_cache:
+                    # Already decoded, no need to do that again in another process.
+                    return self._retrieve_monster_sprite(md_index, direction_id)
+            with self._monster_bin as monster_bin:
+                compressed_sprite = bytes(monster_bin[actor_sprite_id])
+            raw_img, cx, cy, w, h = await asyncio.get_event_loop().run_in_executor(
+                pool, decode_monster_sprite, compressed_sprite, direction_id
+            )
+            return Image.frombytes('RGBA', (w, h), raw_img), cx, cy, w, h
+        except BrokenProcessPool as e:
+            logger.warning("The sprite decoding processes failed, decoding in this process instead.", exc_info=e)
+            self._decoding_pool.discard(pool)
+            self._decoding_pool.set_max_workers(0)
+            return self._retrieve_monster_sprite(md_index, direction_id)
+        except BaseException as e:
+            # Error :(
+            logger.warning(f"Error loading a monster sprite for {md_index}.", exc_info=e)
+            raise RuntimeError(f"Error loading monster sprite for {md_index}") from e
+
+    def set_decoding_workers(self, workers: int):
+        """
+        Change the number of processes to decode sprites with (see SkyTempleSettingsStore).
+        The running worker processes are shut down, if the number changed.
+        """
+        self._decoding_pool.set_max_workers(workers)
+
+    def shutdown(self):
+        """Stop the sprite decoding processes. Called when the project is closed."""
+        self._decoding_pool.shutdown()
+
     def _load_object(self, name, after_load_cb):
         AsyncTaskRunner.instance().run_task(self._load_object__impl(name, after_load_cb))
 
@@ -349,9 +457,27 @@ class SpriteProvider:
             self._requests__objects.remove(name)
         after_load_cb()
 
-    def _load_sprite_from_bin_pack(self, bin_pack: BinPack, file_id) -> Wan:
+    def _load_sprite_from_bin_pack(self, bin_pack: BinPack, file_id, bin_pack_filename: str) -> Wan:
         # TODO: Support of bin_pack item management via the RomProject instead?
-        return FileType.WAN.deserialize(FileType.PKDPX.deserialize(bin_pack[file_id]).decompress())
+        key = bin_pack_filename, file_id
+        with sprite_provider_lock:
+            if key in self._wan_cache:
+                self._wan_cache.move_to_end(key)
+                return self._wan_cache[key]
+        sprite = FileType.WAN.deserialize(FileType.PKDPX.deserialize(bin_pack[file_id]).decompress())
+        with sprite_provider_lock:
+            self._wan_cache[key] = sprite
+            while len(self._wan_cache) > WAN_CACHE_SIZE:
+                self._wan_cache.popitem(last=False)
+        return sprite
+
+    def _on_file_modified(self, filename: Optional[str]):
+        """Drop all decoded sprites and placeholders that were loaded from a bin pack that was modified."""
+        with sprite_provider_lock:
+            for key in [key for key in self._wan_cache.keys() if filename is None or key[0] == filename]:
+                del self._wan_cache[key]
+            if filename is None or filename == MONSTER_BIN:
+                self._placeholder_cache = {}
 
     def _load_sprite_from_rom(self, path: str) -> ModelContext[Wan]:
         return self._project.open_file_in_rom(path, FileType.WAN, threadsafe=True)
@@ -0,0 +1,48 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+# Decodes monster sprites in worker processes, see SpriteProvider._retrieve_monster_sprite_async.
+# Worker processes import this module, it must not import GTK.
+from typing import Tuple
+
+try:
+    from PIL import Image
+except ImportError:
+    from pil import Image
+from skytemple_files.compression_container.pkdpx.handler import PkdpxHandler
+from skytemple_files.graphics.wan_wat.handler import WanHandler
+from skytemple_files.graphics.wan_wat.model import Wan
+
+
+def render_monster_sprite(sprite: Wan, direction_id: int) -> Tuple[Image.Image, int, int]:
+    """Renders the first frame of the first animation of a monster sprite in the given direction."""
+    ani_group = sprite.get_animations_for_group(sprite.anim_groups[0])
+    frame_id = direction_id - 1 if direction_id > 0 else 0
+    mfg_id = ani_group[frame_id].frames[0].frame_id
+
+    sprite_img, (cx, cy) = sprite.render_frame_group(sprite.frame_groups[mfg_id])
+    return sprite_img, cx, cy
+
+
+def decode_monster_sprite(compressed_sprite: bytes, direction_id: int) -> Tuple[bytes, int, int, int, int]:
+    """
+    Decodes and renders a monster sprite in a worker process.
+    Returns the raw RGBA image data, the offsets and the dimensions.
+    """
+    sprite = WanHandler.deserialize(PkdpxHandler.deserialize(compressed_sprite).decompress())
+    sprite_img, cx, cy = render_monster_sprite(sprite, direction_id)
+    sprite_img = sprite_img.convert('RGBA')
+    return sprite_img.tobytes('raw', 'RGBA'), cx, cy, sprite_img.width, sprite_img.height
@@ -31,7 +31,7 @@ from skytemple.core.string_provider import StringType
 from skytemple.module.script.controller.dialog.pos_mark_editor import PosMarkEditorController
 from skytemple_files.common.ppmdu_config.data import Pmd2Data
 from skytemple_files.common.project_file_manager import ProjectFileManager
-from skytemple_files.common.script_util import ScriptFiles, load_script_files, SCRIPT_DIR, SSA_EXT, SSS_EXT, SSB_EXT
+from skytemple_files.common.script_util import ScriptFiles, SSA_EXT, SSS_EXT, SSB_EXT
 from skytemple_files.script.ssb.constants import SsbConstant
 from skytemple_ssb_debugger.context.abstract import AbstractDebuggerControlContext, EXPS_KEYWORDS
 from skytemple_ssb_debugger.threadsafe import synchronized_now
@@ -56,6 +56,8 @@ class SkyTempleMainDebuggerControlContext(AbstractDebuggerControlContext):
         return True
 
     def on_quit(self):
+        if RomProject.get_current() is not None:
+            RomProject.get_current().unpin_opened_files(self)
         self._manager.on_close()
 
     def on_focus(self):
@@ -77,7 +79,8 @@ class SkyTempleMainDebuggerControlContext(AbstractDebuggerControlContext):
         return self._project_fm.dir()
 
     def load_script_files(self) -> ScriptFiles:
-        return load_script_files(RomProject.get_current().get_rom_folder(SCRIPT_DIR))
+        # The script module already loaded the files and keeps them up to date, this is a copy of them.
+        return RomProject.get_current().get_module('script').get_script_files()
 
     def is_project_loaded(self) -> bool:
         return RomProject.get_current() is not None
@@ -101,6 +104,8 @@ class SkyTempleMainDebuggerControlContext(AbstractDebuggerControlContext):
                                                                        filename=filename,
                                                                        static_data=self.get_static_data(),
                                                                        project_fm=self._project_fm)
+        # The debugger keeps the loaded file, until it's closed.
+        RomProject.get_current().pin_opened_file(filename, self)
         f.file_manager = ssb_file_manager
         return f
 
@@ -112,8 +117,7 @@ class SkyTempleMainDebuggerControlContext(AbstractDebuggerControlContext):
         project = RomProject.get_current()
         ssb_loaded_file = self.get_ssb(filename, ssb_file_manager)
         ssb_loaded_file.ssb_model = ssb_model
-        project.prepare_save_model(filename, assert_that=ssb_loaded_file)
-        project.save_as_is()
+        project.save_single_file(filename, assert_that=ssb_loaded_file)
 
     def open_scene_editor(self, type_of_scene, path):
         try:
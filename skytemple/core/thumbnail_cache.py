@@ -0,0 +1,129 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import hashlib
+import logging
+import os
+import struct
+import threading
+from typing import Optional, Tuple, Union
+
+try:
+    from PIL import Image
+except ImportError:
+    from pil import Image
+
+logger = logging.getLogger(__name__)
+# Width, height, x offset, y offset
+THUMBNAIL_HEADER = struct.Struct('<IIii')
+THUMBNAIL_EXT = '.rgba'
+DEFAULT_THUMBNAIL_CACHE_SIZE = 64 * 1024 * 1024
+
+
+class ThumbnailCache:
+    """
+    Persistent cache for rendered images (eg. sprites and portraits), so they don't have to be decoded again
+    in every session. The images are stored as raw RGBA data in the cache directory.
+
+    Entries are keyed by the ROM and by a hash of the source data the image was rendered from. Images of
+    modified source data therefore never match old entries. The total size of the cache directory is capped,
+    the least recently used entries are removed first.
+
+    The ROM ID is meant to identify the game (eg. its game code and title), not a specific ROM file, so ROM hacks
+    of the same game and later saves of the same ROM share their entries. That is safe, since an entry can
+    only match if the source data is byte for byte the same, and an image rendered from the same source
+    data is the same in every ROM of the game. Hashing the whole ROM instead would invalidate the cache on
+    every save and take longer than most of the decoding it saves.
+    """
+    def __init__(self, cache_dir: str, rom_id: bytes, max_size: int = DEFAULT_THUMBNAIL_CACHE_SIZE):
+        """
+        :param cache_dir: Directory to store the cache in. It may be shared by multiple ROMs.
+        :param rom_id: Something that identifies the game, eg. its game code and title.
+        :param max_size: Maximum size of all entries in the cache directory in bytes.
+        """
+        self.cache_dir = cache_dir
+        self.dir = os.path.join(cache_dir, hashlib.sha1(rom_id).hexdigest())
+        os.makedirs(self.dir, exist_ok=True)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # Total size of all entries in the cache directory, calculated on first write.
+        self._size: Optional[int] = None
+
+    @staticmethod
+    def content_hash(data: Union[bytes, memoryview]) -> str:
+        """Returns the hash to use as content_hash for the given source data."""
+        return hashlib.sha1(data).hexdigest()
+
+    def get(self, namespace: str, content_hash: str, key: str) -> Optional[Tuple[Image.Image, int, int]]:
+        """Returns the cached image and its x and y offsets or None, if not cached."""
+        path = self._path(namespace, content_hash, key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            width, height, x, y = THUMBNAIL_HEADER.unpack_from(data)
+            img = Image.frombytes('RGBA', (width, height), data[THUMBNAIL_HEADER.size:])
+            # Mark as recently used
+            os.utime(path)
+        except (OSError, struct.error, ValueError):
+            return None
+        return img, x, y
+
+    def put(self, namespace: str, content_hash: str, key: str, img: Image.Image, x: int = 0, y: int = 0):
+        """Stores an image and its x and y offsets in the cache. Errors are only logged."""
+        if img.mode != 'RGBA':
+            img = img.convert('RGBA')
+        data = THUMBNAIL_HEADER.pack(img.width, img.height, x, y) + img.tobytes('raw', 'RGBA')
+        path = self._path(namespace, content_hash, key)
+        try:
+            with self._lock:
+                if self._size is None:
+                    self._size = sum(size for _, __, size in self._entries())
+                if os.path.exists(path):
+                    self._size -= os.path.getsize(path)
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self._size += len(data)
+                if self._size > self.max_size:
+                    self._cleanup()
+        except OSError as err:
+            logger.warning(f"Failed to write to the thumbnail cache: {err}")
+
+    def _cleanup(self):
+        """Removes the least recently used entries until the cache is below its maximum size."""
+        for path, _, size in sorted(self._entries(), key=lambda e: e[1]):
+            if self._size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except OSError:
+                pass
+
+    def _entries(self):
+        """Yields path, modification time and size of all entries in the cache directory (for all ROMs)."""
+        for rom_dir in os.scandir(self.cache_dir):
+            if not rom_dir.is_dir():
+                continue
+            for entry in os.scandir(rom_dir.path):
+                if entry.is_file() and entry.name.endswith(THUMBNAIL_EXT):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_mtime, stat.st_size
+
+    def _path(self, namespace: str, content_hash: str, key: str) -> str:
+        name = hashlib.sha1(f'{namespace}:{content_hash}:{key}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.dir, name + THUMBNAIL_EXT)
@@ -0,0 +1,88 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Optional, Callable
+
+logger = logging.getLogger(__name__)
+# Worker processes can only be spawned with Python 3.7+ (ProcessPoolExecutor has no mp_context before that).
+# Forking them instead is not safe, so pools never have workers on older versions.
+WORKER_PROCESSES_SUPPORTED = sys.version_info >= (3, 7)
+
+
+class WorkerPool:
+    """
+    A long-lived pool of worker processes. The processes are only started on first use and then reused,
+    until the pool is shut down or the number of workers changes.
+
+    Forking a process that runs GTK and other threads is not safe, so the worker processes are spawned.
+    Spawned processes run the main module of the application again (without its __main__ block) and import the
+    module of every function they run. Neither may import GTK at module level: skytemple.main only imports it
+    in main() and functions submitted to the pool must be defined in modules like skytemple.core.save_worker.
+    """
+    def __init__(self, max_workers: int):
+        self._max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def max_workers(self) -> int:
+        """The number of workers. Always 0, if worker processes are not supported."""
+        return self._max_workers if WORKER_PROCESSES_SUPPORTED else 0
+
+    def set_max_workers(self, max_workers: int):
+        """Change the number of workers. If it changed, the running workers are shut down."""
+        if max_workers != self._max_workers:
+            self.shutdown()
+            self._max_workers = max_workers
+
+    def get_executor(self) -> Optional[ProcessPoolExecutor]:
+        """Returns the executor, starting it if needed. Returns None, if the pool has no workers."""
+        if self.max_workers < 1:
+            return None
+        with self._lock:
+            if self._executor is None:
+                logger.debug(f"Starting worker pool with {self._max_workers} workers.")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._max_workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        executor = self.get_executor()
+        if executor is None:
+            raise ValueError("The worker pool has no workers.")
+        return executor.submit(fn, *args, **kwargs)
+
+    def discard(self, executor: ProcessPoolExecutor):
+        """Discard the executor (eg. if it broke), if it's still the current one. A new one is started on next use."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def shutdown(self):
+        """Shut down the worker processes. Pending work is still finished."""
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            logger.debug("Shutting down worker pool.")
+            executor.shutdown(wait=False)
@@ -15,41 +15,47 @@
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 import logging
+import multiprocessing
 import os
 import sys
+from typing import TYPE_CHECKING
 
-import gi
-gi.require_version('Gtk', '3.0')
-
-from skytemple.core.events.manager import EventManager
-from skytemple.core.modules import Modules
-from skytemple.core.settings import SkyTempleSettingsStore
-from skytemple.core.ui_utils import data_dir
-from skytemple_files.common.task_runner import AsyncTaskRunner
-from skytemple_icons import icons
-from skytemple_ssb_debugger.main import get_debugger_data_dir
-
-try:
-    gi.require_foreign("cairo")
-except ImportError:
-    from gi.repository import Gtk
-
-    md = Gtk.MessageDialog(None,
-                           Gtk.DialogFlags.DESTROY_WITH_PARENT, Gtk.MessageType.ERROR,
-                           Gtk.ButtonsType.OK, "PyGObject compiled without Cairo support. Can't start!",
-                           title="SkyTemple - Error!")
-    md.set_position(Gtk.WindowPosition.CENTER)
-    md.run()
-    md.destroy()
-    exit(1)
-
-from gi.repository import Gtk, Gdk, GLib
-from gi.repository.Gtk import Window
-from skytemple.controller.main import MainController
+if TYPE_CHECKING:
+    from skytemple.core.settings import SkyTempleSettingsStore
+# GTK and everything that uses it is only imported in main(): Worker processes (see WorkerPool) are spawned
+# and run this module again, without calling main().
 SKYTEMPLE_LOGLEVEL = logging.DEBUG
 
 
 def main():
+    import gi
+    gi.require_version('Gtk', '3.0')
+
+    try:
+        gi.require_foreign("cairo")
+    except ImportError:
+        from gi.repository import Gtk
+
+        md = Gtk.MessageDialog(None,
+                               Gtk.DialogFlags.DESTROY_WITH_PARENT, Gtk.MessageType.ERROR,
+                               Gtk.ButtonsType.OK, "PyGObject compiled without Cairo support. Can't start!",
+                               title="SkyTemple - Error!")
+        md.set_position(Gtk.WindowPosition.CENTER)
+        md.run()
+        md.destroy()
+        exit(1)
+
+    from gi.repository import Gtk, Gdk, GLib
+    from gi.repository.Gtk import Window
+    from skytemple.controller.main import MainController
+    from skytemple.core.events.manager import EventManager
+    from skytemple.core.modules import Modules
+    from skytemple.core.settings import SkyTempleSettingsStore
+    from skytemple.core.ui_utils import data_dir
+    from skytemple_files.common.task_runner import AsyncTaskRunner
+    from skytemple_icons import icons
+    from skytemple_ssb_debugger.main import get_debugger_data_dir
+
     # TODO: Gtk.Application: https://python-gtk-3-tutorial.readthedocs.io/en/latest/application.html
     path = os.path.abspath(os.path.dirname(__file__))
 
@@ -128,17 +134,21 @@ def main():
         AsyncTaskRunner.end()
 
 
-def _windows_load_theme(settings: SkyTempleSettingsStore):
+def _windows_load_theme(settings: 'SkyTempleSettingsStore'):
+    from gi.repository import Gtk
     gtk_settings = Gtk.Settings.get_default()
     gtk_settings.set_property("gtk-theme-name", settings.get_gtk_theme(default='Arc-Dark'))
 
 
-def _macos_load_theme(settings: SkyTempleSettingsStore):
+def _macos_load_theme(settings: 'SkyTempleSettingsStore'):
+    from gi.repository import Gtk
     gtk_settings = Gtk.Settings.get_default()
     gtk_settings.set_property("gtk-theme-name", settings.get_gtk_theme(default='Mojave-dark'))
 
 
 if __name__ == '__main__':
+    # Required for worker processes in frozen (PyInstaller) builds.
+    multiprocessing.freeze_support()
     # TODO: At the moment doesn't support any cli arguments.
     logging.basicConfig()
     logging.getLogger().setLevel(SKYTEMPLE_LOGLEVEL)
@@ -36,6 +36,10 @@ class BgpModule(AbstractModule):
     def sort_order(cls):
         return 150
 
+    @classmethod
+    def tree_placeholder(cls):
+        return 'skytemple-e-bgp-symbolic', BACKGROUNDS_NAME
+
     def __init__(self, rom_project: RomProject):
         """Loads the list of backgrounds for the ROM."""
         self.project = rom_project
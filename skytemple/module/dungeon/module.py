@@ -16,6 +16,7 @@
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 import logging
 import os
+from copy import copy
 from typing import Optional, List, Union, Iterable, Tuple
 from xml.etree.ElementTree import Element
 
@@ -107,6 +108,14 @@ class DungeonModule(AbstractModule):
     def sort_order(cls):
         return 210
 
+    @classmethod
+    def tree_placeholder(cls):
+        return ICON_ROOT, DUNGEONS_NAME
+
+    @classmethod
+    def handled_request_types(cls):
+        return [REQUEST_TYPE_DUNGEONS, REQUEST_TYPE_DUNGEON_FIXED_FLOOR, REQUEST_TYPE_DUNGEON_FIXED_FLOOR_ENTITY]
+
     def __init__(self, rom_project: RomProject):
         self.project = rom_project
 
@@ -118,6 +127,13 @@ class DungeonModule(AbstractModule):
         self._fixed_floor_root_iter = None
         self._fixed_floor_data: Optional[FixedBin] = None
         self._dungeon_bin: Optional[DungeonBinPack] = None
+        # Lists parsed from the ARM9 and the ARM9 generation they were parsed from.
+        self._dungeon_list_cache: Optional[Tuple[int, List[DungeonDefinition]]] = None
+        self._dungeon_restrictions_cache: Optional[Tuple[int, List[DungeonRestriction]]] = None
+
+        # Whether or not the mappa_gs file must be re-generated on the next save, see save_mappa.
+        self._mappag_outdated = False
+        self.project.add_pre_save_hook(self._regenerate_mappag)
 
         # Preload mappa
         self.get_mappa()
@@ -140,6 +156,8 @@ class DungeonModule(AbstractModule):
             DUNGEON_BIN, FileType.DUNGEON_BIN,
             static_data=static_data
         )
+        self.project.pin_opened_file(FIXED_PATH, self)
+        self.project.pin_opened_file(DUNGEON_BIN, self)
 
         self._validator.validate(self.get_dungeon_list())
 
@@ -212,7 +230,7 @@ class DungeonModule(AbstractModule):
         elif DOJO_DUNGEONS_FIRST + 11 <= did <= 0xD3:
             return self.get_mappa().floor_lists[DOJO_MAPPA_ENTRY][item.floor_id + 0x33]
         else:
-            dungeon = self.get_dungeon_list()[item.dungeon.dungeon_id]
+            dungeon = self._get_dungeon_list_cached()[item.dungeon.dungeon_id]
             return self.get_mappa().floor_lists[dungeon.mappa_index][item.floor_id]
 
     def get_fixed_floor(self, floor_id):
@@ -220,8 +238,6 @@ class DungeonModule(AbstractModule):
 
     def mark_floor_as_modified(self, item: FloorViewInfo, modified_mappag = False):
         if modified_mappag:
-            # This is slow, since it builds the entire mappa_g file from scratch. 
-            # It would be better to only modify the floor attributes changed
             self.save_mappa()
         else:
             self.project.mark_as_modified(MAPPA_PATH)
@@ -230,16 +246,30 @@ class DungeonModule(AbstractModule):
         recursive_up_item_store_mark_as_modified(row)
 
     def get_dungeon_list(self) -> List[DungeonDefinition]:
-        # TODO: Cache?
-        return HardcodedDungeons.get_dungeon_list(
-            self.project.get_binary(BinaryName.ARM9), self.project.get_rom_module().get_static_data()
-        )
+        """Returns a copy of the dungeon list, that may be modified and saved with save_dungeon_list."""
+        return [copy(d) for d in self._get_dungeon_list_cached()]
 
     def get_dungeon_restrictions(self) -> List[DungeonRestriction]:
-        # TODO: Cache?
-        return HardcodedDungeons.get_dungeon_restrictions(
-            self.project.get_binary(BinaryName.ARM9), self.project.get_rom_module().get_static_data()
-        )
+        """Returns a copy of the dungeon restrictions, that may be modified and saved with save_dungeon_restrictions."""
+        return [copy(r) for r in self._get_dungeon_restrictions_cached()]
+
+    def _get_dungeon_list_cached(self) -> List[DungeonDefinition]:
+        """Returns the cached dungeon list. MUST NOT be modified."""
+        generation = self.project.get_binary_generation(BinaryName.ARM9)
+        if self._dungeon_list_cache is None or self._dungeon_list_cache[0] != generation:
+            self._dungeon_list_cache = generation, HardcodedDungeons.get_dungeon_list(
+                self.project.get_binary(BinaryName.ARM9), self.project.get_rom_module().get_static_data()
+            )
+        return self._dungeon_list_cache[1]
+
+    def _get_dungeon_restrictions_cached(self) -> List[DungeonRestriction]:
+        """Returns the cached dungeon restrictions. MUST NOT be modified."""
+        generation = self.project.get_binary_generation(BinaryName.ARM9)
+        if self._dungeon_restrictions_cache is None or self._dungeon_restrictions_cache[0] != generation:
+            self._dungeon_restrictions_cache = generation, HardcodedDungeons.get_dungeon_restrictions(
+                self.project.get_binary(BinaryName.ARM9), self.project.get_rom_module().get_static_data()
+            )
+        return self._dungeon_restrictions_cache[1]
 
     def mark_dungeon_as_modified(self, dungeon_id, modified_mappa=True):
         self.project.get_string_provider().mark_as_modified()
@@ -259,6 +289,7 @@ class DungeonModule(AbstractModule):
         self.project.modify_binary(BinaryName.ARM9, lambda binary: HardcodedDungeons.set_dungeon_list(
             dungeons, binary, self.project.get_rom_module().get_static_data()
         ))
+        self._dungeon_list_cache = None
 
     def update_dungeon_restrictions(self, dungeon_id: int, restrictions: DungeonRestriction):
         all_restrictions = self.get_dungeon_restrictions()
@@ -269,12 +300,22 @@ class DungeonModule(AbstractModule):
         self.project.modify_binary(BinaryName.ARM9, lambda binary: HardcodedDungeons.set_dungeon_restrictions(
             restrictions, binary, self.project.get_rom_module().get_static_data()
         ))
+        self._dungeon_restrictions_cache = None
 
     def save_mappa(self):
+        """
+        Marks the mappa file as modified. Re-generating the mappa_gs file from it is slow, since it is built
+        from scratch, so this is deferred until the ROM is saved.
+        """
         self.project.mark_as_modified(MAPPA_PATH)
-        self.project.save_file_manually(MAPPAG_PATH, FileType.MAPPA_G_BIN.serialize(
-            convert_mappa_to_mappag(self.get_mappa())
-        ))
+        self._mappag_outdated = True
+
+    def _regenerate_mappag(self):
+        if self._mappag_outdated:
+            self.project.save_file_manually(MAPPAG_PATH, FileType.MAPPA_G_BIN.serialize(
+                convert_mappa_to_mappag(self.get_mappa())
+            ))
+            self._mappag_outdated = False
 
     def _fill_dungeon_tree(self):
         item_store = self._tree_model
@@ -332,7 +373,7 @@ class DungeonModule(AbstractModule):
         Returns the dungeons, grouped by the same mappa_index. The dungeons and groups are overall sorted
         by their IDs.
         """
-        lst = self.get_dungeon_list()
+        lst = self._get_dungeon_list_cached()
         groups = {}
         yielded = set()
         for idx, dungeon in enumerate(lst):
@@ -449,7 +490,7 @@ class DungeonModule(AbstractModule):
             return 1
         if idx == DOJO_DUNGEONS_LAST:
             return 0x30
-        return self.get_dungeon_list()[idx].number_floors
+        return self._get_dungeon_list_cached()[idx].number_floors
 
     def change_floor_count(self, dungeon_id, number_floors_new):
         """
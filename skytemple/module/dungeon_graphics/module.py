@@ -53,6 +53,14 @@ class DungeonGraphicsModule(AbstractModule):
     def sort_order(cls):
         return 220
 
+    @classmethod
+    def tree_placeholder(cls):
+        return 'skytemple-e-dungeon-tileset-symbolic', DUNGEON_GRAPHICS_NAME
+
+    @classmethod
+    def handled_request_types(cls):
+        return [REQUEST_TYPE_DUNGEON_TILESET]
+
     def __init__(self, rom_project: RomProject):
         self.project = rom_project
 
@@ -64,6 +72,7 @@ class DungeonGraphicsModule(AbstractModule):
         self.dungeon_bin: DungeonBinPack = self.project.open_file_in_rom(
             DUNGEON_BIN, FileType.DUNGEON_BIN, static_data=self.project.get_rom_module().get_static_data()
         )
+        self.project.pin_opened_file(DUNGEON_BIN, self)
 
         root = item_store.append(root_node, [
             'skytemple-e-dungeon-tileset-symbolic', DUNGEON_GRAPHICS_NAME, self, MainController, 0, False, '', True
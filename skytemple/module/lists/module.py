@@ -47,6 +47,10 @@ class ListsModule(AbstractModule):
     def sort_order(cls):
         return 20
 
+    @classmethod
+    def tree_placeholder(cls):
+        return 'skytemple-view-list-symbolic', GROUND_LISTS
+
     def __init__(self, rom_project: RomProject):
         self.project = rom_project
 
@@ -0,0 +1,346 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
+import itertools
+import logging
+from typing import Optional, List, Tuple, Callable, Union, NamedTuple
+
+import cairo
+from gi.repository import GLib
+from PIL import Image
+
+from skytemple.core.img_utils import pil_to_cairo_atlas_surfaces
+from skytemple.module.map_bg.model_snapshot import snapshot_bpc, snapshot_bpl, snapshot_bpas
+from skytemple.module.tiled_img.animation_context import AnimationClock
+from skytemple_files.common.task_runner import AsyncTaskRunner
+from skytemple_files.graphics.bma.model import MASK_PAL
+from skytemple_files.graphics.bpa.model import Bpa
+from skytemple_files.graphics.bpc.model import Bpc
+from skytemple_files.graphics.bpl.model import Bpl, BPL_NORMAL_MAX_PAL
+logger = logging.getLogger(__name__)
+
+
+class _RenderedChunks(NamedTuple):
+    """The result of ChunkSurfaces._render_first_frames."""
+    surfaces: List[List[List[List[cairo.Surface]]]]
+    bpa_clocks: List[List[Optional[AnimationClock]]]
+    pal_ani_clocks: List[List[Optional[AnimationClock]]]
+    bpa_durations: int
+    pal_ani_durations: int
+    weird_palette: bool
+    pending_animated_chunks: List[List[Tuple[int, List[Image.Image], bool]]]
+    pal_ani_palettes: List[List[int]]
+
+
+class ChunkSurfaces:
+    """
+    Renders the chunks of a map background into Cairo surfaces for the map background drawers
+    (see AnimationContext), together with the animation clocks for each chunk.
+
+    Only the first frame of each chunk is converted right away, so views can be shown quickly.
+    The remaining animation frames are rendered in the background and swapped in on the main thread
+    when they are done, after that on_frames_rendered is called.
+    """
+    def __init__(self, on_frames_rendered: Callable[[], None] = lambda: None):
+        # Cairo surfaces for each chunk in each layer for each frame
+        # surfaces[layer_number][chunk_idx][palette_animation_frame][frame]
+        self.surfaces: List[List[List[List[cairo.Surface]]]] = []
+        # The animation clocks for each chunk in each layer, see AnimationContext
+        # bpa_clocks[layer_number][chunk_idx]
+        self.bpa_clocks: List[List[Optional[AnimationClock]]] = []
+        self.pal_ani_clocks: List[List[Optional[AnimationClock]]] = []
+        # Single durations for all animations, for views that don't use the per-chunk clocks (eg. the chunk editor).
+        self.bpa_durations = 0
+        self.pal_ani_durations = 0
+        # Whether or not any chunk uses palettes that are out of the normal range.
+        self.weird_palette = False
+
+        self._on_frames_rendered = on_frames_rendered
+        # Invalidates the animation frames of previous calls to render that are still being rendered.
+        self._generation = 0
+
+    @property
+    def is_animated(self) -> bool:
+        """Whether or not any chunk is animated."""
+        return any(
+            clock is not None for layer_clocks in itertools.chain(self.bpa_clocks, self.pal_ani_clocks)
+            for clock in layer_clocks
+        )
+
+    def render(self, bpc: Bpc, bpl: Bpl, bpas: List[Union[None, Bpa]]):
+        """
+        (Re)-draw the chunk images. Blocks until the first frames of all chunks are rendered.
+        Only to be used from threads other than the main thread (eg. in the constructor of controllers),
+        on the main thread use render_async instead.
+        """
+        self._generation += 1
+        self._apply_rendered(self._generation, self._render_first_frames(bpc, bpl, bpas))
+
+    def render_async(self, bpc: Bpc, bpl: Bpl, bpas: List[Union[None, Bpa]],
+                     on_rendered: Callable[[], None] = lambda: None):
+        """
+        (Re)-draw the chunk images in the background. Must be called from the main thread.
+        The models are copied first, so they may be changed while rendering. The previous surfaces stay in
+        place until the first frames of all chunks are rendered, then they are swapped out on the main thread
+        and on_rendered is called.
+        """
+        self._generation += 1
+        AsyncTaskRunner.instance().run_task(self._render_async__impl(
+            self._generation, snapshot_bpc(bpc), snapshot_bpl(bpl), snapshot_bpas(bpas), on_rendered
+        ))
+
+    async def _render_async__impl(self, generation, bpc, bpl, bpas, on_rendered):
+        if generation != self._generation:
+            return
+        try:
+            rendered = self._render_first_frames(bpc, bpl, bpas)
+        except BaseException as ex:
+            logger.warning("Failed to render the chunks of a map background.", exc_info=ex)
+            return
+        GLib.idle_add(self._on_rendered, generation, rendered, on_rendered)
+
+    def _on_rendered(self, generation, rendered, on_rendered):
+        if generation == self._generation:
+            self._apply_rendered(generation, rendered)
+            on_rendered()
+        return False
+
+    def _apply_rendered(self, generation, rendered: '_RenderedChunks'):
+        self.surfaces = rendered.surfaces
+        self.bpa_clocks = rendered.bpa_clocks
+        self.pal_ani_clocks = rendered.pal_ani_clocks
+        self.bpa_durations = rendered.bpa_durations
+        self.pal_ani_durations = rendered.pal_ani_durations
+        self.weird_palette = rendered.weird_palette
+        if any(len(pending) > 0 for pending in rendered.pending_animated_chunks):
+            AsyncTaskRunner.instance().run_task(self._render_animation_frames(
+                generation, rendered.pending_animated_chunks, rendered.pal_ani_palettes
+            ))
+
+    def _render_first_frames(self, bpc: Bpc, bpl: Bpl, bpas: List[Union[None, Bpa]]) -> '_RenderedChunks':
+        """
+        Renders the first frame of all chunks and the animation clocks. The other animation frames are only
+        collected, to be rendered by _render_animation_frames.
+        """
+        weird_palette = False
+        max_pal = min(bpl.number_palettes, BPL_NORMAL_MAX_PAL)
+
+        if bpc.number_of_layers > 1:
+            layer_idxs_bpc = [1, 0]
+        else:
+            layer_idxs_bpc = [0]
+
+        surfaces = []
+        bpa_clocks = []
+        pal_ani_clocks = []
+        # Chunks using the same animations share the same clocks.
+        bpa_clocks_by_bpas = {}
+        pal_ani_clocks_by_pals = {}
+        # The palettes for each frame of palette animation
+        pal_ani_palettes = []
+        if bpl.has_palette_animation:
+            pal_ani_palettes = [
+                list(itertools.chain.from_iterable(bpl.apply_palette_animations(pal_ani)))
+                for pal_ani in range(0, len(bpl.animation_palette))
+            ]
+        # For each layer: The chunks that still need their animation frames rendered
+        # as (chunk_idx, chunk_images, has_pal_ani)
+        pending_animated_chunks = []
+
+        # For each layer...
+        for layer_idx, layer_idx_bpc in enumerate(layer_idxs_bpc):
+            chunks_current_layer = []
+            surfaces.append(chunks_current_layer)
+            bpa_clocks_current_layer = []
+            bpa_clocks.append(bpa_clocks_current_layer)
+            pal_ani_clocks_current_layer = []
+            pal_ani_clocks.append(pal_ani_clocks_current_layer)
+            pending_current_layer = []
+            pending_animated_chunks.append(pending_current_layer)
+            first_frames_current_layer = []
+            # For each chunk...
+            for chunk_idx in range(0, bpc.layers[layer_idx_bpc].chunk_tilemap_len):
+                chunk_data = bpc.get_chunk(layer_idx_bpc, chunk_idx)
+                chunk_images = bpc.single_chunk_animated_to_pil(layer_idx_bpc, chunk_idx, bpl.palettes, bpas)
+                if not weird_palette:
+                    for x in chunk_images:
+                        if x.getextrema()[1] // 16 >= max_pal:
+                            # If one chunk uses weird palette values, display the warning
+                            weird_palette = True
+                            break
+                has_pal_ani = any(bpl.is_palette_affected_by_animation(chunk.pal_idx) for chunk in chunk_data)
+                bpa_clocks_current_layer.append(
+                    self._get_bpa_clock(bpc, bpas, layer_idx_bpc, chunk_data, bpa_clocks_by_bpas)
+                )
+                pal_ani_clocks_current_layer.append(
+                    self._get_pal_ani_clock(bpl, chunk_data, pal_ani_clocks_by_pals) if has_pal_ani else None
+                )
+
+                # For now only the first frame of palette animation and tile animation
+                first_frames_current_layer.append(self._chunk_image_to_rgba(
+                    chunk_images[0], self._chunk_image_mask(chunk_images[0]),
+                    pal_ani_palettes[0] if has_pal_ani else None
+                ))
+                if len(chunk_images) > 1 or (has_pal_ani and len(pal_ani_palettes) > 1):
+                    pending_current_layer.append((chunk_idx, chunk_images, has_pal_ani))
+
+            # All chunks of the layer share one atlas surface
+            if len(first_frames_current_layer) > 0:
+                for surface in self._images_to_surfaces(first_frames_current_layer):
+                    chunks_current_layer.append([[surface]])
+
+        bpa_durations = 0
+        for bpa in bpas:
+            if bpa is not None:
+                single_bpa_duration = max(info.duration_per_frame for info in bpa.frame_info) if len(bpa.frame_info) > 0 else 9999
+                if single_bpa_duration > bpa_durations:
+                    bpa_durations = single_bpa_duration
+
+        pal_ani_durations = 0
+        if bpl.has_palette_animation:
+            pal_ani_durations = max(spec.duration_per_frame for spec in bpl.animation_specs)
+
+        return _RenderedChunks(
+            surfaces, bpa_clocks, pal_ani_clocks, bpa_durations, pal_ani_durations, weird_palette,
+            pending_animated_chunks, pal_ani_palettes
+        )
+
+    async def _render_animation_frames(self, generation, pending_animated_chunks, pal_ani_palettes):
+        """Renders all animation frames of the given chunks, layer by layer, and hands them to the main thread."""
+        for layer_idx, pending_current_layer in enumerate(pending_animated_chunks):
+            if len(pending_current_layer) < 1:
+                continue
+            rendered = []
+            for chunk_idx, chunk_images, has_pal_ani in pending_current_layer:
+                if generation != self._generation:
+                    return
+                masks = [self._chunk_image_mask(img) for img in chunk_images]
+                rendered.append((chunk_idx, [
+                    [self._chunk_image_to_rgba(img, mask, palette) for img, mask in zip(chunk_images, masks)]
+                    for palette in (pal_ani_palettes if has_pal_ani else [None])
+                ]))
+                # Let other tasks run in between chunks
+                await asyncio.sleep(0)
+            GLib.idle_add(
+                self._on_animation_frames_rendered, generation, layer_idx,
+                self._chunk_frames_to_atlas_surfaces(rendered)
+            )
+
+    def _on_animation_frames_rendered(self, generation, layer_idx, rendered):
+        if generation != self._generation:
+            return False
+        for chunk_idx, pal_ani_frames in rendered:
+            self.surfaces[layer_idx][chunk_idx] = pal_ani_frames
+        self._on_frames_rendered()
+        return False
+
+    @staticmethod
+    def _chunk_image_mask(img: Image.Image) -> Image.Image:
+        """Returns the transparency mask for an indexed chunk image."""
+        img_mask = img.copy()
+        img_mask.putpalette(MASK_PAL)
+        return img_mask.convert('1')
+
+    @staticmethod
+    def _chunk_image_to_rgba(img: Image.Image, mask: Image.Image, palette: Optional[List[int]]) -> Image.Image:
+        """Converts an indexed chunk image to RGBA, optionally switching out its palette first."""
+        if palette is not None:
+            # Switch out the palette with that from the palette animation
+            img = img.copy()
+            img.putpalette(palette)
+        img = img.convert('RGBA')
+        img.putalpha(mask)
+        return img
+
+    @staticmethod
+    def _images_to_surfaces(images: List[Image.Image]) -> List[cairo.Surface]:
+        """Converts chunk images to surfaces, that all share the memory of one atlas surface."""
+        return pil_to_cairo_atlas_surfaces(images)
+
+    @classmethod
+    def _chunk_frames_to_atlas_surfaces(
+            cls, chunk_frames: List[Tuple[int, List[List[Image.Image]]]]
+    ) -> List[Tuple[int, List[List[cairo.Surface]]]]:
+        """
+        Converts the animation frames of many chunks to surfaces. All chunks share one atlas surface per
+        combination of palette animation frame and BPA frame.
+        """
+        images_by_frame = {}
+        for i, (_, pal_ani_frames) in enumerate(chunk_frames):
+            for pal_ani, bpa_ani_frames in enumerate(pal_ani_frames):
+                for bpa_ani, img in enumerate(bpa_ani_frames):
+                    images_by_frame.setdefault((pal_ani, bpa_ani), []).append((i, img))
+        surfaces = [[[None] * len(bpa_ani_frames) for bpa_ani_frames in pal_ani_frames]
+                    for _, pal_ani_frames in chunk_frames]
+        for (pal_ani, bpa_ani), images in images_by_frame.items():
+            atlas_surfaces = cls._images_to_surfaces([img for _, img in images])
+            for (i, _), surface in zip(images, atlas_surfaces):
+                surfaces[i][pal_ani][bpa_ani] = surface
+        return [(chunk_idx, surfaces[i]) for i, (chunk_idx, _) in enumerate(chunk_frames)]
+
+    @staticmethod
+    def _get_bpa_clock(bpc: Bpc, bpas: List[Union[None, Bpa]], layer_idx_bpc,
+                       chunk_data, clocks_by_bpas) -> Optional[AnimationClock]:
+        """
+        Returns the animation clock for the BPA frames of a chunk, based on the BPAs its tiles are from.
+        single_chunk_animated_to_pil advances all BPAs of a chunk in lockstep, so for chunks that
+        use tiles of more than one BPA, each frame is held as long as the slowest of these BPAs holds it.
+        """
+        ldata = bpc.layers[layer_idx_bpc]
+        layer_bpas = [bpa for bpa in bpas[layer_idx_bpc * 4:layer_idx_bpc * 4 + 4] if bpa is not None]
+        used_bpas = set()
+        for tile in chunk_data:
+            # BPA tiles are stored after the BPC tiles, in order of the BPAs.
+            bpa_tile_idx = tile.idx - ldata.number_tiles - 1
+            for bpa_idx, bpa in enumerate(layer_bpas):
+                if bpa_tile_idx < 0:
+                    break
+                if bpa_tile_idx < bpa.number_of_tiles:
+                    if bpa.number_of_frames > 0 and len(bpa.frame_info) > 0:
+                        used_bpas.add(bpa_idx)
+                    break
+                bpa_tile_idx -= bpa.number_of_tiles
+        if len(used_bpas) < 1:
+            return None
+        key = (layer_idx_bpc, tuple(sorted(used_bpas)))
+        if key not in clocks_by_bpas:
+            clocks_by_bpas[key] = AnimationClock.lockstep([
+                [bpa.frame_info[frame % len(bpa.frame_info)].duration_per_frame
+                 for frame in range(0, bpa.number_of_frames)]
+                for bpa in (layer_bpas[bpa_idx] for bpa_idx in key[1])
+            ])
+        return clocks_by_bpas[key]
+
+    @staticmethod
+    def _get_pal_ani_clock(bpl: Bpl, chunk_data, clocks_by_pals) -> AnimationClock:
+        """
+        Returns the animation clock for the palette animation frames of a chunk, based on the animated palettes
+        it uses.
+        The frames of the palette animation (see Bpl.apply_palette_animations) are shared by all animated
+        palettes: Frame i switches every animated palette to its frame of the global animation palette at the
+        same time, so palettes can't be advanced on their own. Every animated palette still has its own
+        duration_per_frame, so chunks using one animated palette get a clock running at its speed, and chunks
+        that use more than one animated palette hold each frame as long as the slowest of them.
+        """
+        key = tuple(sorted(set(
+            chunk.pal_idx for chunk in chunk_data if bpl.is_palette_affected_by_animation(chunk.pal_idx)
+        )))
+        if key not in clocks_by_pals:
+            clocks_by_pals[key] = AnimationClock([
+                max(bpl.animation_specs[pal_idx].duration_per_frame for pal_idx in key)
+            ])
+        return clocks_by_pals[key]
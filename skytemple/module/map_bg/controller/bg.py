@@ -15,26 +15,23 @@
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 
-import itertools
 from typing import TYPE_CHECKING
 
 import gi
-from gi.repository import Gtk, Gdk
+from gi.repository import Gtk, Gdk, GLib
 from gi.repository.GObject import TYPE_PYOBJECT
 from gi.repository.GdkPixbuf import Pixbuf, Colorspace
 from gi.repository.Gtk import *
 
 from skytemple.controller.main import MainController
-from skytemple.core.img_utils import pil_to_cairo_surface
 from skytemple.core.module_controller import AbstractController
 from skytemple.core.open_request import OpenRequest, REQUEST_TYPE_SCENE
+from skytemple.module.map_bg.chunk_surfaces import ChunkSurfaces
 from skytemple.module.map_bg.controller.bg_menu import BgMenuController
 from skytemple.module.map_bg.drawer import Drawer, DrawerCellRenderer, DrawerInteraction
 from skytemple_files.common.types.file_types import FileType
 from skytemple_files.graphics.bg_list_dat.model import BMA_EXT, BPC_EXT, BPL_EXT, BPA_EXT, DIR
-from skytemple_files.graphics.bma.model import MASK_PAL
 from skytemple_files.graphics.bpc.model import BPC_TILE_DIM
-from skytemple_files.graphics.bpl.model import BPL_NORMAL_MAX_PAL
 
 if TYPE_CHECKING:
     from skytemple.module.map_bg.module import MapBgModule
@@ -57,6 +54,10 @@ class BgController(AbstractController):
         # chunks_surfaces[layer_number][chunk_idx][palette_animation_frame][frame]
         self.chunks_surfaces = []
         self.bpa_durations = 0
+        # The animation clocks for each chunk in each layer, see AnimationContext
+        # bpa_clocks[layer_number][chunk_idx]
+        self.bpa_clocks = []
+        self.pal_ani_clocks = []
 
         self.drawer: Drawer = None
         self.current_icon_view_renderer: DrawerCellRenderer = None
@@ -69,6 +70,7 @@ class BgController(AbstractController):
 
         self.bg_draw_is_clicked = False
 
+        self._chunk_surfaces = ChunkSurfaces(self._on_chunk_animation_frames_rendered)
         self._init_chunk_imgs()
 
         self.menu_controller = BgMenuController(self)
@@ -93,13 +95,6 @@ class BgController(AbstractController):
         self._refresh_metadata()
         self._init_rest_room_note()
         self.builder.connect_signals(self)
-        try:
-            # Invalidate SSA scene cache for this BG
-            # TODO: This is obviously very ugly coupling...
-            from skytemple.module.script.controller.ssa import SsaController
-            SsaController.map_bg_surface_cache = (None, )
-        except ImportError:
-            pass
         if self._was_asset_copied:
                 md = Gtk.MessageDialog(MainController.window(),
                                        Gtk.DialogFlags.DESTROY_WITH_PARENT, Gtk.MessageType.INFO,
@@ -134,6 +129,7 @@ class BgController(AbstractController):
                 snap_x = correct_mouse_x - correct_mouse_x % BPC_TILE_DIM
                 snap_y = correct_mouse_y - correct_mouse_y % BPC_TILE_DIM
                 self._set_data_at_pos(snap_x, snap_y)
+            self.bg_draw.queue_draw()
 
     def on_bg_draw_release(self, box, button: Gdk.EventButton):
         if button.button == 1:
@@ -333,72 +329,33 @@ class BgController(AbstractController):
             self.builder.get_object('editor_warning_palette').set_revealed(self.weird_palette)
         
     def _init_chunk_imgs(self):
-        """(Re)-draw the chunk images"""
-
-        # Set the weird palette warning to false
-        self.weird_palette = False
-        
-        if self.bpc.number_of_layers > 1:
-            layer_idxs_bpc = [1, 0]
-        else:
-            layer_idxs_bpc = [0]
+        """
+        (Re)-draw the chunk images.
+        Only the first frame of each chunk is converted right away, so the view can be shown quickly.
+        The remaining animation frames are rendered in the background and swapped in when they are done.
+        """
+        self._chunk_surfaces.render(self.bpc, self.bpl, self.bpas)
+        self._update_chunk_imgs()
+
+    def _update_chunk_imgs(self):
+        self.chunks_surfaces = self._chunk_surfaces.surfaces
+        self.bpa_clocks = self._chunk_surfaces.bpa_clocks
+        self.pal_ani_clocks = self._chunk_surfaces.pal_ani_clocks
+        self.bpa_durations = self._chunk_surfaces.bpa_durations
+        self.pal_ani_durations = self._chunk_surfaces.pal_ani_durations
+        self.weird_palette = self._chunk_surfaces.weird_palette
+        self.set_warning_palette()
 
-        self.chunks_surfaces = []
+    def _on_chunk_animation_frames_rendered(self):
+        if self.drawer:
+            self.drawer.reset(self.bma, self.bpa_durations, self.pal_ani_durations, self.chunks_surfaces,
+                              self.bpa_clocks, self.pal_ani_clocks)
+            self.bg_draw.queue_draw()
+        if self.current_icon_view_renderer:
+            self.current_icon_view_renderer.reset(None, self.bpa_durations, self.pal_ani_durations,
+                                                  self.chunks_surfaces, self.bpa_clocks, self.pal_ani_clocks)
+            self.builder.get_object('bg_chunks_view').queue_draw()
 
-        # For each layer...
-        for layer_idx, layer_idx_bpc in enumerate(layer_idxs_bpc):
-            chunks_current_layer = []
-            self.chunks_surfaces.append(chunks_current_layer)
-            # For each chunk...
-            for chunk_idx in range(0, self.bpc.layers[layer_idx_bpc].chunk_tilemap_len):
-                # For each frame of palette animation... ( applicable for this chunk )
-                pal_ani_frames = []
-                chunks_current_layer.append(pal_ani_frames)
-
-                chunk_data = self.bpc.get_chunk(layer_idx_bpc, chunk_idx)
-                chunk_images = self.bpc.single_chunk_animated_to_pil(layer_idx_bpc, chunk_idx, self.bpl.palettes, self.bpas)
-                if not self.weird_palette:
-                    for x in chunk_images:
-                        for n in x.tobytes("raw", "P"):
-                            n//=16
-                            if n>=self.bpl.number_palettes or n>=BPL_NORMAL_MAX_PAL:
-                                # If one chunk uses weird palette values, display the warning
-                                self.weird_palette = True
-                                break
-                        if self.weird_palette:break 
-                has_pal_ani = any(self.bpl.is_palette_affected_by_animation(chunk.pal_idx) for chunk in chunk_data)
-                len_pal_ani = len(self.bpl.animation_palette) if has_pal_ani else 1
-
-                for pal_ani in range(0, len_pal_ani):
-                    # For each frame of tile animation...
-                    bpa_ani_frames = []
-                    pal_ani_frames.append(bpa_ani_frames)
-                    for img in chunk_images:
-                        # Switch out the palette with that from the palette animation
-                        if has_pal_ani:
-                            pal_for_frame = itertools.chain.from_iterable(self.bpl.apply_palette_animations(pal_ani))
-                            img.putpalette(pal_for_frame)
-                        # Remove alpha first
-                        img_mask = img.copy()
-                        img_mask.putpalette(MASK_PAL)
-                        img_mask = img_mask.convert('1')
-                        img = img.convert('RGBA')
-                        img.putalpha(img_mask)
-                        bpa_ani_frames.append(pil_to_cairo_surface(img))
-
-            # TODO: No BPAs at different speeds supported at the moment
-            self.bpa_durations = 0
-            for bpa in self.bpas:
-                if bpa is not None:
-                    single_bpa_duration = max(info.duration_per_frame for info in bpa.frame_info) if len(bpa.frame_info) > 0 else 9999
-                    if single_bpa_duration > self.bpa_durations:
-                        self.bpa_durations = single_bpa_duration
-
-            # TODO: No BPL animations at different speeds supported at the moment
-            self.pal_ani_durations = 0
-            if self.bpl.has_palette_animation:
-                self.pal_ani_durations = max(spec.duration_per_frame for spec in self.bpl.animation_specs)
-        self.set_warning_palette()
     def _init_drawer(self):
         """(Re)-initialize the main drawing area"""
         bg_draw_sw: ScrolledWindow = self.builder.get_object('bg_draw_sw')
@@ -428,7 +385,8 @@ class BgController(AbstractController):
             self.bma.map_height_chunks * self.bma.tiling_height * BPC_TILE_DIM
         )
 
-        self.drawer = Drawer(self.bg_draw, self.bma, self.bpa_durations, self.pal_ani_durations, self.chunks_surfaces)
+        self.drawer = Drawer(self.bg_draw, self.bma, self.bpa_durations, self.pal_ani_durations, self.chunks_surfaces,
+                             self.bpa_clocks, self.pal_ani_clocks)
         self.drawer.start()
 
     def _init_drawer_layer_selected(self):
@@ -468,7 +426,8 @@ class BgController(AbstractController):
         icon_view.set_selection_mode(Gtk.SelectionMode.BROWSE)
         self.current_icon_view_renderer = DrawerCellRenderer(icon_view, layer_number,
                                                              self.bpa_durations, self.pal_ani_durations,
-                                                             self.chunks_surfaces)
+                                                             self.chunks_surfaces,
+                                                             self.bpa_clocks, self.pal_ani_clocks)
         store = Gtk.ListStore(int)
         icon_view.set_model(store)
         icon_view.pack_start(self.current_icon_view_renderer, True)
@@ -632,13 +591,18 @@ class BgController(AbstractController):
 
     def reload_all(self):
         """Reload all image related things"""
+        self.bpas = self.module.get_bpas(self.item_id)
+        # The chunks are rendered in the background, until then the old chunk images are shown.
+        self._chunk_surfaces.render_async(self.bpc, self.bpl, self.bpas, self._on_chunk_imgs_reloaded)
+        self._refresh_metadata()
+
+    def _on_chunk_imgs_reloaded(self):
         if self.current_icon_view_renderer:
             self.current_icon_view_renderer.stop()
-        self.bpas = self.module.get_bpas(self.item_id)
-        self._init_chunk_imgs()
-        self.drawer.reset(self.bma, self.bpa_durations, self.pal_ani_durations, self.chunks_surfaces)
+        self._update_chunk_imgs()
+        self.drawer.reset(self.bma, self.bpa_durations, self.pal_ani_durations, self.chunks_surfaces,
+                          self.bpa_clocks, self.pal_ani_clocks)
         self._init_tab(self.notebook.get_nth_page(self.notebook.get_current_page()))
-        self._refresh_metadata()
 
     def _init_rest_room_note(self):
         """If the data layer of this map contains 0x08, this is probably a rest room"""
@@ -16,8 +16,9 @@
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
 
+import math
 from enum import Enum, auto
-from typing import List, Union, Iterable
+from typing import List, Union, Iterable, Optional, Tuple
 
 from gi.repository import GLib, Gtk
 from gi.repository.GObject import ParamFlags
@@ -26,12 +27,14 @@ from gi.repository.Gtk import Widget
 from skytemple.core.events.manager import EventManager
 from skytemple.core.mapbg_util.drawer_plugin.grid import GridDrawerPlugin
 from skytemple.core.mapbg_util.drawer_plugin.selection import SelectionDrawerPlugin
-from skytemple.module.tiled_img.animation_context import AnimationContext
+from skytemple.module.tiled_img.animation_context import AnimationContext, AnimationClock
 from skytemple_files.graphics.bma.model import Bma
 import cairo
 
 from skytemple_files.graphics.bpc.model import BPC_TILE_DIM
 FPS = 60
+# If more animated chunks than this are visible, the entire area is redrawn instead of the single chunks.
+MAX_ANIMATED_AREAS_TO_QUEUE = 64
 
 
 class DrawerInteraction(Enum):
@@ -45,7 +48,9 @@ class Drawer:
     def __init__(
             self, draw_area: Widget, bma: Union[Bma, None], bpa_durations: int, pal_ani_durations: int,
             # chunks_surfaces[layer_number][chunk_idx][palette_animation_frame][frame]
-            chunks_surfaces: List[Iterable[Iterable[List[cairo.Surface]]]]
+            chunks_surfaces: List[Iterable[Iterable[List[cairo.Surface]]]],
+            bpa_clocks: Optional[List[List[Optional[AnimationClock]]]] = None,
+            pal_ani_clocks: Optional[List[List[Optional[AnimationClock]]]] = None
     ):
         """
         Initialize a drawer...
@@ -53,10 +58,12 @@ class Drawer:
         :param bma: Either a BMA with tile indexes or None, has to be set manually then for drawing
         :param bpa_durations: How many frames to hold a BPA animation tile
         :param chunks_surfaces: Bg controller format chunk surfaces
+        :param bpa_clocks: Optional BPA animation clock for each chunk, see AnimationContext
+        :param pal_ani_clocks: Optional palette animation clock for each chunk, see AnimationContext
         """
         self.draw_area = draw_area
 
-        self.reset(bma, bpa_durations, pal_ani_durations, chunks_surfaces)
+        self.reset(bma, bpa_durations, pal_ani_durations, chunks_surfaces, bpa_clocks, pal_ani_clocks)
 
         self.draw_chunk_grid = False
         self.draw_tile_grid = False
@@ -87,9 +94,12 @@ class Drawer:
         self.scale = 1
 
         self.drawing_is_active = False
+        # The GLib source ID of the scheduled animation tick and how many frames it will advance.
+        self._tick_source_id: Optional[int] = None
+        self._ticks_scheduled = 0
 
     # noinspection PyAttributeOutsideInit
-    def reset(self, bma, bpa_durations, pal_ani_durations, chunks_surfaces):
+    def reset(self, bma, bpa_durations, pal_ani_durations, chunks_surfaces, bpa_clocks=None, pal_ani_clocks=None):
         if isinstance(bma, Bma):
             self.tiling_width = bma.tiling_width
             self.tiling_height = bma.tiling_height
@@ -113,7 +123,25 @@ class Drawer:
             self.collision2 = None
             self.data_layer = None
 
-        self.animation_context = AnimationContext(chunks_surfaces, bpa_durations, pal_ani_durations)
+        self.animation_context = AnimationContext(
+            chunks_surfaces, bpa_durations, pal_ani_durations, bpa_clocks, pal_ani_clocks
+        )
+        self.invalidate_static_layers()
+        if getattr(self, 'drawing_is_active', False):
+            self._schedule_tick()
+
+    def invalidate_static_layers(self):
+        """
+        Drop the cached surfaces of the static (not animated) chunks of each layer.
+        This is done automatically if the chunk mappings change.
+        """
+        # For each layer: The mappings the surface was rendered for, the surface and the mapping indices of animated
+        # chunks, which are not part of the surface.
+        self._static_layers: List[Optional[Tuple[List[int], cairo.Surface, List[int]]]] = [
+            None for _ in range(0, len(self.mappings))
+        ]
+        if self.draw_area is not None:
+            self.draw_area.queue_draw()
 
     def start(self):
         """Start drawing on the DrawingArea"""
@@ -121,22 +149,105 @@ class Drawer:
         if isinstance(self.draw_area, Gtk.DrawingArea):
             self.draw_area.connect('draw', self.draw)
         self.draw_area.queue_draw()
-        GLib.timeout_add(int(1000 / FPS), self._tick)
+        self._schedule_tick()
+
+    def start_animation(self):
+        """
+        Only start the animation, without drawing on the DrawingArea.
+        For drawers that are drawn by another drawer, which calls draw itself.
+        """
+        self.drawing_is_active = True
+        self._schedule_tick()
 
     def stop(self):
         self.drawing_is_active = False
+        if self._tick_source_id is not None:
+            GLib.source_remove(self._tick_source_id)
+            self._tick_source_id = None
+
+    def _schedule_tick(self):
+        """
+        Schedule the next animation tick for when the next animation frame changes.
+        For maps without animations, no tick is scheduled at all.
+        """
+        if self._tick_source_id is not None:
+            GLib.source_remove(self._tick_source_id)
+            self._tick_source_id = None
+        ticks = self.animation_context.ticks_until_change()
+        if ticks is None or not self.drawing_is_active:
+            return
+        self._ticks_scheduled = ticks
+        self._tick_source_id = GLib.timeout_add(int(1000 * ticks / FPS), self._tick)
 
     def _tick(self):
+        self._tick_source_id = None
         if self.draw_area is None:
             return False
         if self.draw_area is not None and self.draw_area.get_parent() is None:
             # XXX: Gtk doesn't remove the widget on switch sometimes...
             self.draw_area.destroy()
             return False
-        self.animation_context.advance()
-        if EventManager.instance().get_if_main_window_has_fous():
-            self.draw_area.queue_draw()
-        return self.drawing_is_active
+        changed = self.animation_context.advance(self._ticks_scheduled)
+        if changed and EventManager.instance().get_if_main_window_has_fous():
+            if isinstance(self.draw_area, Gtk.DrawingArea):
+                self._queue_animated_areas()
+            else:
+                self.draw_area.queue_draw()
+        self._schedule_tick()
+        return False
+
+    def _queue_animated_areas(self):
+        """Only queue the areas of the animated chunks to be redrawn."""
+        chunk_width = self.tiling_width * BPC_TILE_DIM
+        chunk_height = self.tiling_height * BPC_TILE_DIM
+        areas = []
+        for static_layer in self._static_layers:
+            if static_layer is None:
+                # This layer is not drawn.
+                continue
+            for i in static_layer[2]:
+                areas.append((i % self.width_in_chunks * chunk_width, i // self.width_in_chunks * chunk_height))
+                if len(areas) > MAX_ANIMATED_AREAS_TO_QUEUE:
+                    self.draw_area.queue_draw()
+                    return
+        if self.interaction_mode == DrawerInteraction.CHUNKS:
+            # The selected chunk under the mouse may be animated.
+            areas.append((self.mouse_x, self.mouse_y))
+        for x, y in areas:
+            self.draw_area.queue_draw_area(
+                math.floor(x * self.scale), math.floor(y * self.scale),
+                math.ceil(chunk_width * self.scale), math.ceil(chunk_height * self.scale)
+            )
+
+    def _get_static_layer(self, layer_idx: int, chunks_at_frame: List[cairo.Surface]) -> Tuple[cairo.Surface, List[int]]:
+        """
+        Returns a surface with all static chunks of the layer and the mapping indices of the animated chunks,
+        which have to be drawn separately.
+        """
+        mappings = self.mappings[layer_idx]
+        static_layer = self._static_layers[layer_idx]
+        if static_layer is None or static_layer[0] != mappings:
+            chunk_width = self.tiling_width * BPC_TILE_DIM
+            chunk_height = self.tiling_height * BPC_TILE_DIM
+            animated = set(self.animation_context.animated[layer_idx])
+            surface = cairo.ImageSurface(
+                cairo.FORMAT_ARGB32, self.width_in_chunks * chunk_width, self.height_in_chunks * chunk_height
+            )
+            ctx = cairo.Context(surface)
+            animated_positions = []
+            for i, chunk_at_pos in enumerate(mappings):
+                if 0 < chunk_at_pos < len(chunks_at_frame):
+                    if chunk_at_pos in animated:
+                        animated_positions.append(i)
+                        continue
+                    ctx.set_source_surface(
+                        chunks_at_frame[chunk_at_pos],
+                        i % self.width_in_chunks * chunk_width, i // self.width_in_chunks * chunk_height
+                    )
+                    ctx.paint()
+            static_layer = (list(mappings), surface, animated_positions)
+            self._static_layers[layer_idx] = static_layer
+        return static_layer[1], static_layer[2]
 
     def draw(self, wdg, ctx: cairo.Context, do_translates=True):
         ctx.set_antialias(cairo.Antialias.NONE)
@@ -155,33 +266,35 @@ class Drawer:
         )
         ctx.fill()
 
+        # Only the area inside the clip rectangle needs to be drawn.
+        clip_x1, clip_y1, clip_x2, clip_y2 = ctx.clip_extents()
+
         # Layers
         for layer_idx, chunks_at_frame in enumerate(self.animation_context.current()):
             if self.show_only_edited_layer and layer_idx != self.edited_layer:
                 continue
-            current_layer_mappings = self.mappings[layer_idx]
-            for i, chunk_at_pos in enumerate(current_layer_mappings):
-                if 0 < chunk_at_pos < len(chunks_at_frame):
-                    chunk = chunks_at_frame[chunk_at_pos]
-                    ctx.set_source_surface(chunk, 0, 0)
-                    ctx.get_source().set_filter(cairo.Filter.NEAREST)
-                    if self.edited_layer != -1 and layer_idx > 0 and layer_idx != self.edited_layer:
-                        # For Layer 1 if not the current edited: Set an alpha mask
-                        ctx.paint_with_alpha(0.7)
-                    else:
-                        ctx.paint()
-                if (i + 1) % self.width_in_chunks == 0:
-                    # Move to beginning of next line
-                    if do_translates:
-                        ctx.translate(-chunk_width * (self.width_in_chunks - 1), chunk_height)
-                else:
-                    # Move to next tile in line
-                    if do_translates:
-                        ctx.translate(chunk_width, 0)
-
-            # Move back to beginning
+            # For Layer 1 if not the current edited: Set an alpha mask
+            use_alpha = self.edited_layer != -1 and layer_idx > 0 and layer_idx != self.edited_layer
             if do_translates:
-                ctx.translate(0, -chunk_height * self.height_in_chunks)
+                static_surface, animated_positions = self._get_static_layer(layer_idx, chunks_at_frame)
+                ctx.set_source_surface(static_surface, 0, 0)
+                ctx.get_source().set_filter(cairo.Filter.NEAREST)
+                if use_alpha:
+                    ctx.paint_with_alpha(0.7)
+                else:
+                    ctx.paint()
+                current_layer_mappings = self.mappings[layer_idx]
+                for i in animated_positions:
+                    x = i % self.width_in_chunks * chunk_width
+                    y = i // self.width_in_chunks * chunk_height
+                    if x + chunk_width < clip_x1 or y + chunk_height < clip_y1 or x > clip_x2 or y > clip_y2:
+                        continue
+                    self._draw_chunk(ctx, chunks_at_frame[current_layer_mappings[i]], x, y, use_alpha)
+            else:
+                # Single chunks (cell renderer): All chunks are drawn at the origin.
+                for chunk_at_pos in self.mappings[layer_idx]:
+                    if 0 < chunk_at_pos < len(chunks_at_frame):
+                        self._draw_chunk(ctx, chunks_at_frame[chunk_at_pos], 0, 0, use_alpha)
 
             if (self.edited_layer != -1 and layer_idx < 1 and layer_idx != self.edited_layer) \
                 or (layer_idx == 1 and self.dim_layers) \
@@ -197,6 +310,19 @@ class Drawer:
                 )
                 ctx.fill()
 
+        # Visible tiles for the collision and data layers
+        if self.width_in_tiles is not None:
+            first_col = max(0, int(clip_x1 // BPC_TILE_DIM))
+            last_col = min(self.width_in_tiles, math.ceil(clip_x2 / BPC_TILE_DIM))
+            first_row = max(0, int(clip_y1 // BPC_TILE_DIM))
+            last_row = min(self.height_in_tiles, math.ceil(clip_y2 / BPC_TILE_DIM))
+            visible_tiles = [
+                (row * self.width_in_tiles + col, col * BPC_TILE_DIM, row * BPC_TILE_DIM)
+                for row in range(first_row, last_row) for col in range(first_col, last_col)
+            ]
+        else:
+            visible_tiles = []
+
         # Col 1 and 2
         for col_index, should_draw in enumerate([self.draw_collision1, self.draw_collision2]):
             if should_draw:
@@ -207,46 +333,25 @@ class Drawer:
                     ctx.set_source_rgba(0, 1, 0, 0.4)
                     col = self.collision2
 
-                for i, col in enumerate(col):
-                    if col:
+                for i, x, y in visible_tiles:
+                    if col[i]:
                         ctx.rectangle(
-                            0, 0,
+                            x, y,
                             BPC_TILE_DIM,
                             BPC_TILE_DIM
                         )
-                        ctx.fill()
-                    if (i + 1) % self.width_in_tiles == 0:
-                        # Move to beginning of next line
-                        if do_translates:
-                            ctx.translate(-BPC_TILE_DIM * (self.width_in_tiles - 1), BPC_TILE_DIM)
-                    else:
-                        # Move to next tile in line
-                        if do_translates:
-                            ctx.translate(BPC_TILE_DIM, 0)
-                # Move back to beginning
-                if do_translates:
-                    ctx.translate(0, -BPC_TILE_DIM * self.height_in_tiles)
+                ctx.fill()
 
         # Data
         if self.draw_data_layer:
             ctx.select_font_face("monospace", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_NORMAL)
             ctx.set_font_size(6)
             ctx.set_source_rgb(0, 0, 1)
-            for i, dat in enumerate(self.data_layer):
+            for i, x, y in visible_tiles:
+                dat = self.data_layer[i]
                 if dat > 0:
-                    ctx.move_to(0, BPC_TILE_DIM - 2)
+                    ctx.move_to(x, y + BPC_TILE_DIM - 2)
                     ctx.show_text(f"{dat:02x}")
-                if (i + 1) % self.width_in_tiles == 0:
-                    # Move to beginning of next line
-                    if do_translates:
-                        ctx.translate(-BPC_TILE_DIM * (self.width_in_tiles - 1), BPC_TILE_DIM)
-                else:
-                    # Move to next tile in line
-                    if do_translates:
-                        ctx.translate(BPC_TILE_DIM, 0)
-            # Move back to beginning
-            if do_translates:
-                ctx.translate(0, -BPC_TILE_DIM * self.height_in_tiles)
 
         size_w, size_h = self.draw_area.get_size_request()
         size_w /= self.scale
@@ -267,6 +372,15 @@ class Drawer:
             self.chunk_grid_plugin.draw(ctx, size_w, size_h, self.mouse_x, self.mouse_y)
         return True
 
+    @staticmethod
+    def _draw_chunk(ctx: cairo.Context, chunk: cairo.Surface, x: int, y: int, use_alpha: bool):
+        ctx.set_source_surface(chunk, x, y)
+        ctx.get_source().set_filter(cairo.Filter.NEAREST)
+        if use_alpha:
+            ctx.paint_with_alpha(0.7)
+        else:
+            ctx.paint()
+
     def selection_draw_callback(self, ctx: cairo.Context, x: int, y: int):
         if self.interaction_mode == DrawerInteraction.CHUNKS:
             # Draw a chunk
@@ -295,24 +409,32 @@ class Drawer:
                 ctx.move_to(x, y + BPC_TILE_DIM - 2)
                 ctx.show_text(f"{self.interaction_dat_value:02x}")
 
+    def _queue_draw(self):
+        if self.draw_area is not None:
+            self.draw_area.queue_draw()
+
     def set_mouse_position(self, x, y):
         self.mouse_x = x
         self.mouse_y = y
+        self._queue_draw()
 
     def set_selected_chunk(self, chunk_id):
         self.interaction_chunks_selected_id = chunk_id
+        self._queue_draw()
 
     def get_selected_chunk_id(self):
         return self.interaction_chunks_selected_id
 
     def set_interaction_col_solid(self, v):
         self.interaction_col_solid = v
+        self._queue_draw()
 
     def get_interaction_col_solid(self):
         return self.interaction_col_solid
 
     def set_interaction_dat_value(self, v):
         self.interaction_dat_value = v
+        self._queue_draw()
 
     def get_interaction_dat_value(self):
         return self.interaction_dat_value
@@ -327,9 +449,11 @@ class Drawer:
         self.draw_data_layer = False
         self.edited_collision = -1
         self.interaction_mode = DrawerInteraction.CHUNKS
+        self._queue_draw()
 
     def set_show_only_edited_layer(self, v):
         self.show_only_edited_layer = v
+        self._queue_draw()
 
     def set_edited_collision(self, collision_id):
         self.dim_layers = True
@@ -343,6 +467,7 @@ class Drawer:
             self.draw_collision2 = True
         self.edited_collision = collision_id
         self.interaction_mode = DrawerInteraction.COL
+        self._queue_draw()
 
     def get_edited_collision(self):
         return self.edited_collision
@@ -355,21 +480,26 @@ class Drawer:
         self.draw_collision2 = False
         self.draw_data_layer = True
         self.interaction_mode = DrawerInteraction.DAT
+        self._queue_draw()
 
     def get_interaction_mode(self):
         return self.interaction_mode
 
     def set_draw_chunk_grid(self, v):
         self.draw_chunk_grid = v
+        self._queue_draw()
 
     def set_draw_tile_grid(self, v):
         self.draw_tile_grid = v
+        self._queue_draw()
 
     def set_pink_bg(self, v):
         self.use_pink_bg = v
+        self._queue_draw()
 
     def set_scale(self, v):
         self.scale = v
+        self._queue_draw()
 
 
 class DrawerCellRenderer(Drawer, Gtk.CellRenderer):
@@ -378,9 +508,12 @@ class DrawerCellRenderer(Drawer, Gtk.CellRenderer):
     }
 
     def __init__(self, icon_view, layer: int, bpa_durations: int, pal_ani_durations: int,
-                 chunks_surfaces: List[List[List[List[cairo.Surface]]]]):
+                 chunks_surfaces: List[List[List[List[cairo.Surface]]]],
+                 bpa_clocks: Optional[List[List[Optional[AnimationClock]]]] = None,
+                 pal_ani_clocks: Optional[List[List[Optional[AnimationClock]]]] = None):
 
-        super().__init__(icon_view, None, bpa_durations, pal_ani_durations, chunks_surfaces)
+        super().__init__(icon_view, None, bpa_durations, pal_ani_durations, chunks_surfaces,
+                         bpa_clocks, pal_ani_clocks)
         super(Gtk.CellRenderer, self).__init__()
         self.layer = layer
 
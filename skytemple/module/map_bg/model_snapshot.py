@@ -0,0 +1,75 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import copy
+from typing import List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from skytemple_files.graphics.bma.model import Bma
+    from skytemple_files.graphics.bpa.model import Bpa
+    from skytemple_files.graphics.bpc.model import Bpc
+    from skytemple_files.graphics.bpl.model import Bpl
+
+
+def snapshot_bpc(bpc: 'Bpc') -> 'Bpc':
+    """
+    Returns a copy of the BPC, that can be rendered in another thread while the BPC is used on the main thread.
+    Rendering animated chunks also temporarily changes the tile lists of the BPC layers, the copy has its own.
+    """
+    bpc_copy = copy.copy(bpc)
+    bpc_copy.layers = []
+    for layer in bpc.layers:
+        layer_copy = copy.copy(layer)
+        layer_copy.tiles = [bytearray(tile) for tile in layer.tiles]
+        layer_copy.tilemap = list(layer.tilemap)
+        layer_copy.bpas = list(layer.bpas)
+        bpc_copy.layers.append(layer_copy)
+    return bpc_copy
+
+
+def snapshot_bpl(bpl: 'Bpl') -> 'Bpl':
+    """Returns a copy of the palettes and palette animations of the BPL, see snapshot_bpc."""
+    bpl_copy = copy.copy(bpl)
+    bpl_copy.palettes = [list(palette) for palette in bpl.palettes]
+    bpl_copy.animation_palette = [list(palette) for palette in bpl.animation_palette]
+    bpl_copy.animation_specs = [copy.copy(spec) for spec in bpl.animation_specs]
+    return bpl_copy
+
+
+def snapshot_bpas(bpas: List[Optional['Bpa']]) -> List[Optional['Bpa']]:
+    """Returns copies of the tiles and frame infos of the BPAs, see snapshot_bpc."""
+    bpas_copy = []
+    for bpa in bpas:
+        if bpa is None:
+            bpas_copy.append(None)
+            continue
+        bpa_copy = copy.copy(bpa)
+        bpa_copy.tiles = [bytearray(tile) for tile in bpa.tiles]
+        bpa_copy.frame_info = [copy.copy(info) for info in bpa.frame_info]
+        bpas_copy.append(bpa_copy)
+    return bpas_copy
+
+
+def snapshot_bma(bma: 'Bma') -> 'Bma':
+    """
+    Returns a copy of the chunk layers, collision layers and data layer of the BMA, see snapshot_bpc.
+    The map editor places chunks and resizes the map by changing these lists.
+    """
+    bma_copy = copy.copy(bma)
+    for attr in ('layer0', 'layer1', 'collision', 'collision2', 'unknown_data_block'):
+        layer = getattr(bma, attr)
+        setattr(bma_copy, attr, list(layer) if layer is not None else None)
+    return bma_copy
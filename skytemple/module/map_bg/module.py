@@ -30,6 +30,7 @@ from skytemple.core.ui_utils import recursive_up_item_store_mark_as_modified, \
 from skytemple.module.map_bg.controller.bg import BgController
 from skytemple.module.map_bg.controller.folder import FolderController
 from skytemple.module.map_bg.controller.main import MainController, MAPBG_NAME
+from skytemple.module.map_bg.scene_bg_cache import SceneBgCache
 from skytemple.module.map_bg.script.add_created_with_logo import AddCreatedWithLogo
 from skytemple_files.common.types.file_types import FileType
 from skytemple_files.graphics.bg_list_dat.model import BgList
@@ -52,14 +53,25 @@ class MapBgModule(AbstractModule):
     def sort_order(cls):
         return 120
 
+    @classmethod
+    def tree_placeholder(cls):
+        return 'skytemple-e-mapbg-symbolic', MAPBG_NAME
+
+    @classmethod
+    def handled_request_types(cls):
+        return [REQUEST_TYPE_MAP_BG]
+
     def __init__(self, rom_project: RomProject):
         """Loads the list of backgrounds for the ROM."""
         self.project = rom_project
         self.bgs: BgList = rom_project.open_file_in_rom(MAP_BG_LIST, FileType.BG_LIST_DAT)
+        rom_project.pin_opened_file(MAP_BG_LIST, self)
 
         self._tree_model = None
         self._tree_level_iter = []
 
+        self._scene_bg_cache = SceneBgCache(self)
+
     def load_tree_items(self, item_store: TreeStore, root_node):
         root = item_store.append(root_node, [
             'skytemple-e-mapbg-symbolic', MAPBG_NAME, self, MainController, 0, False, '', True
@@ -141,8 +153,13 @@ class MapBgModule(AbstractModule):
                 bpas.append(self.project.open_file_in_rom(f'{MAP_BG_PATH}{bpa.lower()}.bpa', FileType.BPA))
         return bpas
 
+    def get_scene_bg_cache(self) -> SceneBgCache:
+        """Returns the cache of rendered map backgrounds for the scene editors."""
+        return self._scene_bg_cache
+
     def mark_as_modified(self, item_id):
         """Mark a specific map as modified"""
+        self._scene_bg_cache.invalidate(item_id)
         l = self.bgs.level[item_id]
         self.project.mark_as_modified(f'{MAP_BG_PATH}{l.bma_name.lower()}.bma')
         self.project.mark_as_modified(f'{MAP_BG_PATH}{l.bpc_name.lower()}.bpc')
@@ -177,6 +194,7 @@ class MapBgModule(AbstractModule):
                     item_id = i
                     break
             if item_id != -1:
+                self._scene_bg_cache.invalidate(item_id)
                 row = self._tree_model[self._tree_level_iter[item_id]]
                 recursive_up_item_store_mark_as_modified(row)
         except BaseException as err:
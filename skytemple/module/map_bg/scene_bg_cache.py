@@ -0,0 +1,110 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple, Optional, List, Callable, Set, TYPE_CHECKING
+
+import cairo
+
+from skytemple.core.img_utils import pil_to_cairo_surface
+from skytemple.module.map_bg.model_snapshot import snapshot_bma, snapshot_bpc, snapshot_bpl, snapshot_bpas
+from skytemple_files.common.task_runner import AsyncTaskRunner
+if TYPE_CHECKING:
+    from skytemple.module.map_bg.module import MapBgModule
+
+# Number of rendered map backgrounds to keep
+SCENE_BG_CACHE_SIZE = 8
+logger = logging.getLogger(__name__)
+scene_bg_cache_lock = threading.Lock()
+
+
+class SceneBgCache:
+    """
+    Cache for the map backgrounds shown (as a single frame) in the scene editors.
+    Backgrounds are rendered using the AsyncTaskRunner. The least recently used backgrounds are removed,
+    if there are more than max_size.
+
+    The entries are keyed by the map background ID and a generation, that is increased whenever the map background
+    is modified (see invalidate).
+    """
+    def __init__(self, module: 'MapBgModule', max_size: int = SCENE_BG_CACHE_SIZE):
+        self._module = module
+        self.max_size = max_size
+        self._loaded: Dict[Tuple[int, int], cairo.Surface] = OrderedDict()
+        self._generations: Dict[int, int] = {}
+        # Keys that are currently being rendered and the callbacks to call after that.
+        self._requests: Dict[Tuple[int, int], List[Callable]] = {}
+        # Keys that failed to render. They are not tried again until the map background is modified.
+        self._failed: Set[Tuple[int, int]] = set()
+
+    def get(self, item_id: int, after_load_cb: Callable = lambda: None) -> Optional[cairo.Surface]:
+        """
+        Returns the rendered map background.
+        If it is not rendered yet, None is returned instead and after_load_cb is called once it is loaded.
+        If it could not be rendered, None is returned.
+        The callback is called from the AsyncTaskRunner thread.
+        Must be called from the main thread.
+        """
+        with scene_bg_cache_lock:
+            key = (item_id, self._generations.get(item_id, 0))
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+                return self._loaded[key]
+            if key in self._failed:
+                return None
+            if key in self._requests:
+                self._requests[key].append(after_load_cb)
+                return None
+            self._requests[key] = [after_load_cb]
+        # The models are collected here, because opening files of the ROM project is not thread-safe.
+        # The render thread gets its own copies, since the models may be edited on the main thread meanwhile.
+        bma = snapshot_bma(self._module.get_bma(item_id))
+        bpl = snapshot_bpl(self._module.get_bpl(item_id))
+        bpc = snapshot_bpc(self._module.get_bpc(item_id))
+        bpas = snapshot_bpas(self._module.get_bpas(item_id))
+        AsyncTaskRunner.instance().run_task(self._load__impl(key, bma, bpl, bpc, bpas))
+        return None
+
+    def invalidate(self, item_id: int):
+        """Must be called when a map background was modified."""
+        with scene_bg_cache_lock:
+            self._generations[item_id] = self._generations.get(item_id, 0) + 1
+            for key in [key for key in self._loaded.keys() if key[0] == item_id]:
+                del self._loaded[key]
+            self._failed = {key for key in self._failed if key[0] != item_id}
+
+    async def _load__impl(self, key, bma, bpl, bpc, bpas):
+        try:
+            surface = pil_to_cairo_surface(
+                bma.to_pil(bpc, bpl, bpas, False, False, single_frame=True)[0].convert('RGBA')
+            )
+        except BaseException as ex:
+            logger.warning(f"Failed to render the map background {key[0]}.", exc_info=ex)
+            surface = None
+        with scene_bg_cache_lock:
+            callbacks = self._requests.pop(key)
+            # Don't store backgrounds that were modified while rendering.
+            if key[1] == self._generations.get(key[0], 0):
+                if surface is None:
+                    self._failed.add(key)
+                else:
+                    self._loaded[key] = surface
+                    while len(self._loaded) > self.max_size:
+                        self._loaded.popitem(last=False)
+        for cb in callbacks:
+            cb()
@@ -84,6 +84,10 @@ class MiscGraphicsModule(AbstractModule):
     def sort_order(cls):
         return 800
 
+    @classmethod
+    def tree_placeholder(cls):
+        return 'skytemple-e-graphics-symbolic', MISC_GRAPHICS
+
     def __init__(self, rom_project: RomProject):
         """Various misc. graphics formats."""
         self.project = rom_project
@@ -110,6 +114,7 @@ class MiscGraphicsModule(AbstractModule):
             DUNGEON_BIN_PATH, FileType.DUNGEON_BIN,
             static_data=self.project.get_rom_module().get_static_data()
         )
+        self.project.pin_opened_file(DUNGEON_BIN_PATH, self)
         self.list_of_wtes_dungeon_bin = self.dungeon_bin.get_files_with_ext(WTE_FILE_EXT)
         self.list_of_wtus_dungeon_bin = self.dungeon_bin.get_files_with_ext(WTU_FILE_EXT)
         self.list_of_zmappats_dungeon_bin = self.dungeon_bin.get_files_with_ext(ZMAPPAT_FILE_EXT)
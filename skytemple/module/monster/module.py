@@ -53,12 +53,18 @@ class MonsterModule(AbstractModule):
     def sort_order(cls):
         return 70
 
+    @classmethod
+    def tree_placeholder(cls):
+        return 'skytemple-e-monster-symbolic', MONSTER_NAME
+
     def __init__(self, rom_project: RomProject):
         self.project = rom_project
         self.monster_md: Md = self.project.open_file_in_rom(MONSTER_MD_FILE, FileType.MD)
         self.m_level_bin: BinPack = self.project.open_file_in_rom(M_LEVEL_BIN, FileType.BIN_PACK)
         self.waza_p_bin: WazaP = self.project.open_file_in_rom(WAZA_P_BIN, FileType.WAZA_P)
         self.waza_p2_bin: WazaP = self.project.open_file_in_rom(WAZA_P2_BIN, FileType.WAZA_P)
+        for filename in (MONSTER_MD_FILE, M_LEVEL_BIN, WAZA_P_BIN, WAZA_P2_BIN):
+            self.project.pin_opened_file(filename, self)
 
         self._tree_model = None
         self._tree_iter__entity_roots = {}
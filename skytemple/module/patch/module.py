@@ -32,6 +32,10 @@ class PatchModule(AbstractModule):
     def sort_order(cls):
         return 10
 
+    @classmethod
+    def tree_placeholder(cls):
+        return 'skytemple-e-patch-symbolic', 'ASM Patches'
+
     def __init__(self, rom_project: RomProject):
         self.project = rom_project
 
@@ -67,8 +67,17 @@ class PortraitController(AbstractController):
             self._draws.append(draw)
             draw.connect('draw', partial(self.on_draw, subindex))
 
+        # Load all portraits of this entry in one batch, instead of one task per drawing area.
+        self._portrait_provider.prefetch(
+            [self.item_id], range(0, SUBENTRIES), lambda: GLib.idle_add(self._queue_draws), False
+        )
+
         return self.builder.get_object('box_main')
 
+    def _queue_draws(self):
+        for draw in self._draws:
+            draw.queue_draw()
+
     def on_draw(self, subindex: int, widget: Gtk.DrawingArea, ctx: cairo.Context):
         scale = 2
         portrait = self._portrait_provider.get(self.item_id, subindex,
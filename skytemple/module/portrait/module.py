@@ -42,7 +42,8 @@ class PortraitModule(AbstractModule):
         """Loads the list of backgrounds for the ROM."""
         self.project = rom_project
         self.kao: Kao = self.project.open_file_in_rom(PORTRAIT_FILE, FileType.KAO)
-        self._portrait_provider = PortraitProvider(self.kao)
+        self.project.pin_opened_file(PORTRAIT_FILE, self)
+        self._portrait_provider = PortraitProvider(self.kao, self.project.get_thumbnail_cache())
         self._portrait_provider__was_init = False
 
     def load_tree_items(self, item_store: TreeStore, root_node):
@@ -14,18 +14,26 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
 import threading
-from typing import List, Dict, Tuple
+from typing import Dict, Tuple, Optional, Set, Iterable
 
 import cairo
+try:
+    from PIL import Image
+except ImportError:
+    from pil import Image
 from gi.repository import Gdk, GdkPixbuf, Gtk
 
 from skytemple.core.img_utils import pil_to_cairo_surface
+from skytemple.core.thumbnail_cache import ThumbnailCache
 from skytemple_files.common.task_runner import AsyncTaskRunner
 from skytemple_files.data.md.model import NUM_ENTITIES
-from skytemple_files.graphics.kao.model import Kao, KAO_IMG_METAPIXELS_DIM, KAO_IMG_IMG_DIM
+from skytemple_files.graphics.kao.model import Kao, KaoImage, KAO_IMG_METAPIXELS_DIM, KAO_IMG_IMG_DIM
 
 IMG_DIM = KAO_IMG_METAPIXELS_DIM * KAO_IMG_IMG_DIM
+# Namespace in the thumbnail cache. Change the version if the way portraits are rendered changes.
+THUMBNAIL_NS_PORTRAIT = 'portrait_v1'
 portrait_provider_lock = threading.Lock()
 
 
@@ -34,15 +42,16 @@ class PortraitProvider:
     PortraitProvider. This class renders portraits using Threads. If a portrait is requested, a loading icon
     is returned instead, until it is loaded by the AsyncTaskRunner.
     """
-    def __init__(self, kao: Kao):
+    def __init__(self, kao: Kao, thumbnail_cache: Optional[ThumbnailCache] = None):
         self._kao = kao
+        self._thumbnail_cache = thumbnail_cache
         self._loader_surface = None
         self._error_surface = None
 
         self._loaded: Dict[Tuple[int, int], cairo.Surface] = {}
         self._loaded__is_fallback: Dict[Tuple[int, int], bool] = {}
 
-        self._requests: List[Tuple[int, int]] = []
+        self._requests: Set[Tuple[int, int]] = set()
 
         # init_loader MUST be called next!
 
@@ -69,7 +78,7 @@ class PortraitProvider:
         with portrait_provider_lock:
             self._loaded = {}
             self._loaded__is_fallback = {}
-            self._requests = []
+            self._requests = set()
 
     def get(self, entry_id: int, sub_id: int, after_load_cb=lambda: None, allow_fallback=True) -> cairo.Surface:
         """
@@ -84,14 +93,52 @@ class PortraitProvider:
                 else:
                     return self.get_error()
             if (entry_id, sub_id) not in self._requests:
-                self._requests.append((entry_id, sub_id))
+                self._requests.add((entry_id, sub_id))
                 self._load(entry_id, sub_id, after_load_cb, allow_fallback)
         return self.get_loader()
 
+    def prefetch(self, entry_ids: Iterable[int], sub_ids: Iterable[int],
+                 after_load_cb=lambda: None, allow_fallback=True):
+        """
+        Loads the portraits for all combinations of the given entry and sub IDs, that are not yet loaded
+        or requested, in one batch. When all of them are loaded, they become available at once and
+        after_load_cb is called once. Use this for views that show many portraits.
+        """
+        sub_ids = list(sub_ids)
+        with portrait_provider_lock:
+            keys = [(entry_id, sub_id) for entry_id in entry_ids for sub_id in sub_ids
+                    if (entry_id, sub_id) not in self._loaded and (entry_id, sub_id) not in self._requests]
+            if len(keys) < 1:
+                return
+            self._requests.update(keys)
+        AsyncTaskRunner.instance().run_task(self._prefetch__impl(keys, after_load_cb, allow_fallback))
+
     def _load(self, entry_id, sub_id, after_load_cb, allow_fallback):
         AsyncTaskRunner.instance().run_task(self._load__impl(entry_id, sub_id, after_load_cb, allow_fallback))
 
     async def _load__impl(self, entry_id, sub_id, after_load_cb, allow_fallback):
+        loaded, is_fallback = self._render(entry_id, sub_id, allow_fallback)
+        with portrait_provider_lock:
+            self._loaded[(entry_id, sub_id)] = loaded
+            self._loaded__is_fallback[(entry_id, sub_id)] = is_fallback
+            self._requests.discard((entry_id, sub_id))
+        after_load_cb()
+
+    async def _prefetch__impl(self, keys, after_load_cb, allow_fallback):
+        results = []
+        for entry_id, sub_id in keys:
+            results.append(((entry_id, sub_id), self._render(entry_id, sub_id, allow_fallback)))
+            # Let other tasks run in between portraits
+            await asyncio.sleep(0)
+        with portrait_provider_lock:
+            for key, (loaded, is_fallback) in results:
+                self._loaded[key] = loaded
+                self._loaded__is_fallback[key] = is_fallback
+            self._requests.difference_update(keys)
+        after_load_cb()
+
+    def _render(self, entry_id, sub_id, allow_fallback) -> Tuple[cairo.Surface, bool]:
+        """Renders a portrait. Returns the surface and whether or not the fallback portrait was used."""
         is_fallback = False
         try:
             kao = self._kao.get(entry_id, sub_id)
@@ -103,16 +150,21 @@ class PortraitProvider:
                         raise RuntimeError()
                 else:
                     raise RuntimeError()
-            portrait_pil = kao.get()
-            surf = pil_to_cairo_surface(portrait_pil.convert('RGBA'))
-            loaded = surf
+            return pil_to_cairo_surface(self._get_rgba(kao)), is_fallback
         except (RuntimeError, ValueError):
-            loaded = self.get_error()
-        with portrait_provider_lock:
-            self._loaded[(entry_id, sub_id)] = loaded
-            self._loaded__is_fallback[(entry_id, sub_id)] = is_fallback
-            self._requests.remove((entry_id, sub_id))
-        after_load_cb()
+            return self.get_error(), is_fallback
+
+    def _get_rgba(self, kao: KaoImage) -> Image.Image:
+        """Returns the portrait as RGBA image. Uses the thumbnail cache, if enabled."""
+        if self._thumbnail_cache is None:
+            return kao.get().convert('RGBA')
+        content_hash = self._thumbnail_cache.content_hash(bytes(kao.pal_data) + bytes(kao.compressed_img_data))
+        cached = self._thumbnail_cache.get(THUMBNAIL_NS_PORTRAIT, content_hash, '')
+        if cached is not None:
+            return cached[0]
+        portrait_pil = kao.get().convert('RGBA')
+        self._thumbnail_cache.put(THUMBNAIL_NS_PORTRAIT, content_hash, '', portrait_pil)
+        return portrait_pil
 
     def get_loader(self) -> cairo.Surface:
         """
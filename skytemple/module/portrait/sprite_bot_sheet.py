@@ -88,7 +88,7 @@ class SpriteBotSheet:
         if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
             raise ValueError(f"Portrait has an invalid size of {img.size}, exceeding max of {max_size}")
 
-        in_data = img.convert('RGBA').getdata()
+        alpha = img.convert('RGBA').getchannel('A')
         occupied = [[]] * PORTRAIT_TILE_X
         for ii in range(PORTRAIT_TILE_X):
             occupied[ii] = [None] * PORTRAIT_TILE_Y
@@ -101,16 +101,25 @@ class SpriteBotSheet:
                 if xx >= img_tile_size[0] or yy >= img_tile_size[1]:
                     continue
                 first_pos = (xx * PORTRAIT_SIZE, yy * PORTRAIT_SIZE)
-                first_pixel = in_data[first_pos[1] * img.size[0] + first_pos[0]]
-                occupied[xx][yy] = (first_pixel[3] > 0)
+                cell_alpha = alpha.crop((
+                    first_pos[0], first_pos[1], first_pos[0] + PORTRAIT_SIZE, first_pos[1] + PORTRAIT_SIZE
+                ))
+                min_alpha, max_alpha = cell_alpha.getextrema()
+                if max_alpha == 0 or min_alpha == 255:
+                    # Fully transparent or fully solid, there is nothing to report for this portrait.
+                    occupied[xx][yy] = max_alpha > 0
+                    continue
+                # Otherwise check pixel by pixel, to report the same pixels as before.
+                cell_data = cell_alpha.tobytes()
+                occupied[xx][yy] = (cell_data[0] > 0)
 
                 is_rogue = False
                 for mx in range(PORTRAIT_SIZE):
                     for my in range(PORTRAIT_SIZE):
                         cur_pos = (first_pos[0] + mx, first_pos[1] + my)
-                        cur_pixel = in_data[cur_pos[1] * img.size[0] + cur_pos[0]]
-                        cur_occupied = (cur_pixel[3] > 0)
-                        if cur_occupied and cur_pixel[3] < 255:
+                        cur_alpha = cell_data[my * PORTRAIT_SIZE + mx]
+                        cur_occupied = (cur_alpha > 0)
+                        if cur_occupied and cur_alpha < 255:
                             rogue_pixels.append(cur_pos)
                         if cur_occupied != occupied[xx][yy]:
                             is_rogue = True
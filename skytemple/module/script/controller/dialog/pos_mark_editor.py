@@ -21,10 +21,9 @@ import os
 from typing import List, Optional, Tuple
 
 import cairo
-from gi.repository import Gtk, Gdk
+from gi.repository import Gtk, Gdk, GLib
 
 from explorerscript.source_map import SourceMapPositionMark
-from skytemple.core.img_utils import pil_to_cairo_surface
 from skytemple.core.sprite_provider import SpriteProvider
 from skytemple.module.script.drawer import Drawer, InteractionMode
 from skytemple_files.common.ppmdu_config.script_data import Pmd2ScriptLevel
@@ -126,6 +125,7 @@ class PosMarkEditorController:
                         self._currently_selected_mark.y_offset = 2
                     else:
                         self._currently_selected_mark.y_offset = 0
+                    self.drawer.update_position_mark(self._currently_selected_mark)
         self._bg_draw_is_clicked__location = None
         self._bg_draw_is_clicked__drag_active = False
         self._w_ssa_draw.queue_draw()
@@ -172,17 +172,23 @@ class PosMarkEditorController:
         if model is not None and cbiter is not None and cbiter != []:
             item_id = model[cbiter][0]
             self.mapbg_id = item_id
-            bma = self.map_bg_module.get_bma(item_id)
-            bpl = self.map_bg_module.get_bpl(item_id)
-            bpc = self.map_bg_module.get_bpc(item_id)
-            bpas = self.map_bg_module.get_bpas(item_id)
-            self._map_bg_surface = pil_to_cairo_surface(
-                bma.to_pil(bpc, bpl, bpas, False, False, single_frame=True)[0].convert('RGBA')
-            )
-            bma_width = bma.map_width_camera * BPC_TILE_DIM
-            bma_height = bma.map_height_camera * BPC_TILE_DIM
-            if self.drawer:
-                self._set_drawer_bg(self._map_bg_surface, bma_width, bma_height)
+            self._load_map_bg(item_id)
+
+    def _load_map_bg(self, item_id: int):
+        bma = self.map_bg_module.get_bma(item_id)
+        bma_width = bma.map_width_camera * BPC_TILE_DIM
+        bma_height = bma.map_height_camera * BPC_TILE_DIM
+        # None while the background is rendered, _on_map_bg_loaded is called after that.
+        self._map_bg_surface = self.map_bg_module.get_scene_bg_cache().get(
+            item_id, lambda: GLib.idle_add(self._on_map_bg_loaded, item_id)
+        )
+        if self.drawer:
+            self._set_drawer_bg(self._map_bg_surface, bma_width, bma_height)
+
+    def _on_map_bg_loaded(self, item_id: int):
+        # The dialog may have been closed or another background selected in the meantime.
+        if self.mapbg_id == item_id and self._w_ssa_draw.get_parent() is not None:
+            self._load_map_bg(item_id)
 
     def _init_all_the_stores(self):
         # MAP BGS
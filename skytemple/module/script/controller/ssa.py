@@ -19,15 +19,16 @@ from functools import partial
 from typing import TYPE_CHECKING, Optional, List, Union, Callable, Mapping, Tuple
 
 import cairo
-from gi.repository import Gtk, Gdk
+from gi.repository import Gtk, Gdk, GLib
 from gi.repository.Gtk import TreeViewColumn
 
 from skytemple.controller.main import MainController
-from skytemple.core.img_utils import pil_to_cairo_surface
 from skytemple.core.module_controller import AbstractController
 from skytemple.core.open_request import REQUEST_TYPE_MAP_BG, OpenRequest, REQUEST_TYPE_SCENE_SSE, \
     REQUEST_TYPE_SCENE_SSA, REQUEST_TYPE_SCENE_SSS
+from skytemple.core.settings import SkyTempleSettingsStore
 from skytemple.core.ssb_debugger.ssb_loaded_file_handler import SsbLoadedFileHandler
+from skytemple.module.map_bg.chunk_surfaces import ChunkSurfaces
 from skytemple.module.script.controller.ssa_event_dialog import SsaEventDialogController
 from skytemple.module.script.drawer import Drawer, InteractionMode
 from skytemple_files.common.ppmdu_config.data import Pmd2Data
@@ -82,9 +83,6 @@ class SsaController(AbstractController):
     _last_open_tab = None
     _paned_pos = None
     _last_scale_factor = None
-    # Cache for map backgrounds, for faster scene view transitions in the same map context
-    # Should be set to (None, ) when loading a map BG context.
-    map_bg_surface_cache = (None, )
 
     def __init__(self, module: 'ScriptModule', item: dict):
         self.module = module
@@ -111,6 +109,11 @@ class SsaController(AbstractController):
         self._map_bg_width = SIZE_REQUEST_NONE
         self._map_bg_height = SIZE_REQUEST_NONE
         self._map_bg_surface = None
+        # Rendered chunks of the map background, if animated backgrounds are enabled.
+        # Re-used for all backgrounds selected in this view.
+        self._map_bg_chunk_surfaces = ChunkSurfaces(self._on_map_bg_frames_rendered)
+        # Whether the chunk surfaces are rendered for the current map background and it is animated.
+        self._map_bg_animated = False
         self._suppress_events = False
 
         self._currently_open_popover = None
@@ -145,6 +148,7 @@ class SsaController(AbstractController):
         util_notebook: Gtk.Notebook = self.builder.get_object('ssa_utility')
         if self.__class__._last_open_tab is not None:
             util_notebook.set_current_page(self._last_open_tab)
+        self.builder.get_object('tool_scene_animate').set_active(SkyTempleSettingsStore().get_scene_bg_animated())
         self.builder.connect_signals(self)
 
         self._init_ssa()
@@ -216,6 +220,7 @@ class SsaController(AbstractController):
                 self.builder.get_object('tool_scene_move').set_active(True)
                 self._select(new_entity, place_layer)
                 self._add_entity_to_list(new_entity, place_layer)
+                self.drawer.add_entity(new_entity, place_layer)
                 self.module.mark_as_modified(self.mapname, self.type, self.filename)
 
             # SELECT / DRAG
@@ -246,6 +251,7 @@ class SsaController(AbstractController):
                         self._currently_selected_entity.pos.y_offset = 2
                     else:
                         self._currently_selected_entity.pos.y_offset = 0
+                    self.drawer.update_entity(self._currently_selected_entity, self._currently_selected_entity_layer)
                     self._bg_draw_is_clicked__drag_active = False
                     self._bg_draw_is_clicked__location = None
         self._bg_draw_is_clicked__location = None
@@ -291,6 +297,11 @@ class SsaController(AbstractController):
             self.drawer.set_draw_tile_grid(w.get_active())
             self._w_ssa_draw.queue_draw()
 
+    def on_tool_scene_animate_toggled(self, w, *args):
+        SkyTempleSettingsStore().set_scene_bg_animated(w.get_active())
+        if self.drawer:
+            self._load_map_bg(self.mapbg_id)
+
     def on_tool_scene_move_toggled(self, *args):
         if self.drawer:
             self.drawer.interaction_mode = InteractionMode.SELECT
@@ -320,21 +331,54 @@ class SsaController(AbstractController):
         if model is not None and cbiter is not None and cbiter != []:
             item_id = model[cbiter][0]
             self.mapbg_id = item_id
-            if self.__class__.map_bg_surface_cache[0] == item_id:
-                self._map_bg_surface, bma_width, bma_height = self.__class__.map_bg_surface_cache[1:]
-            else:
-                bma = self.map_bg_module.get_bma(item_id)
-                bpl = self.map_bg_module.get_bpl(item_id)
-                bpc = self.map_bg_module.get_bpc(item_id)
-                bpas = self.map_bg_module.get_bpas(item_id)
-                self._map_bg_surface = pil_to_cairo_surface(
-                    bma.to_pil(bpc, bpl, bpas, False, False, single_frame=True)[0].convert('RGBA')
-                )
-                bma_width = bma.map_width_camera * BPC_TILE_DIM
-                bma_height = bma.map_height_camera * BPC_TILE_DIM
-                self.__class__.map_bg_surface_cache = (item_id, self._map_bg_surface, bma_width, bma_height)
-            if self.drawer:
-                self._set_drawer_bg(self._map_bg_surface, bma_width, bma_height)
+            self._load_map_bg(item_id)
+
+    def _load_map_bg(self, item_id: int):
+        """
+        Loads the map background. It's animated if this is enabled and the map has any animations.
+        The chunks are rendered in the background, until then the map background is shown without animations.
+        """
+        self._map_bg_animated = False
+        if self.builder.get_object('tool_scene_animate').get_active():
+            self._map_bg_chunk_surfaces.render_async(
+                self.map_bg_module.get_bpc(item_id), self.map_bg_module.get_bpl(item_id),
+                self.map_bg_module.get_bpas(item_id), partial(self._on_map_bg_chunks_rendered, item_id)
+            )
+        self._update_drawer_bg(item_id)
+
+    def _update_drawer_bg(self, item_id: int):
+        bma = self.map_bg_module.get_bma(item_id)
+        bma_width = bma.map_width_camera * BPC_TILE_DIM
+        bma_height = bma.map_height_camera * BPC_TILE_DIM
+        chunk_surfaces = self._map_bg_chunk_surfaces if self._map_bg_animated else None
+        if chunk_surfaces is None:
+            # None while the background is rendered, _on_map_bg_loaded is called after that.
+            self._map_bg_surface = self.map_bg_module.get_scene_bg_cache().get(
+                item_id, lambda: GLib.idle_add(self._on_map_bg_loaded, item_id)
+            )
+        else:
+            self._map_bg_surface = None
+        if self.drawer:
+            self.drawer.set_animated_map_bg(bma, chunk_surfaces)
+            self._set_drawer_bg(self._map_bg_surface, bma_width, bma_height)
+
+    def _is_map_bg_shown(self, item_id: int):
+        # The view may have been closed or another background selected in the meantime.
+        return self.mapbg_id == item_id and self._w_ssa_draw.get_parent() is not None
+
+    def _on_map_bg_loaded(self, item_id: int):
+        if self._is_map_bg_shown(item_id):
+            self._update_drawer_bg(item_id)
+
+    def _on_map_bg_chunks_rendered(self, item_id: int):
+        if self._is_map_bg_shown(item_id) and self.builder.get_object('tool_scene_animate').get_active():
+            self._map_bg_animated = self._map_bg_chunk_surfaces.is_animated
+            if self._map_bg_animated:
+                self._update_drawer_bg(item_id)
+
+    def _on_map_bg_frames_rendered(self):
+        if self._map_bg_animated and self.drawer:
+            self.drawer.set_animated_map_bg(self.map_bg_module.get_bma(self.mapbg_id), self._map_bg_chunk_surfaces)
 
     def on_tool_scene_goto_bg_clicked(self, *args):
         self.module.project.request_open(OpenRequest(
@@ -622,15 +666,12 @@ class SsaController(AbstractController):
         ssa_scripts_store: Gtk.ListStore = self.builder.get_object('ssa_scripts').get_model()
         # The reason this is the same is because I screwed up when building self.scripts...
         ssa_scripts_store.append([short_name, short_name])
-        # Update debugger
-        MainController.debugger_manager().on_script_added(
-            ssb_path, self.mapname, self.type, self.filename.split('/')[-1]
-        )
         # Update popovers actors / objects
         po_actor_script: Gtk.ComboBox = self.builder.get_object('po_actor_script')
         po_actor_script.get_model().append([number, short_name])
-        # Add to object script list
-        self.scripts.append(short_name)
+        # Add to object script list, the script file tree and the debugger
+        # (self.scripts is the script list of the item tree)
+        self.module.add_script(self.mapname, self.type, self.filename.split('/')[-1], short_name)
         # Mark as modified
         self.module.mark_as_modified(self.mapname, self.type, self.filename)
 
@@ -699,6 +740,7 @@ class SsaController(AbstractController):
         tree.get_model().remove(l_iter)
         # Remove from model
         self.ssa.layer_list[self._currently_selected_entity_layer].actors.remove(self._currently_selected_entity)
+        self.drawer.remove_entity(self._currently_selected_entity)
         # Remove now invalid references:
         self._currently_selected_entity = None
         self._bg_draw_is_clicked__drag_active = False
@@ -760,6 +802,7 @@ class SsaController(AbstractController):
         tree.get_model().remove(l_iter)
         # Remove from model
         self.ssa.layer_list[self._currently_selected_entity_layer].objects.remove(self._currently_selected_entity)
+        self.drawer.remove_entity(self._currently_selected_entity)
         # Remove now invalid references:
         self._currently_selected_entity = None
         self._bg_draw_is_clicked__drag_active = False
@@ -814,6 +857,7 @@ class SsaController(AbstractController):
         tree.get_model().remove(l_iter)
         # Remove from model
         self.ssa.layer_list[self._currently_selected_entity_layer].performers.remove(self._currently_selected_entity)
+        self.drawer.remove_entity(self._currently_selected_entity)
         # Remove now invalid references:
         self._currently_selected_entity = None
         self._bg_draw_is_clicked__drag_active = False
@@ -862,6 +906,7 @@ class SsaController(AbstractController):
         tree.get_model().remove(l_iter)
         # Remove from model
         self.ssa.layer_list[self._currently_selected_entity_layer].events.remove(self._currently_selected_entity)
+        self.drawer.remove_entity(self._currently_selected_entity)
         # Remove now invalid references:
         self._currently_selected_entity = None
         self._bg_draw_is_clicked__drag_active = False
@@ -917,6 +962,7 @@ class SsaController(AbstractController):
 
     def _refresh_for_selected(self):
         # Refresh drawing
+        self.drawer.update_entity(self._currently_selected_entity, self._currently_selected_entity_layer)
         self._w_ssa_draw.queue_draw()
         # Refresh list entries
         self._refresh_list_entry_for(self._currently_selected_entity, self._currently_selected_entity_layer)
@@ -21,10 +21,14 @@ import cairo
 from gi.repository import Gtk, GLib
 
 from explorerscript.source_map import SourceMapPositionMark
+from skytemple.core.mapbg_util.bb_grid import BoundingBoxGrid
 from skytemple.core.mapbg_util.drawer_plugin.grid import GridDrawerPlugin
 from skytemple.core.mapbg_util.drawer_plugin.selection import SelectionDrawerPlugin
 from skytemple.core.sprite_provider import SpriteProvider
+from skytemple.module.map_bg.chunk_surfaces import ChunkSurfaces
+from skytemple.module.map_bg.drawer import Drawer as MapBgDrawer
 from skytemple_files.common.ppmdu_config.script_data import Pmd2ScriptDirection
+from skytemple_files.graphics.bma.model import Bma
 from skytemple_files.graphics.bpc.model import BPC_TILE_DIM
 from skytemple_files.script.ssa_sse_sss.actor import SsaActor
 from skytemple_files.script.ssa_sse_sss.event import SsaEvent
@@ -43,6 +47,8 @@ COLOR_POS_MARKS = (0, 1.0, 0)
 COLOR_LAYER_HIGHLIGHT = (0.7, 0.7, 1, 0.7)
 Num = Union[int, float]
 Color = Tuple[Num, Num, Num]
+# Order in which the entity types of a layer are drawn, types drawn later are on top.
+ENTITY_DRAW_ORDER = (SsaActor, SsaObject, SsaEvent, SsaPerformer)
 
 
 class InteractionMode(Enum):
@@ -62,6 +68,8 @@ class Drawer:
 
         self.ssa = ssa
         self.map_bg = None
+        # If set, this is drawn as the map background instead of map_bg
+        self._animated_map_bg: Optional[MapBgDrawer] = None
         self.position_marks: List[SourceMapPositionMark] = []
 
         self.draw_tile_grid = False
@@ -94,6 +102,13 @@ class Drawer:
 
         self.drawing_is_active = False
 
+        # Bounding boxes of all entities for hit-testing. Priorities are (layer, type, insertion order),
+        # what is drawn on top has the highest priority.
+        self._entity_index = BoundingBoxGrid()
+        self._entity_index_counter = 0
+        self._entity_index_dirty = True
+        self._pos_mark_index = BoundingBoxGrid()
+
     def start(self):
         """Start drawing on the DrawingArea"""
         self.drawing_is_active = True
@@ -103,9 +118,14 @@ class Drawer:
 
     def draw(self, wdg, ctx: cairo.Context):
         ctx.set_antialias(cairo.Antialias.NONE)
-        ctx.scale(self.scale, self.scale)
         # Background
-        if self.map_bg is not None:
+        if self._animated_map_bg is not None:
+            # Applies the scale on its own
+            ctx.save()
+            self._animated_map_bg.draw(wdg, ctx)
+            ctx.restore()
+        ctx.scale(self.scale, self.scale)
+        if self._animated_map_bg is None and self.map_bg is not None:
             ctx.set_source_surface(self.map_bg, 0, 0)
             ctx.get_source().set_filter(cairo.Filter.NEAREST)
             ctx.paint()
@@ -217,45 +237,88 @@ class Drawer:
         Elements are searched in reversed drawing order (so what's drawn on top is also taken).
         Does not return positon marks under the mouse.
         """
-        for layer_i, layer in enumerate(reversed(self.ssa.layer_list)):
-            layer_i = len(self.ssa.layer_list) - layer_i - 1
-            if not self._is_layer_visible(layer_i):
-                continue
-
-            for performer in reversed(layer.performers):
-                bb = self.get_bb_performer(performer)
-                if self._is_in_bb(*bb, self.mouse_x, self.mouse_y):
-                    return layer_i, performer
-            for trigger in reversed(layer.events):
-                bb = self.get_bb_trigger(trigger)
-                if self._is_in_bb(*bb, self.mouse_x, self.mouse_y):
-                    return layer_i, trigger
-            for obj in reversed(layer.objects):
-                bb = self.get_bb_object(obj)
-                if self._is_in_bb(*bb, self.mouse_x, self.mouse_y):
-                    return layer_i, obj
-            for actor in reversed(layer.actors):
-                bb = self.get_bb_actor(actor)
-                if self._is_in_bb(*bb, self.mouse_x, self.mouse_y):
-                    return layer_i, actor
-        return None, None
+        if self._entity_index_dirty:
+            self._rebuild_entity_index()
+        found = None
+        for entity, priority in self._entity_index.at(self.mouse_x, self.mouse_y):
+            if self._is_layer_visible(priority[0]) and (found is None or priority > found[1]):
+                found = entity, priority
+        if found is None:
+            return None, None
+        return found[1][0], found[0]
 
     def get_pos_mark_under_mouse(self) -> Optional[SourceMapPositionMark]:
         """
         Returns the first position mark under the mouse position, if any.
         Elements are searched in reversed drawing order (so what's drawn on top is also taken).
         """
-        for pos_mark in reversed(self.position_marks):
-            bb = self.get_bb_pos_mark(pos_mark)
-            if self._is_in_bb(*bb, self.mouse_x, self.mouse_y):
-                return pos_mark
-        return None
+        found = max(self._pos_mark_index.at(self.mouse_x, self.mouse_y), key=lambda e: e[1], default=None)
+        return found[0] if found is not None else None
+
+    def add_entity(self, entity: Union[SsaActor, SsaObject, SsaPerformer, SsaEvent], layer_i: int):
+        """Must be called after an entity was appended to a layer of the SSA."""
+        if self._entity_index_dirty:
+            return
+        self._entity_index_counter += 1
+        self._entity_index.insert(
+            id(entity), entity, self._get_bb_entity(entity),
+            (layer_i, self._entity_draw_order(entity), self._entity_index_counter)
+        )
+
+    def update_entity(self, entity: Union[SsaActor, SsaObject, SsaPerformer, SsaEvent], layer_i: int):
+        """
+        Must be called after an entity was changed (eg. moved or resized).
+        If it was moved to another layer, it must have been appended to that layer.
+        """
+        if self._entity_index_dirty:
+            return
+        if id(entity) not in self._entity_index:
+            return self.add_entity(entity, layer_i)
+        _, __, priority = self._entity_index.get(id(entity))
+        if priority[0] != layer_i:
+            return self.add_entity(entity, layer_i)
+        self._entity_index.insert(id(entity), entity, self._get_bb_entity(entity), priority)
+
+    def remove_entity(self, entity: Union[SsaActor, SsaObject, SsaPerformer, SsaEvent]):
+        """Must be called after an entity was removed from the SSA."""
+        self._entity_index.remove(id(entity))
+
+    def update_position_mark(self, pos_mark: SourceMapPositionMark):
+        """Must be called after a position mark was moved."""
+        _, __, priority = self._pos_mark_index.get(id(pos_mark))
+        self._pos_mark_index.insert(id(pos_mark), pos_mark, self.get_bb_pos_mark(pos_mark), priority)
 
     def set_draw_tile_grid(self, v):
         self.draw_tile_grid = v
 
     def set_scale(self, v):
         self.scale = v
+        if self._animated_map_bg is not None:
+            self._animated_map_bg.set_scale(v)
+
+    def set_animated_map_bg(self, bma: Optional[Bma], chunk_surfaces: Optional[ChunkSurfaces]):
+        """
+        Draw an animated map background made of the chunk surfaces instead of map_bg.
+        On each animation tick only the animated chunks are redrawn. Pass None to draw map_bg again.
+        If an animated map background is already drawn, its drawer is reset with the new chunk surfaces.
+        """
+        if chunk_surfaces is None:
+            if self._animated_map_bg is not None:
+                self._animated_map_bg.stop()
+                self._animated_map_bg = None
+        elif self._animated_map_bg is None:
+            self._animated_map_bg = MapBgDrawer(
+                self.draw_area, bma, chunk_surfaces.bpa_durations, chunk_surfaces.pal_ani_durations,
+                chunk_surfaces.surfaces, chunk_surfaces.bpa_clocks, chunk_surfaces.pal_ani_clocks
+            )
+            self._animated_map_bg.set_scale(self.scale)
+            self._animated_map_bg.start_animation()
+        else:
+            self._animated_map_bg.reset(
+                bma, chunk_surfaces.bpa_durations, chunk_surfaces.pal_ani_durations,
+                chunk_surfaces.surfaces, chunk_surfaces.bpa_clocks, chunk_surfaces.pal_ani_clocks
+            )
+        self.draw_area.queue_draw()
 
     def get_bb_actor(self, actor: SsaActor, x=None, y=None) -> Tuple[int, int, int, int]:
         if x is None:
@@ -263,9 +326,9 @@ class Drawer:
         if y is None:
             y = actor.pos.y_absolute
         if actor.actor.entid <= 0:
-            _, cx, cy, w, h = self.sprite_provider.get_actor_placeholder(actor.actor.id, actor.pos.direction.id, lambda: GLib.idle_add(self._redraw))
+            _, cx, cy, w, h = self.sprite_provider.get_actor_placeholder(actor.actor.id, actor.pos.direction.id, self._sprite_loaded_cb(actor))
         else:
-            _, cx, cy, w, h = self.sprite_provider.get_monster(actor.actor.entid, actor.pos.direction.id, lambda: GLib.idle_add(self._redraw))
+            _, cx, cy, w, h = self.sprite_provider.get_monster(actor.actor.entid, actor.pos.direction.id, self._sprite_loaded_cb(actor))
         return x - cx, y - cy, w, h
 
     def _draw_hitbox_actor(self, ctx: cairo.Context, actor: SsaActor):
@@ -285,7 +348,7 @@ class Drawer:
             y = object.pos.y_absolute
         if object.object.name != 'NULL':
             # Load sprite to get dims.
-            _, cx, cy, w, h = self.sprite_provider.get_for_object(object.object.name, lambda: GLib.idle_add(self._redraw))
+            _, cx, cy, w, h = self.sprite_provider.get_for_object(object.object.name, self._sprite_loaded_cb(object))
             return x - cx, y - cy, w, h
         return self._get_pmd_bounding_box(
             x, y, object.hitbox_w * BPC_TILE_DIM, object.hitbox_h * BPC_TILE_DIM
@@ -520,11 +583,11 @@ class Drawer:
         """Draws the sprite for an actor"""
         if actor.actor.entid == 0:
             sprite = self.sprite_provider.get_actor_placeholder(
-                actor.actor.id, actor.pos.direction.id, self._redraw
+                actor.actor.id, actor.pos.direction.id, self._sprite_loaded_cb(actor)
             )[0]
         else:
             sprite = self.sprite_provider.get_monster(
-                actor.actor.entid, actor.pos.direction.id, lambda: GLib.idle_add(self._redraw)
+                actor.actor.entid, actor.pos.direction.id, self._sprite_loaded_cb(actor)
             )[0]
         ctx.translate(x, y)
         ctx.set_source_surface(sprite)
@@ -534,7 +597,7 @@ class Drawer:
 
     def _draw_object_sprite(self, ctx: cairo.Context, obj: SsaObject, x, y):
         """Draws the sprite for an object"""
-        sprite = self.sprite_provider.get_for_object(obj.object.name, lambda: GLib.idle_add(self._redraw))[0]
+        sprite = self.sprite_provider.get_for_object(obj.object.name, self._sprite_loaded_cb(obj))[0]
         ctx.translate(x, y)
         ctx.set_source_surface(sprite)
         ctx.get_source().set_filter(cairo.Filter.NEAREST)
@@ -659,7 +722,11 @@ class Drawer:
         self.draw_area.queue_draw()
 
     def add_position_marks(self, pos_marks):
-        self.position_marks += pos_marks
+        for pos_mark in pos_marks:
+            self._pos_mark_index.insert(
+                id(pos_mark), pos_mark, self.get_bb_pos_mark(pos_mark), len(self.position_marks)
+            )
+            self.position_marks.append(pos_mark)
 
     def set_drag_position(self, x: int, y: int):
         """Start dragging. x/y is the offset on the entity, where the dragging was started."""
@@ -673,6 +740,8 @@ class Drawer:
         self._sectors_visible.append(True)
 
     def sector_removed(self, id):
+        # The layer indices of all entities after the removed layer changed.
+        self._entity_index_dirty = True
         del self._sectors_solo[id]
         del self._sectors_visible[id]
         if self._sector_highlighted == id:
@@ -691,12 +760,61 @@ class Drawer:
             return
         self.draw_area.queue_draw()
 
-    def edit_position_marks(self):
-        self._edit_pos_marks = True
+    def _sprite_loaded_cb(self, entity: Union[SsaActor, SsaObject]) -> Callable[[], None]:
+        """
+        Returns the callback for the sprite provider, for when the sprite of the entity is loaded.
+        The sprite provider only calls the callback of the first request for a sprite, so it's the same
+        for drawing and for the bounding boxes.
+        """
+        sprite_key = self._sprite_key(entity)
+        return lambda: GLib.idle_add(self._on_sprite_loaded, sprite_key)
+
+    def _on_sprite_loaded(self, sprite_key):
+        # The bounding boxes of the entities using the sprite depend on its size.
+        if not self._entity_index_dirty:
+            for layer in self.ssa.layer_list:
+                for entities in (layer.actors, layer.objects):
+                    for entity in entities:
+                        if id(entity) in self._entity_index and self._sprite_key(entity) == sprite_key:
+                            _, __, priority = self._entity_index.get(id(entity))
+                            self._entity_index.insert(id(entity), entity, self._get_bb_entity(entity), priority)
+        self._redraw()
+
+    @staticmethod
+    def _sprite_key(entity: Union[SsaActor, SsaObject]) -> Tuple:
+        """The key of the sprite of the entity. Entities with the same key use the same sprite."""
+        if isinstance(entity, SsaObject):
+            return 'object', entity.object.name
+        if entity.actor.entid == 0:
+            return 'actor_placeholder', entity.actor.id, entity.pos.direction.id
+        return 'monster', entity.actor.entid, entity.pos.direction.id
+
+    def _rebuild_entity_index(self):
+        self._entity_index.clear()
+        self._entity_index_dirty = False
+        for layer_i, layer in enumerate(self.ssa.layer_list):
+            for entities in (layer.actors, layer.objects, layer.events, layer.performers):
+                for entity in entities:
+                    self.add_entity(entity, layer_i)
+
+    def _get_bb_entity(self, entity: Union[SsaActor, SsaObject, SsaPerformer, SsaEvent]) -> Tuple[int, int, int, int]:
+        if isinstance(entity, SsaActor):
+            return self.get_bb_actor(entity)
+        if isinstance(entity, SsaObject):
+            return self.get_bb_object(entity)
+        if isinstance(entity, SsaPerformer):
+            return self.get_bb_performer(entity)
+        return self.get_bb_trigger(entity)
 
     @staticmethod
-    def _is_in_bb(bb_x, bb_y, bb_w, bb_h, mouse_x, mouse_y):
-        return bb_x <= mouse_x < bb_x + bb_w and bb_y <= mouse_y < bb_y + bb_h
+    def _entity_draw_order(entity: Union[SsaActor, SsaObject, SsaPerformer, SsaEvent]) -> int:
+        for i, entity_type in enumerate(ENTITY_DRAW_ORDER):
+            if isinstance(entity, entity_type):
+                return i
+        raise ValueError(f"Unknown entity type: {type(entity)}")
+
+    def edit_position_marks(self):
+        self._edit_pos_marks = True
 
     @staticmethod
     def _snap_pos(x, y):
@@ -14,12 +14,14 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import copy
 from typing import Optional, Dict, List
 
 from gi.repository import Gtk
 from gi.repository.Gtk import TreeStore
 
 from explorerscript.source_map import SourceMapPositionMark
+from skytemple.controller.main import MainController as SkyTempleMainController
 from skytemple.core.abstract_module import AbstractModule
 from skytemple.core.open_request import OpenRequest, REQUEST_TYPE_SCENE, REQUEST_TYPE_SCENE_SSE, REQUEST_TYPE_SCENE_SSA, \
     REQUEST_TYPE_SCENE_SSS
@@ -34,7 +36,8 @@ from skytemple.module.script.controller.ssb import SsbController, SCRIPT_SCRIPTS
 from skytemple.module.script.controller.lsd import LsdController
 from skytemple.module.script.controller.main import MainController, SCRIPT_SCENES
 from skytemple.module.script.controller.sub import SubController
-from skytemple_files.common.script_util import load_script_files, SCRIPT_DIR, SSA_EXT, SSS_EXT
+from skytemple.module.script.script_file_tree import ScriptFileTree
+from skytemple_files.common.script_util import SCRIPT_DIR, SSA_EXT, SSS_EXT, ScriptFiles
 from skytemple_files.common.types.file_types import FileType
 
 
@@ -47,14 +50,23 @@ class ScriptModule(AbstractModule):
     def sort_order(cls):
         return 50
 
+    @classmethod
+    def tree_placeholder(cls):
+        return 'skytemple-e-ground-symbolic', SCRIPT_SCENES
+
+    @classmethod
+    def handled_request_types(cls):
+        return [REQUEST_TYPE_SCENE, REQUEST_TYPE_SCENE_SSE, REQUEST_TYPE_SCENE_SSA, REQUEST_TYPE_SCENE_SSS]
+
     def __init__(self, rom_project: RomProject):
         """Loads the list of backgrounds for the ROM."""
         self.project = rom_project
 
-        # Load all scripts
-        self.script_engine_file_tree = load_script_files(self.project.get_rom_folder(SCRIPT_DIR))
+        # Load all scripts. The debugger gets a snapshot of them (see get_script_files).
+        self.script_file_tree = ScriptFileTree(self.project.get_rom_folder(SCRIPT_DIR))
+        self.script_engine_file_tree = self.script_file_tree.files
 
-        # Tree iters for handle_request:
+        # Tree iters for handle_request (scenes are keyed by their full path):
         self._map_scene_root: Dict[str, Gtk.TreeIter] = {}
         self._map_ssas: Dict[str, Dict[str, Gtk.TreeIter]] = {}
         self._map_sse: Dict[str, Gtk.TreeIter] = {}
@@ -164,6 +176,16 @@ class ScriptModule(AbstractModule):
 
         recursive_generate_item_store_row_label(self._tree_model[root])
 
+    def _get_scene_item(self, mapname: str, scene_type: str, filename: str) -> Optional[Gtk.TreeIter]:
+        """Returns the item tree iter for a scene (by its full path) or None."""
+        if scene_type == 'ssa':
+            return self._map_ssas.get(mapname, {}).get(filename)
+        if scene_type == 'sss':
+            return self._map_ssss.get(mapname, {}).get(filename)
+        if scene_type == 'sse':
+            return self._map_sse.get(mapname)
+        return None
+
     def handle_request(self, request: OpenRequest) -> Optional[Gtk.TreeIter]:
         if request.type == REQUEST_TYPE_SCENE:
             # if we have an enter scene, open it directly.
@@ -175,31 +197,29 @@ class ScriptModule(AbstractModule):
         if request.type == REQUEST_TYPE_SCENE_SSE:
             if request.identifier in self._map_sse:
                 return self._map_sse[request.identifier]
-        if request.type == REQUEST_TYPE_SCENE_SSA:
-            if request.identifier[0] in self._map_ssas:
-                for it in self._map_ssas[request.identifier[0]].values():
-                    # Check if the filename of the tree iter entry (see load_tree_items) matches the request filename.
-                    file_name = self._tree_model[it][4]['file'].split('/')[-1]
-                    if file_name == request.identifier[1]:
-                        return it
-        if request.type == REQUEST_TYPE_SCENE_SSS:
-            if request.identifier[0] in self._map_ssss:
-                for it in self._map_ssss[request.identifier[0]].values():
-                    # Check if the filename of the tree iter entry (see load_tree_items) matches the request filename.
-                    file_name = self._tree_model[it][4]['file'].split('/')[-1]
-                    if file_name == request.identifier[1]:
-                        return it
+        if request.type == REQUEST_TYPE_SCENE_SSA or request.type == REQUEST_TYPE_SCENE_SSS:
+            mapname, scene_filename = request.identifier
+            scene_type = 'ssa' if request.type == REQUEST_TYPE_SCENE_SSA else 'sss'
+            return self._get_scene_item(mapname, scene_type, f"{SCRIPT_DIR}/{mapname}/{scene_filename}")
         return None
 
+    def get_script_files(self) -> ScriptFiles:
+        """
+        Returns a snapshot of the files used by the script engine, for the debugger.
+        The snapshot is not updated, the debugger is informed about changes through the debugger manager instead
+        (see add_script).
+        """
+        return copy.deepcopy(self.script_file_tree.files)
+
     def get_ssa(self, filename):
         return self.project.open_file_in_rom(filename, FileType.SSA,
                                              scriptdata=self.project.get_rom_module().get_static_data().script_data)
 
     def get_scenes_for_map(self, mapname):
         """Returns the filenames (not including paths) of all SSE/SSA/SSS files for this map."""
-        if mapname not in self.script_engine_file_tree['maps']:
+        map_obj = self.script_file_tree.get_map(mapname)
+        if map_obj is None:
             return []
-        map_obj = self.script_engine_file_tree['maps'][mapname]
 
         scenes = []
         if map_obj['enter_sse'] is not None:
@@ -215,16 +235,7 @@ class ScriptModule(AbstractModule):
         """Mark a specific scene as modified"""
         self.project.mark_as_modified(filename)
 
-        treeiter = None
-        if type == 'ssa':
-            if mapname in self._map_ssas and filename in self._map_ssas[mapname]:
-                treeiter = self._map_ssas[mapname][filename]
-        elif type == 'sss':
-            if mapname in self._map_ssss and filename in self._map_ssss[mapname]:
-                treeiter = self._map_ssss[mapname][filename]
-        elif type == 'sse':
-            if mapname in self._map_sse:
-                treeiter = self._map_sse[mapname]
+        treeiter = self._get_scene_item(mapname, type, filename)
 
         # Mark as modified in tree
         if treeiter is not None:
@@ -232,6 +243,21 @@ class ScriptModule(AbstractModule):
             if row is not None:
                 recursive_up_item_store_mark_as_modified(row)
 
+    def add_script(self, mapname: str, type: str, scene_filename: str, ssb_filename: str):
+        """
+        Registers an SSB file, that was created in the ROM, for a SSE or SSS scene.
+        Updates the script file tree, the item tree and the debugger.
+        """
+        self.script_file_tree.add_script(mapname, type, scene_filename, ssb_filename)
+        SkyTempleMainController.debugger_manager().on_script_added(
+            f"{SCRIPT_DIR}/{mapname}/{ssb_filename}", mapname, type, scene_filename
+        )
+        treeiter = self._get_scene_item(mapname, type, f"{SCRIPT_DIR}/{mapname}/{scene_filename}")
+        if treeiter is not None:
+            scripts = self._tree_model[treeiter][4]['scripts']
+            if ssb_filename not in scripts:
+                scripts.append(ssb_filename)
+
     def get_sprite_provider(self) -> SpriteProvider:
         return self.project.get_sprite_provider()
 
@@ -0,0 +1,56 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+from typing import List, Optional
+
+from ndspy.fnt import Folder
+
+from skytemple_files.common.script_util import load_script_files, ScriptFiles, MapEntry
+
+
+class ScriptFileTree:
+    """
+    The files used by the script engine (see skytemple_files.common.script_util.load_script_files).
+    The SCRIPT directory is only walked once, after that the tree is updated when scripts are added.
+
+    The ScriptFiles dict (files) must only be changed through this class. The debugger gets a snapshot
+    (see ScriptModule.get_script_files), that the script module updates through the debugger manager,
+    whenever it changes the tree.
+    """
+    def __init__(self, script_folder: Folder):
+        self.files: ScriptFiles = load_script_files(script_folder)
+
+    def get_map(self, mapname: str) -> Optional[MapEntry]:
+        return self.files['maps'].get(mapname)
+
+    def get_scripts(self, mapname: str, scene_type: str, scene_filename: str) -> List[str]:
+        """Returns the file names (not including paths) of the SSB files of a scene."""
+        map_obj = self.files['maps'][mapname]
+        if scene_type == 'sse':
+            return map_obj['enter_ssbs']
+        if scene_type == 'ssa':
+            return [ssb for ssa, ssb in map_obj['ssas'] if ssa == scene_filename]
+        if scene_type == 'sss':
+            return map_obj['subscripts'][scene_filename]
+        raise ValueError(f"Unknown scene type: {scene_type}")
+
+    def add_script(self, mapname: str, scene_type: str, scene_filename: str, ssb_filename: str):
+        """Adds an SSB file (file name, not including path) to an existing SSE or SSS scene."""
+        if scene_type == 'ssa':
+            raise ValueError("Acting scenes must have exactly one script assigned to them.")
+        scripts = self.get_scripts(mapname, scene_type, scene_filename)
+        if ssb_filename not in scripts:
+            scripts.append(ssb_filename)
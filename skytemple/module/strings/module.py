@@ -37,6 +37,10 @@ class StringsModule(AbstractModule):
     def sort_order(cls):
         return 30
 
+    @classmethod
+    def tree_placeholder(cls):
+        return 'skytemple-e-string-symbolic', TEXT_STRINGS
+
     def __init__(self, rom_project: RomProject):
         self.project = rom_project
 
@@ -14,76 +14,183 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
-from typing import List, Iterable, Optional
+import math
+from typing import List, Optional, Sequence, Tuple, TYPE_CHECKING
 
-import cairo
+if TYPE_CHECKING:
+    import cairo
 FRAME_COUNTER_MAX = 1000000
 
 
+class AnimationClock:
+    """
+    The frame clock of a single animation, eg. one BPA or one palette animation slot.
+    Each frame of the animation is held for its own number of ticks.
+    """
+    def __init__(self, durations: Sequence[int]):
+        """
+        :param durations: For each frame of the animation, how many ticks to hold it.
+        """
+        if len(durations) < 1:
+            raise ValueError("An animation clock needs at least one frame duration.")
+        self.durations = list(durations)
+        # Counts up the current frame index, up to FRAME_COUNTER_MAX. Use the % operator to get
+        # the current element in the frame lists.
+        self.frame = 0
+        self._ticks_left = self._current_duration()
+
+    @classmethod
+    def lockstep(cls, animations: Sequence[Sequence[int]]) -> 'AnimationClock':
+        """
+        Returns one clock for multiple animations that are rendered in lockstep (all animations show their
+        frame i % their number of frames at the same time). The clock has as many frames as the least common
+        multiple of the number of frames of the animations, after that all of them start over together.
+        Each frame is held as long as the slowest of the animations holds it.
+        :param animations: For each animation, for each of its frames, how many ticks to hold it.
+        """
+        number_of_frames = 1
+        for durations in animations:
+            number_of_frames = number_of_frames * len(durations) // math.gcd(number_of_frames, len(durations))
+        return cls([
+            max(durations[frame % len(durations)] for durations in animations)
+            for frame in range(0, number_of_frames)
+        ])
+
+    def advance(self, ticks=1) -> bool:
+        """Advance by the given number of ticks. Returns whether or not the frame changed."""
+        changed = False
+        while ticks >= self._ticks_left:
+            ticks -= self._ticks_left
+            changed = True
+            self.frame += 1
+            if self.frame > FRAME_COUNTER_MAX:
+                self.frame = 0
+            self._ticks_left = self._current_duration()
+        self._ticks_left -= ticks
+        return changed
+
+    def ticks_until_change(self) -> int:
+        return self._ticks_left
+
+    def _current_duration(self) -> int:
+        # A duration of 0 would never advance, hold these frames for one tick.
+        return max(1, self.durations[self.frame % len(self.durations)])
+
+
 class AnimationContext:
-    """This class can draw animated backgrounds using palette and frame animations."""
-    # TODO: No BPAs at different speeds supported at the moment
-    # TODO: No BPL animations at different speeds supported at the moment
+    """
+    This class can draw animated backgrounds using palette and frame animations.
+
+    Every tile or chunk can be assigned its own clock for the BPA animation and its own clock for the
+    palette animation. The clocks passed in are only used as templates, each context runs its own copies,
+    so the same clocks can be used for multiple contexts. Tiles that are assigned the same clock run in sync.
+    If no clocks are given, all tiles share one clock per animation type, running at bpa_durations and
+    pal_ani_durations.
+    """
     def __init__(
         self,
         # [collection_idx][tile_or_chunk_idx][palette_animation_frame][frame]
-        surfaces: List[List[List[List[cairo.Surface]]]],
+        surfaces: List[List[List[List['cairo.Surface']]]],
         bpa_durations: int,
-        pal_ani_durations: int
+        pal_ani_durations: int,
+        # [collection_idx][tile_or_chunk_idx]
+        bpa_clocks: Optional[List[List[Optional[AnimationClock]]]] = None,
+        pal_ani_clocks: Optional[List[List[Optional[AnimationClock]]]] = None
     ):
         self.surfaces = surfaces
         self.bpa_durations = bpa_durations
         self.pal_ani_durations = pal_ani_durations
 
-        # This counts up the current frame index for BPA and PAL animations, up to FRAME_COUNTER_MAX,
-        # then it resets to 0. Use the % operator to get the current element in the nested lists, as
-        # their sub-list lengths may vary (eg. not all tiles have the same frame number for
-        # BPA animation or palette animation)
-        self._bpa_counter = 0
-        self._pal_counter = 0
+        self.frame_counter = 0
 
-        # The current pal_ani/bpa_ani frame numbers as tuple. This is the current cache "hash"!
-        self._current_cache_hash = (None, None)
-        # The current cached surfaces for each collection:
-        self._current_cache: List[List[cairo.Surface]] = []
+        # The indices of the tiles or chunks that have more than one frame, for each collection.
+        self.animated: List[List[int]] = [
+            [idx for idx, pal_ani_frames in enumerate(collection)
+             if len(pal_ani_frames) > 1 or any(len(bpa_ani_frames) > 1 for bpa_ani_frames in pal_ani_frames)]
+            for collection in surfaces
+        ]
 
-        self.frame_counter = 0
+        if bpa_clocks is None:
+            bpa_clocks = self._shared_clocks(bpa_durations)
+        if pal_ani_clocks is None:
+            pal_ani_clocks = self._shared_clocks(pal_ani_durations)
+
+        # All clocks that drive at least one animated tile, and the tiles they drive as (collection, tile).
+        self._clocks: List[AnimationClock] = []
+        self._clock_tiles: List[List[Tuple[int, int]]] = []
+        # [collection_idx][tile_or_chunk_idx] -> (palette animation clock, bpa clock)
+        self._tile_clocks: List[List[Tuple[Optional[AnimationClock], Optional[AnimationClock]]]] = []
+        clock_indices = {}
+        clock_copies = {}
+        for collection_idx, collection in enumerate(surfaces):
+            collection_clocks = []
+            self._tile_clocks.append(collection_clocks)
+            for tile_idx, pal_ani_frames in enumerate(collection):
+                pal_clock = pal_ani_clocks[collection_idx][tile_idx] if len(pal_ani_frames) > 1 else None
+                bpa_clock = bpa_clocks[collection_idx][tile_idx] \
+                    if any(len(bpa_ani_frames) > 1 for bpa_ani_frames in pal_ani_frames) else None
+                tile_clocks = []
+                for clock in (pal_clock, bpa_clock):
+                    if clock is not None:
+                        if id(clock) not in clock_copies:
+                            clock_copies[id(clock)] = AnimationClock(clock.durations)
+                            clock_indices[id(clock)] = len(self._clocks)
+                            self._clocks.append(clock_copies[id(clock)])
+                            self._clock_tiles.append([])
+                        self._clock_tiles[clock_indices[id(clock)]].append((collection_idx, tile_idx))
+                        clock = clock_copies[id(clock)]
+                    tile_clocks.append(clock)
+                collection_clocks.append(tuple(tile_clocks))
+
+        # The current surfaces for each collection. Only the tiles of clocks that changed are updated.
+        self._current_cache: List[List['cairo.Surface']] = [
+            [self._surface_for(collection_idx, tile_idx) for tile_idx in range(0, len(collection))]
+            for collection_idx, collection in enumerate(surfaces)
+        ]
+        # Indices of the clocks that changed since the last call to current()
+        self._dirty_clocks: List[int] = []
 
     @property
     def num_layers(self) -> int:
         return len(self.surfaces)
 
-    def current(self) -> List[List[cairo.Surface]]:
+    def current(self) -> List[List['cairo.Surface']]:
         """Returns the surfaces for this frame"""
-        if (self._pal_counter, self._bpa_counter) == self._current_cache_hash:
-            return self._current_cache
-
-        self._current_cache = []
-        for collection_idx, collection in enumerate(self.surfaces):
-            # The surfaces for this collection, for this frame:
-            collection_surfaces: List[cairo.Surface] = []
-            for tile_idx, pal_ani_frames in enumerate(collection):
-                bpa_ani_frames = pal_ani_frames[self._pal_counter % len(pal_ani_frames)]
-                surf = bpa_ani_frames[self._bpa_counter % len(bpa_ani_frames)]
-                collection_surfaces.append(surf)
-            self._current_cache.append(collection_surfaces)
-        self._current_cache_hash = (self._pal_counter, self._bpa_counter)
+        for clock_idx in self._dirty_clocks:
+            for collection_idx, tile_idx in self._clock_tiles[clock_idx]:
+                self._current_cache[collection_idx][tile_idx] = self._surface_for(collection_idx, tile_idx)
+        self._dirty_clocks = []
         return self._current_cache
 
-    def advance(self):
-        # Advance frame if enough time passed
-        if self.bpa_durations > 0:
-            if self.frame_counter % self.bpa_durations == 0:
-                self._bpa_counter += 1
-                if self._bpa_counter > FRAME_COUNTER_MAX:
-                    self._bpa_counter = 0
-
-        if self.pal_ani_durations > 0:
-            if self.frame_counter % self.pal_ani_durations == 0:
-                self._pal_counter += 1
-                if self._pal_counter > FRAME_COUNTER_MAX:
-                    self._pal_counter = 0
-
-        self.frame_counter += 1
+    def advance(self, ticks=1) -> bool:
+        """Advance by the given number of frames. Returns whether or not any animation changed its frame."""
+        changed = False
+        for clock_idx, clock in enumerate(self._clocks):
+            if clock.advance(ticks):
+                changed = True
+                self._dirty_clocks.append(clock_idx)
+
+        self.frame_counter += ticks
         if self.frame_counter > FRAME_COUNTER_MAX:
             self.frame_counter = 0
+        return changed
+
+    def ticks_until_change(self) -> Optional[int]:
+        """
+        Returns how many frames have to be advanced until the next animation frame changes.
+        Returns None if nothing is animated.
+        """
+        if len(self._clocks) < 1:
+            return None
+        return min(clock.ticks_until_change() for clock in self._clocks)
+
+    def _shared_clocks(self, durations: int) -> List[List[Optional[AnimationClock]]]:
+        """Assigns one clock running at the given duration to all tiles, or no clock if durations is 0."""
+        clock = AnimationClock([durations]) if durations > 0 else None
+        return [[clock] * len(collection) for collection in self.surfaces]
+
+    def _surface_for(self, collection_idx: int, tile_idx: int) -> 'cairo.Surface':
+        pal_clock, bpa_clock = self._tile_clocks[collection_idx][tile_idx]
+        pal_ani_frames = self.surfaces[collection_idx][tile_idx]
+        bpa_ani_frames = pal_ani_frames[pal_clock.frame % len(pal_ani_frames) if pal_clock else 0]
+        return bpa_ani_frames[bpa_clock.frame % len(bpa_ani_frames) if bpa_clock else 0]
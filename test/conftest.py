@@ -0,0 +1,134 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+# skytemple/main.py, without importing it.
+MAIN_MODULE_PATH = importlib.util.find_spec('skytemple.main').origin
+# The script pip generates for the skytemple console script.
+CONSOLE_SCRIPT = '''\
+# -*- coding: utf-8 -*-
+import re
+import sys
+from skytemple.main import main
+if __name__ == '__main__':
+    sys.argv[0] = re.sub(r'(-script\\.pyw|\\.exe)?$', '', sys.argv[0])
+    sys.exit(main())
+'''
+
+
+def pytest_addoption(parser):
+    parser.addoption('--benchmark', action='store_true', default=False,
+                     help='Also run the benchmarks (tests marked with "benchmark").')
+    parser.addoption('--rom', default=os.environ.get('SKYTEMPLE_TEST_ROM'),
+                     help='Path to a ROM of Explorers of Sky, for the tests that need one. '
+                          'Defaults to the environment variable SKYTEMPLE_TEST_ROM.')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'benchmark: a benchmark, only run with --benchmark.')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--benchmark'):
+        return
+    skip = pytest.mark.skip(reason='Benchmarks are only run with --benchmark.')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def measure():
+    """Returns a function, that runs a callable repeatedly and returns the best time in seconds."""
+    def measure(fn, repeat=5):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            duration = time.perf_counter() - start
+            if best is None or duration < best:
+                best = duration
+        return best
+    return measure
+
+
+@pytest.fixture
+def eos_rom_path(request):
+    """Path to a ROM of Explorers of Sky (see --rom). Tests using it are skipped, if there is none."""
+    path = request.config.getoption('--rom')
+    if path is None or not os.path.exists(path):
+        pytest.skip('Needs a ROM, see --rom.')
+    return path
+
+
+@pytest.fixture(params=['console_script', 'main_module'])
+def skytemple_entry_point(request, tmp_path):
+    """
+    The scripts SkyTemple is started from: The console script installed by pip and skytemple/main.py
+    (the PyInstaller builds, see installer/skytemple.spec).
+    """
+    if request.param == 'console_script':
+        script = tmp_path / 'skytemple'
+        script.write_text(CONSOLE_SCRIPT)
+        return str(script)
+    return MAIN_MODULE_PATH
+
+
+@pytest.fixture
+def spawn_worker_from(tmp_path):
+    """
+    Returns a function, that starts a WorkerPool worker in a process, that was started from the given script
+    (without running its __main__ block). The worker imports the given module, like it does when it runs
+    a function of it. Returns the main script and the modules of the worker.
+    """
+    def spawn_worker_from(entry_point, worker_module):
+        (tmp_path / 'probe.py').write_text(textwrap.dedent('''\
+            import importlib
+            import sys
+
+            def worker_modules(worker_module):
+                importlib.import_module(worker_module)
+                return sys.modules['__mp_main__'].__file__, sorted(sys.modules.keys())
+        '''))
+        (tmp_path / 'start_worker.py').write_text(textwrap.dedent(f'''\
+            import json
+            import __main__
+            # Worker processes run the main script of the process that starts them.
+            __main__.__file__ = {entry_point!r}
+            import probe
+            from skytemple.core.worker_pool import WorkerPool
+            pool = WorkerPool(1)
+            print(json.dumps(pool.submit(probe.worker_modules, {worker_module!r}).result()))
+            pool.shutdown()
+        '''))
+        result = subprocess.run(
+            [sys.executable, str(tmp_path / 'start_worker.py')], capture_output=True, text=True,
+            cwd=str(tmp_path), env=dict(os.environ, PYTHONPATH=os.pathsep.join(
+                [os.path.dirname(os.path.dirname(MAIN_MODULE_PATH)), os.environ.get('PYTHONPATH', '')]
+            ))
+        )
+        assert result.returncode == 0, result.stderr
+        return json.loads(result.stdout)
+    return spawn_worker_from
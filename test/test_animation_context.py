@@ -0,0 +1,206 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+from skytemple.module.tiled_img.animation_context import AnimationClock, AnimationContext
+
+
+def frames_over_time(clock, ticks):
+    """Advances the clock tick by tick and returns its frame after every tick."""
+    frames = []
+    for _ in range(ticks):
+        clock.advance()
+        frames.append(clock.frame)
+    return frames
+
+
+def test_clock_advance_single_ticks():
+    clock = AnimationClock([2, 3, 1])
+
+    assert clock.frame == 0
+    assert frames_over_time(clock, 12) == [0, 1, 1, 1, 2, 3, 3, 4, 4, 4, 5, 6]
+
+
+def test_clock_advance_multiple_ticks():
+    clock = AnimationClock([2, 3, 1])
+
+    assert not clock.advance(1)
+    assert clock.frame == 0
+    # Crosses frame 1 and 2 at once.
+    assert clock.advance(5)
+    assert clock.frame == 3
+    assert clock.ticks_until_change() == 2
+    assert clock.advance(8)
+    # 2 ticks left in frame 3, then 3 + 1 + 2 for frames 4 to 6, so exactly at the start of frame 7.
+    assert clock.frame == 7
+    assert clock.ticks_until_change() == 3
+
+
+def test_clock_advance_same_as_single_ticks():
+    for ticks in range(1, 8):
+        single = AnimationClock([4, 1, 3])
+        multi = AnimationClock([4, 1, 3])
+        for _ in range(10):
+            for _ in range(ticks):
+                single.advance()
+            multi.advance(ticks)
+            assert (multi.frame, multi.ticks_until_change()) == (single.frame, single.ticks_until_change())
+
+
+def test_clock_ticks_until_change_at_frame_edges():
+    clock = AnimationClock([3, 2])
+
+    assert clock.ticks_until_change() == 3
+    assert not clock.advance(2)
+    assert clock.ticks_until_change() == 1
+    # Exactly at the edge: The frame changes and the full duration of the next frame is left.
+    assert clock.advance(1)
+    assert clock.frame == 1
+    assert clock.ticks_until_change() == 2
+    assert clock.advance(clock.ticks_until_change())
+    assert clock.frame == 2
+    assert clock.ticks_until_change() == 3
+
+
+def test_clock_zero_durations_hold_one_tick():
+    clock = AnimationClock([0, 2])
+
+    assert clock.ticks_until_change() == 1
+    assert clock.advance()
+    assert clock.frame == 1
+    assert clock.ticks_until_change() == 2
+
+
+def test_context_advance_multiple_ticks():
+    # One layer, chunk 0 is static, chunk 1 has 3 BPA frames, chunk 2 has 2 palette animation frames.
+    surfaces = [[
+        [['static']],
+        [['bpa0', 'bpa1', 'bpa2']],
+        [['pal0'], ['pal1']],
+    ]]
+    context = AnimationContext(surfaces, 4, 6)
+
+    assert context.animated == [[1, 2]]
+    assert context.current() == [['static', 'bpa0', 'pal0']]
+    assert context.ticks_until_change() == 4
+    assert not context.advance(3)
+    assert context.ticks_until_change() == 1
+    assert context.advance(1)
+    assert context.current() == [['static', 'bpa1', 'pal0']]
+    assert context.ticks_until_change() == 2
+    # Both change at tick 12.
+    assert context.advance(8)
+    assert context.current() == [['static', 'bpa0', 'pal0']]
+    assert context.frame_counter == 12
+
+
+def test_context_without_animations():
+    context = AnimationContext([[[['a']], [['b']]]], 0, 0)
+
+    assert context.ticks_until_change() is None
+    assert not context.advance(100)
+    assert context.current() == [['a', 'b']]
+
+
+def test_context_advancing_to_next_change():
+    """Advancing by ticks_until_change, like the drawers do, always changes a frame."""
+    surfaces = [[[['a0', 'a1']], [['b0', 'b1', 'b2']]]]
+    clock_a, clock_b = AnimationClock([5]), AnimationClock([3, 7])
+    context = AnimationContext(surfaces, 0, 0, bpa_clocks=[[clock_a, clock_b]])
+
+    seen = []
+    ticks = 0
+    for _ in range(8):
+        step = context.ticks_until_change()
+        assert context.advance(step)
+        ticks += step
+        seen.append((ticks, context.current()[0][:]))
+    assert seen == [
+        (3, ['a0', 'b1']), (5, ['a1', 'b1']), (10, ['a0', 'b2']), (13, ['a0', 'b0']),
+        (15, ['a1', 'b0']), (20, ['a0', 'b1']), (23, ['a0', 'b2']), (25, ['a1', 'b2']),
+    ]
+
+
+def test_lockstep_clock_has_lcm_period():
+    # Two BPAs rendered in lockstep, with 2 and 3 frames.
+    clock = AnimationClock.lockstep([[1, 5], [2, 2, 2]])
+
+    assert clock.durations == [2, 5, 2, 5, 2, 5]
+    period = sum(clock.durations)
+    for i in range(1, 4):
+        assert clock.advance(period)
+        assert clock.frame == i * 6
+        assert clock.ticks_until_change() == 2
+
+
+def test_lockstep_clock_of_one_animation():
+    assert AnimationClock.lockstep([[3, 4, 5]]).durations == [3, 4, 5]
+    assert AnimationClock.lockstep([[4, 4], [6, 6, 6, 6]]).durations == [6, 6, 6, 6]
+
+
+def test_separate_clocks_with_mixed_durations_repeat_after_lcm():
+    """Chunks with BPAs of different total durations get their own clocks, they all start over at the LCM."""
+    surfaces = [[[['a0', 'a1']], [['b0', 'b1', 'b2']]]]
+    # Total durations 8 and 9, they are in sync again after 72 ticks.
+    context = AnimationContext(surfaces, 0, 0, bpa_clocks=[[AnimationClock([4, 4]), AnimationClock([3, 3, 3])]])
+    states = []
+    for tick in range(72 * 2):
+        states.append(tuple(context.current()[0]))
+        context.advance()
+
+    assert states[:72] == states[72:]
+    assert len(set(states[:72])) == 6
+    # And not earlier.
+    assert all(states[d:72 + d] != states[:72] for d in range(1, 72))
+
+
+def test_current_only_updates_tiles_of_dirty_clocks():
+    surfaces = [[[['a0', 'a1']], [['b0', 'b1']]]]
+    context = AnimationContext(surfaces, 0, 0, bpa_clocks=[[AnimationClock([2]), AnimationClock([3])]])
+    assert context.current() == [['a0', 'b0']]
+    # Replace the surfaces behind the context's back: Only tiles of clocks that changed pick it up.
+    surfaces[0][0][0] = ['A0', 'A1']
+    surfaces[0][1][0] = ['B0', 'B1']
+
+    assert context.advance(2)
+    assert context.current() == [['A1', 'b0']]
+    assert context._dirty_clocks == []
+    # Nothing changed, nothing is updated.
+    assert not context.advance(0)
+    assert context.current() == [['A1', 'b0']]
+    assert context.advance(1)
+    assert context.current() == [['A1', 'B1']]
+
+
+def test_dirty_clocks_accumulate_between_current_calls():
+    surfaces = [[[['a0', 'a1']], [['b0', 'b1']]]]
+    context = AnimationContext(surfaces, 0, 0, bpa_clocks=[[AnimationClock([2]), AnimationClock([3])]])
+
+    assert context.advance(2)
+    assert context.advance(1)
+    assert context.current() == [['a1', 'b1']]
+    assert context.current() is context.current()
+
+
+def test_tiles_with_the_same_clock_share_it():
+    clock = AnimationClock([2])
+    surfaces = [[[['a0', 'a1']], [['b0', 'b1']]], [[['c0', 'c1']]]]
+    context = AnimationContext(surfaces, 0, 0, bpa_clocks=[[clock, clock], [clock]])
+
+    assert len(context._clocks) == 1
+    assert context.advance(2)
+    assert context.current() == [['a1', 'b1'], ['c1']]
+    # The clocks passed in are only templates.
+    assert clock.frame == 0
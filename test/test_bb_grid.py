@@ -0,0 +1,116 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import random
+
+import pytest
+
+from skytemple.core.mapbg_util.bb_grid import BoundingBoxGrid
+
+
+def test_at_finds_items_containing_the_point():
+    grid = BoundingBoxGrid(cell_size=16)
+    grid.insert('a', 'A', (0, 0, 10, 10), 1)
+    grid.insert('b', 'B', (5, 5, 40, 40), 2)
+
+    assert sorted(grid.at(7, 7)) == [('A', 1), ('B', 2)]
+    assert grid.at(30, 30) == [('B', 2)]
+    assert grid.at(100, 100) == []
+
+
+def test_right_and_bottom_edges_are_exclusive():
+    grid = BoundingBoxGrid(cell_size=16)
+    grid.insert('a', 'A', (0, 0, 16, 16))
+
+    assert grid.at(15.9, 15.9) == [('A', 0)]
+    assert grid.at(16, 0) == []
+    assert grid.at(0, 16) == []
+    # Only registered in the one cell it overlaps.
+    assert grid._entries['a'][3] == [(0, 0)]
+
+
+def test_negative_coordinates():
+    grid = BoundingBoxGrid(cell_size=16)
+    grid.insert('a', 'A', (-20, -20, 10, 10))
+
+    assert grid.at(-15, -15) == [('A', 0)]
+    assert grid.at(-5, -5) == []
+
+
+def test_insert_replaces_and_remove():
+    grid = BoundingBoxGrid(cell_size=16)
+    grid.insert('a', 'A', (0, 0, 10, 10), 1)
+    grid.insert('a', 'A2', (50, 50, 10, 10), 3)
+
+    assert len(grid) == 1
+    assert grid.at(5, 5) == []
+    assert grid.at(55, 55) == [('A2', 3)]
+    assert grid.get('a') == ('A2', (50, 50, 10, 10), 3)
+
+    grid.remove('a')
+    grid.remove('a')
+    assert 'a' not in grid
+    assert grid.at(55, 55) == []
+    # No empty cells are left behind.
+    assert grid._cells == {}
+
+
+def test_empty_bounding_boxes_are_never_found():
+    grid = BoundingBoxGrid(cell_size=16)
+    grid.insert('a', 'A', (0, 0, 0, 10))
+
+    assert 'a' in grid
+    assert grid.at(0, 0) == []
+
+
+def test_same_results_as_linear_search():
+    rng = random.Random(1)
+    grid = BoundingBoxGrid()
+    boxes = {}
+    for i in range(500):
+        bb = (rng.randint(-50, 1000), rng.randint(-50, 1000), rng.randint(1, 100), rng.randint(1, 100))
+        boxes[i] = bb
+        grid.insert(i, i, bb, i)
+    for _ in range(500):
+        x, y = rng.uniform(-60, 1100), rng.uniform(-60, 1100)
+        expected = sorted(i for i, (bx, by, bw, bh) in boxes.items() if bx <= x < bx + bw and by <= y < by + bh)
+        assert sorted(item for item, _ in grid.at(x, y)) == expected
+
+
+@pytest.mark.benchmark
+def test_benchmark_hit_test_500_entities(measure):
+    """Hit-testing 1000 mouse positions on a scene with 500 entities, linear search vs. the grid."""
+    rng = random.Random(1)
+    boxes = [
+        (rng.randint(0, 1000), rng.randint(0, 1000), rng.randint(16, 48), rng.randint(16, 48)) for _ in range(500)
+    ]
+    points = [(rng.uniform(0, 1050), rng.uniform(0, 1050)) for _ in range(1000)]
+    grid = BoundingBoxGrid()
+    for i, bb in enumerate(boxes):
+        grid.insert(i, i, bb, i)
+
+    def linear():
+        for x, y in points:
+            max((i for i, (bx, by, bw, bh) in enumerate(boxes) if bx <= x < bx + bw and by <= y < by + bh),
+                default=None)
+
+    def indexed():
+        for x, y in points:
+            max(grid.at(x, y), key=lambda e: e[1], default=None)
+
+    linear_time = measure(linear)
+    indexed_time = measure(indexed)
+    print(f'\n1000 hit-tests, 500 entities: linear {linear_time * 1000:.2f}ms, grid {indexed_time * 1000:.2f}ms')
@@ -0,0 +1,153 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import random
+from types import SimpleNamespace
+
+import pytest
+try:
+    from PIL import Image
+except ImportError:
+    from pil import Image
+
+pytest.importorskip('gi')
+cairo = pytest.importorskip('cairo')
+
+from skytemple.core import img_utils
+from skytemple.module.map_bg.chunk_surfaces import ChunkSurfaces
+from skytemple.module.map_bg.drawer import Drawer
+from skytemple_files.graphics.bma.model import Bma
+from skytemple_files.graphics.bpc.model import BPC_TILE_DIM
+
+# A map of 64x64 chunks with two layers, that each have 1024 different chunks.
+MAP_SIZE_IN_CHUNKS = 64
+NUMBER_CHUNKS = 1024
+CHUNK_DIM = 3 * BPC_TILE_DIM
+PALETTE = [(i * 16) % 256 for i in range(16 * 3)] * 16
+
+
+class FakeBpc:
+    """Implements what ChunkSurfaces needs of a Bpc, for chunks without animations."""
+    number_of_layers = 2
+
+    def __init__(self):
+        self.layers = [SimpleNamespace(chunk_tilemap_len=NUMBER_CHUNKS, number_tiles=9) for _ in range(2)]
+
+    def get_chunk(self, layer, chunk_idx):
+        return [SimpleNamespace(pal_idx=0, idx=i + 1) for i in range(9)]
+
+    def single_chunk_animated_to_pil(self, layer, chunk_idx, palettes, bpas):
+        rand = random.Random(layer * NUMBER_CHUNKS + chunk_idx)
+        img = Image.frombytes('P', (CHUNK_DIM, CHUNK_DIM), bytes(
+            b & 0xf for b in rand.randbytes(CHUNK_DIM * CHUNK_DIM)
+        ))
+        img.putpalette(PALETTE)
+        return [img]
+
+
+class FakeBpl:
+    number_palettes = 16
+    has_palette_animation = False
+    palettes = []
+
+    def is_palette_affected_by_animation(self, pal_idx):
+        return False
+
+
+class PerSurfaceChunkSurfaces(ChunkSurfaces):
+    """How chunks were rendered before, into one surface for each chunk."""
+    @staticmethod
+    def _images_to_surfaces(images):
+        return [img_utils.pil_to_cairo_surface(img) for img in images]
+
+
+def create_bma():
+    bma = Bma.__new__(Bma)
+    bma.tiling_width = 3
+    bma.tiling_height = 3
+    bma.map_width_chunks = MAP_SIZE_IN_CHUNKS
+    bma.map_height_chunks = MAP_SIZE_IN_CHUNKS
+    bma.map_width_camera = MAP_SIZE_IN_CHUNKS * 3
+    bma.map_height_camera = MAP_SIZE_IN_CHUNKS * 3
+    number_positions = MAP_SIZE_IN_CHUNKS * MAP_SIZE_IN_CHUNKS
+    bma.layer0 = [i % NUMBER_CHUNKS for i in range(number_positions)]
+    bma.layer1 = [(i * 7) % NUMBER_CHUNKS if i % 3 else 0 for i in range(number_positions)]
+    bma.collision = None
+    bma.collision2 = None
+    bma.unknown_data_block = None
+    return bma
+
+
+def render(chunk_surfaces_class):
+    chunk_surfaces = chunk_surfaces_class()
+    chunk_surfaces.render(FakeBpc(), FakeBpl(), [])
+    return chunk_surfaces
+
+
+def create_drawer(chunk_surfaces):
+    # The drawer doesn't need a real widget to draw.
+    draw_area = SimpleNamespace(queue_draw=lambda: None, get_size_request=lambda: (0, 0))
+    return Drawer(draw_area, create_bma(), chunk_surfaces.bpa_durations, chunk_surfaces.pal_ani_durations,
+                  chunk_surfaces.surfaces)
+
+
+def draw(drawer):
+    size = MAP_SIZE_IN_CHUNKS * CHUNK_DIM
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, size, size)
+    drawer.draw(None, cairo.Context(surface))
+    surface.flush()
+    return bytes(surface.get_data())
+
+
+def test_atlas_draws_like_surface_per_chunk():
+    atlas = render(ChunkSurfaces)
+    per_surface = render(PerSurfaceChunkSurfaces)
+
+    assert len(atlas.surfaces) == 2
+    assert all(len(layer) == NUMBER_CHUNKS for layer in atlas.surfaces)
+    assert draw(create_drawer(atlas)) == draw(create_drawer(per_surface))
+
+
+@pytest.mark.benchmark
+def test_benchmark_atlas_memory_and_draw_time(monkeypatch, measure):
+    """
+    Chunk surfaces of a 64x64 chunk map, one surface per chunk vs. one atlas per layer: The memory of
+    all image surfaces and the time Drawer.draw takes, for drawing all chunks (without the cached static layers)
+    and for a redraw with them.
+    """
+    image_surfaces = []
+
+    def pil_to_cairo_surface(im, format=cairo.FORMAT_ARGB32):
+        surface = original_pil_to_cairo_surface(im, format)
+        image_surfaces.append(surface)
+        return surface
+    original_pil_to_cairo_surface = img_utils.pil_to_cairo_surface
+    monkeypatch.setattr(img_utils, 'pil_to_cairo_surface', pil_to_cairo_surface)
+
+    results = []
+    for name, chunk_surfaces_class in (('surface per chunk', PerSurfaceChunkSurfaces), ('atlas', ChunkSurfaces)):
+        image_surfaces.clear()
+        drawer = create_drawer(render(chunk_surfaces_class))
+        memory = sum(surface.get_stride() * surface.get_height() for surface in image_surfaces)
+
+        def draw_all_chunks():
+            drawer.invalidate_static_layers()
+            draw(drawer)
+        all_chunks = measure(draw_all_chunks, 3)
+        redraw = measure(lambda: draw(drawer), 3)
+        results.append(f'{name}: {len(image_surfaces)} surfaces, {memory / 1024 / 1024:.1f} MiB, '
+                       f'drawing all chunks {all_chunks * 1000:.1f}ms, redraw {redraw * 1000:.1f}ms')
+    print('\n64x64 chunk map, 2048 chunks: ' + '; '.join(results))
@@ -0,0 +1,226 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+from types import SimpleNamespace
+
+import pytest
+from ndspy.rom import NintendoDSRom
+
+gi = pytest.importorskip('gi')
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk, GObject
+
+# The dungeon module imports FileType, which can fail to import if skytemple-rust doesn't match skytemple-files.
+dungeon_module = pytest.importorskip('skytemple.module.dungeon.module', exc_type=ImportError)
+from skytemple_files.hardcoded.dungeons import HardcodedDungeons, DungeonDefinition
+from skytemple.module.dungeon.module import DungeonModule, DungeonGroup, DOJO_DUNGEONS_FIRST, DOJO_DUNGEONS_LAST, \
+    MAPPA_PATH, MAPPAG_PATH
+from skytemple_files.common.types.file_types import FileType
+from skytemple_files.dungeon_data.mappa_g_bin.mappa_converter import convert_mappa_to_mappag
+
+# Dungeons 0-19 are in groups of two, all others are single dungeons.
+NUMBER_GROUPED = 20
+NUMBER_FLOORS = 5
+
+
+def create_dungeon_list():
+    dungeons = []
+    for idx in range(DOJO_DUNGEONS_FIRST):
+        if idx < NUMBER_GROUPED:
+            dungeons.append(DungeonDefinition(NUMBER_FLOORS, idx // 2, (idx % 2) * NUMBER_FLOORS, NUMBER_FLOORS * 2))
+        else:
+            dungeons.append(DungeonDefinition(NUMBER_FLOORS, idx, 0, NUMBER_FLOORS))
+    return dungeons
+
+
+class FakeProject:
+    """Implements the binary and file access of RomProject."""
+    def __init__(self, mappa=None):
+        self.arm9_generation = 0
+        self.mappa = mappa
+        self.modified_files = []
+        self.saved_files = {}
+
+    def get_binary_generation(self, binary):
+        return self.arm9_generation
+
+    def get_binary(self, binary):
+        return bytearray()
+
+    def modify_binary(self, binary, modify_cb):
+        modify_cb(bytearray())
+        self.arm9_generation += 1
+
+    def get_rom_module(self):
+        return SimpleNamespace(get_static_data=lambda: None)
+
+    def get_string_provider(self):
+        return SimpleNamespace(get_value=lambda string_type, idx: f'Dungeon {idx}')
+
+    def open_file_in_rom(self, filename, file_handler):
+        assert filename == MAPPA_PATH
+        return self.mappa
+
+    def mark_as_modified(self, filename):
+        self.modified_files.append(filename)
+
+    def save_file_manually(self, filename, data):
+        self.saved_files[filename] = data
+
+
+@pytest.fixture
+def arm9_parses(monkeypatch):
+    """Counts how often the dungeon list is parsed from the ARM9."""
+    parses = []
+
+    def get_dungeon_list(arm9, config):
+        parses.append(arm9)
+        return create_dungeon_list()
+
+    monkeypatch.setattr(HardcodedDungeons, 'get_dungeon_list', staticmethod(get_dungeon_list))
+    monkeypatch.setattr(HardcodedDungeons, 'set_dungeon_list', staticmethod(lambda dungeons, arm9, config: None))
+    return parses
+
+
+@pytest.fixture
+def module():
+    module = DungeonModule.__new__(DungeonModule)
+    module.project = FakeProject()
+    module._dungeon_iters = {}
+    module._dungeon_floor_iters = {}
+    module._dungeon_list_cache = None
+    module._dungeon_restrictions_cache = None
+    module._mappag_outdated = False
+    module._validator = SimpleNamespace(invalid_dungeons=set())
+    module._tree_model = Gtk.TreeStore(str, str, GObject.TYPE_PYOBJECT, GObject.TYPE_PYOBJECT,
+                                       GObject.TYPE_PYOBJECT, bool, str, bool)
+    module._root_iter = module._tree_model.append(None, ['', 'Dungeons', module, None, 0, False, '', True])
+    return module
+
+
+def test_fill_dungeon_tree_parses_arm9_once(module, arm9_parses):
+    module._fill_dungeon_tree()
+
+    assert len(arm9_parses) == 1
+    # All regular and dojo dungeons and all of their floors were added.
+    assert len(module._dungeon_iters) == DOJO_DUNGEONS_LAST + 1
+    for idx in range(DOJO_DUNGEONS_FIRST):
+        assert len(module._dungeon_floor_iters[idx]) == NUMBER_FLOORS
+
+
+def test_load_dungeons_groups(module, arm9_parses):
+    dungeons = list(module.load_dungeons())
+
+    groups = [d for d in dungeons if isinstance(d, DungeonGroup)]
+    assert len(groups) == NUMBER_GROUPED // 2
+    assert groups[0].dungeon_ids == [0, 1]
+    assert groups[0].start_ids == [0, NUMBER_FLOORS]
+    assert dungeons[NUMBER_GROUPED // 2:] == list(range(NUMBER_GROUPED, DOJO_DUNGEONS_FIRST))
+    assert len(arm9_parses) == 1
+
+
+def test_arm9_is_parsed_again_after_it_changed(module, arm9_parses):
+    module.get_number_floors(0)
+    module.get_number_floors(1)
+    assert len(arm9_parses) == 1
+
+    # Changed by something else, eg. a patch.
+    module.project.arm9_generation += 1
+    module.get_number_floors(0)
+    assert len(arm9_parses) == 2
+
+    module.save_dungeon_list(module.get_dungeon_list())
+    module.get_number_floors(0)
+    assert len(arm9_parses) == 3
+
+
+def test_get_dungeon_list_returns_copies(module, arm9_parses):
+    dungeons = module.get_dungeon_list()
+    dungeons[0].number_floors = 99
+
+    assert module.get_number_floors(0) == NUMBER_FLOORS
+    assert len(arm9_parses) == 1
+
+
+def test_dojo_floors_are_not_read_from_arm9(module, arm9_parses):
+    assert module.get_number_floors(DOJO_DUNGEONS_FIRST) == 5
+    assert module.get_number_floors(DOJO_DUNGEONS_LAST - 1) == 1
+    assert module.get_number_floors(DOJO_DUNGEONS_LAST) == 0x30
+    assert len(arm9_parses) == 0
+
+
+@pytest.fixture
+def mappag_conversions(monkeypatch):
+    """Counts how often the mappa_gs file is generated."""
+    conversions = []
+
+    def convert(mappa):
+        conversions.append(mappa)
+        return mappa
+
+    monkeypatch.setattr(dungeon_module, 'convert_mappa_to_mappag', convert)
+    monkeypatch.setattr(dungeon_module, 'FileType', SimpleNamespace(
+        MAPPA_G_BIN=SimpleNamespace(serialize=lambda mappag: b'mappag')
+    ))
+    return conversions
+
+
+def test_save_mappa_defers_mappag_until_save(module, mappag_conversions):
+    module.project.mappa = object()
+    for _ in range(50):
+        module.save_mappa()
+
+    assert mappag_conversions == []
+    assert module.project.modified_files == [MAPPA_PATH] * 50
+    assert MAPPAG_PATH not in module.project.saved_files
+
+    # Called by RomProject before saving.
+    module._regenerate_mappag()
+    assert mappag_conversions == [module.project.mappa]
+    assert module.project.saved_files[MAPPAG_PATH] == b'mappag'
+
+    # Nothing changed since.
+    module._regenerate_mappag()
+    assert len(mappag_conversions) == 1
+
+
+def test_regenerate_mappag_without_changes(module, mappag_conversions):
+    module._regenerate_mappag()
+
+    assert mappag_conversions == []
+    assert module.project.saved_files == {}
+
+
+@pytest.mark.benchmark
+def test_benchmark_edit_50_floors(module, eos_rom_path, measure):
+    """Editing 50 floors, re-generating mappa_gs after every edit vs. once on save."""
+    rom = NintendoDSRom.fromFile(eos_rom_path)
+    module.project.mappa = FileType.MAPPA_BIN.deserialize(rom.getFileByName(MAPPA_PATH))
+    floors = [floor for floor_list in module.project.mappa.floor_lists for floor in floor_list][:50]
+
+    def edit_floors(regenerate_every_edit):
+        for i, floor in enumerate(floors):
+            floor.layout.music_id = i
+            module.save_mappa()
+            if regenerate_every_edit:
+                # What save_mappa did before.
+                FileType.MAPPA_G_BIN.serialize(convert_mappa_to_mappag(module.project.mappa))
+        module._regenerate_mappag()
+
+    every_edit = measure(lambda: edit_floors(True), 3)
+    on_save = measure(lambda: edit_floors(False), 3)
+    print(f'\nEditing 50 floors: mappa_gs re-generated after every edit {every_edit * 1000:.1f}ms, '
+          f'once on save {on_save * 1000:.1f}ms')
@@ -0,0 +1,74 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import pytest
+from PIL import Image
+
+cairo = pytest.importorskip('cairo')
+
+from skytemple.core.img_utils import pil_to_cairo_surface, pil_to_cairo_atlas, pil_to_cairo_atlas_surfaces
+
+
+def chunk_images(count):
+    return [Image.new('RGBA', (24, 24), (i % 256, i // 256 % 256, 0, 255)) for i in range(count)]
+
+
+def pixel(surface, x, y):
+    """Returns the RGBA value of a pixel of an ARGB32 surface."""
+    surface.flush()
+    data = surface.get_data()
+    offset = y * surface.get_stride() + x * 4
+    b, g, r, a = data[offset:offset + 4]
+    return r, g, b, a
+
+
+def test_pil_to_cairo_surface():
+    surface = pil_to_cairo_surface(Image.new('RGBA', (3, 2), (10, 20, 30, 255)))
+
+    assert (surface.get_width(), surface.get_height()) == (3, 2)
+    assert pixel(surface, 2, 1) == (10, 20, 30, 255)
+
+
+def test_pil_to_cairo_atlas():
+    images = chunk_images(5)
+    atlas = pil_to_cairo_atlas(images, columns=2)
+
+    assert (atlas.get_width(), atlas.get_height()) == (48, 72)
+    for i in range(5):
+        assert pixel(atlas, (i % 2) * 24, (i // 2) * 24) == images[i].getpixel((0, 0))
+
+
+def test_pil_to_cairo_atlas_surfaces():
+    images = chunk_images(5)
+    surfaces = pil_to_cairo_atlas_surfaces(images)
+
+    assert len(surfaces) == 5
+    for i, surface in enumerate(surfaces):
+        target = cairo.ImageSurface(cairo.FORMAT_ARGB32, 24, 24)
+        ctx = cairo.Context(target)
+        ctx.set_source_surface(surface, 0, 0)
+        ctx.paint()
+        assert pixel(target, 23, 23) == images[i].getpixel((23, 23))
+
+
+@pytest.mark.benchmark
+def test_benchmark_10000_chunks(measure):
+    """Converting 10,000 chunks (24x24) to cairo surfaces, one by one vs. as one atlas."""
+    images = chunk_images(10000)
+
+    one_by_one = measure(lambda: [pil_to_cairo_surface(im) for im in images], 3)
+    atlas = measure(lambda: pil_to_cairo_atlas_surfaces(images), 3)
+    print(f'\n10,000 chunks: one by one {one_by_one * 1000:.1f}ms, atlas {atlas * 1000:.1f}ms')
@@ -0,0 +1,248 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import pytest
+from ndspy.fnt import Folder
+from ndspy.rom import NintendoDSRom
+
+from skytemple.core.incremental_rom_writer import IncrementalRomWriter
+
+FILE_NAMES = ['a.bin', 'b.bin', 'empty.bin', 'c.bin', 'last.bin']
+
+
+def create_rom(path):
+    rom = NintendoDSRom()
+    rom.arm9 = b'\xaa' * 0x400
+    rom.arm7 = b'\xbb' * 0x100
+    rom.filenames = Folder(files=FILE_NAMES, firstID=0)
+    rom.files = [b'\x01' * 0x100, b'\x02' * 0x200, b'', b'\x03' * 0x20, b'\x04' * 0x10]
+    rom.saveToFile(str(path))
+    return NintendoDSRom.fromFile(str(path))
+
+
+@pytest.fixture
+def rom_path(tmp_path):
+    return tmp_path / 'rom.nds'
+
+
+@pytest.fixture
+def rom(rom_path):
+    return create_rom(rom_path)
+
+
+@pytest.fixture
+def writer(rom, rom_path):
+    return IncrementalRomWriter(rom, str(rom_path))
+
+
+def set_file(rom, writer, name, data):
+    file_id = rom.filenames.idOf(name)
+    rom.files[file_id] = data
+    writer.mark_file_dirty(file_id)
+    return file_id
+
+
+def fat_entry(rom_bytes, file_id):
+    fat_offset = int.from_bytes(rom_bytes[0x48:0x4C], 'little')
+    return (
+        int.from_bytes(rom_bytes[fat_offset + file_id * 8:fat_offset + file_id * 8 + 4], 'little'),
+        int.from_bytes(rom_bytes[fat_offset + file_id * 8 + 4:fat_offset + file_id * 8 + 8], 'little')
+    )
+
+
+def assert_equivalent_to_full_save(rom, rom_path, tmp_path):
+    """The ROM on disk contains the same data as a ROM fully re-built from the ROM in memory."""
+    full_path = tmp_path / 'full.nds'
+    rom.saveToFile(str(full_path))
+    on_disk = NintendoDSRom.fromFile(str(rom_path))
+    full = NintendoDSRom.fromFile(str(full_path))
+    assert on_disk.files == full.files == rom.files
+    for name in FILE_NAMES:
+        assert on_disk.filenames.idOf(name) == full.filenames.idOf(name)
+    assert on_disk.arm9 == full.arm9
+    assert on_disk.arm7 == full.arm7
+    assert on_disk.iconBanner == full.iconBanner
+    assert on_disk.rsaSignature == full.rsaSignature
+
+
+def assert_only_changed(before, after, file_ids):
+    """Only the allocations (and FAT entries) of the given files changed."""
+    assert len(before) == len(after)
+    allowed = []
+    fat_offset = int.from_bytes(before[0x48:0x4C], 'little')
+    for file_id in file_ids:
+        start, _ = fat_entry(before, file_id)
+        _, end = fat_entry(after, file_id)
+        allowed.append(range(start, max(end, fat_entry(before, file_id)[1])))
+        allowed.append(range(fat_offset + file_id * 8, fat_offset + file_id * 8 + 8))
+    for i, (a, b) in enumerate(zip(before, after)):
+        if a != b:
+            assert any(i in r for r in allowed), f'Unexpected change at {i:#x}'
+
+
+def test_shrinking_file_is_patched_in_place(rom, rom_path, writer, tmp_path):
+    before = rom_path.read_bytes()
+    file_id = set_file(rom, writer, 'a.bin', b'\x05' * 0x10)
+
+    assert writer._try_save_incremental(str(rom_path), writer.dirty_file_ids)
+    after = rom_path.read_bytes()
+    assert_only_changed(before, after, [file_id])
+    assert fat_entry(after, file_id) == (fat_entry(before, file_id)[0], fat_entry(before, file_id)[0] + 0x10)
+    assert_equivalent_to_full_save(rom, rom_path, tmp_path)
+
+
+def test_growing_file_that_fits_before_next_file_is_patched_in_place(rom, rom_path, writer, tmp_path):
+    before = rom_path.read_bytes()
+    # a.bin is 0x100 bytes, the next file starts at the next 0x200 alignment.
+    file_id = set_file(rom, writer, 'a.bin', b'\x05' * 0x200)
+
+    assert writer._try_save_incremental(str(rom_path), writer.dirty_file_ids)
+    assert_only_changed(before, rom_path.read_bytes(), [file_id])
+    assert_equivalent_to_full_save(rom, rom_path, tmp_path)
+
+
+def test_growing_file_that_does_not_fit_is_not_patched(rom, rom_path, writer):
+    before = rom_path.read_bytes()
+    set_file(rom, writer, 'a.bin', b'\x05' * 0x100)
+    set_file(rom, writer, 'b.bin', b'\x05' * 0x201)
+
+    assert not writer._try_save_incremental(str(rom_path), writer.dirty_file_ids)
+    # Nothing was written, not even the file that would have fit.
+    assert rom_path.read_bytes() == before
+
+
+def test_growing_file_that_does_not_fit_falls_back_to_full_save(rom, rom_path, writer, tmp_path):
+    set_file(rom, writer, 'a.bin', b'\x05' * 0x100)
+    set_file(rom, writer, 'b.bin', b'\x05' * 0x201)
+
+    writer.save(str(rom_path))
+    assert_equivalent_to_full_save(rom, rom_path, tmp_path)
+    assert writer.dirty_file_ids == set()
+
+
+def test_last_file_growing_does_not_overwrite_rsa_signature(rom, rom_path, writer, tmp_path):
+    # The RSA signature follows the last file, aligned to 0x20.
+    set_file(rom, writer, 'last.bin', b'\x05' * 0x21)
+
+    assert not writer._try_save_incremental(str(rom_path), writer.dirty_file_ids)
+    writer.save(str(rom_path))
+    assert_equivalent_to_full_save(rom, rom_path, tmp_path)
+
+
+def test_last_file_is_patched_in_place(rom, rom_path, writer, tmp_path):
+    before = rom_path.read_bytes()
+    file_id = set_file(rom, writer, 'last.bin', b'\x05' * 0x20)
+
+    assert writer._try_save_incremental(str(rom_path), writer.dirty_file_ids)
+    assert_only_changed(before, rom_path.read_bytes(), [file_id])
+    assert_equivalent_to_full_save(rom, rom_path, tmp_path)
+
+
+def test_empty_file_that_grows_is_not_patched(rom, rom_path, writer):
+    set_file(rom, writer, 'empty.bin', b'\x05')
+
+    assert not writer._try_save_incremental(str(rom_path), writer.dirty_file_ids)
+
+
+def test_incremental_and_full_save_are_equivalent(rom, rom_path, writer, tmp_path):
+    before = rom_path.read_bytes()
+    changed = [
+        set_file(rom, writer, 'a.bin', b'\x05' * 0x80),
+        set_file(rom, writer, 'c.bin', b'\x06' * 0x1e0),
+        set_file(rom, writer, 'last.bin', b'\x07' * 0x10),
+    ]
+
+    writer.save(str(rom_path))
+    assert_only_changed(before, rom_path.read_bytes(), changed)
+    assert_equivalent_to_full_save(rom, rom_path, tmp_path)
+    assert writer.dirty_file_ids == set()
+
+
+def test_full_save_required(rom, rom_path, writer, tmp_path):
+    before = rom_path.read_bytes()
+    set_file(rom, writer, 'a.bin', b'\x05' * 0x10)
+    writer.mark_needs_full_save()
+
+    assert not writer._try_save_incremental(str(rom_path), writer.dirty_file_ids)
+    assert rom_path.read_bytes() == before
+    writer.save(str(rom_path))
+    assert not writer.needs_full_save
+    assert_equivalent_to_full_save(rom, rom_path, tmp_path)
+
+
+def test_save_to_other_file_is_full_save(rom, writer, tmp_path):
+    set_file(rom, writer, 'a.bin', b'\x05' * 0x10)
+    other_path = tmp_path / 'other.nds'
+
+    assert not writer._try_save_incremental(str(other_path), writer.dirty_file_ids)
+    writer.save(str(other_path))
+    assert_equivalent_to_full_save(rom, other_path, tmp_path)
+
+
+def test_file_capacity():
+    starts = [0x4000, 0x8000, 0x8200, 0x8400, 0x8420]
+    # Bounded by the start of the next file or data.
+    assert IncrementalRomWriter._file_capacity(starts, 0x8000, 0x8010) == 0x200
+    assert IncrementalRomWriter._file_capacity(starts, 0x8400, 0x8410) == 0x20
+    # Empty files may share their offset with the next file.
+    assert IncrementalRomWriter._file_capacity(starts, 0x8200, 0x8200) == 0
+    # Nothing after the file.
+    assert IncrementalRomWriter._file_capacity(starts, 0x8420, 0x8430) == 0x10
+
+
+def test_save_files_only_writes_given_files(rom, rom_path, writer, tmp_path):
+    before = rom_path.read_bytes()
+    saved_id = set_file(rom, writer, 'a.bin', b'\x05' * 0x10)
+    other_id = set_file(rom, writer, 'c.bin', b'\x06' * 0x10)
+
+    assert writer.save_files(str(rom_path), [saved_id])
+    after_single = rom_path.read_bytes()
+    assert_only_changed(before, after_single, [saved_id])
+    assert NintendoDSRom.fromFile(str(rom_path)).files[other_id] == b'\x03' * 0x20
+    assert writer.dirty_file_ids == {other_id}
+
+    writer.save(str(rom_path))
+    assert_only_changed(after_single, rom_path.read_bytes(), [other_id])
+    assert_equivalent_to_full_save(rom, rom_path, tmp_path)
+    assert writer.dirty_file_ids == set()
+
+
+def test_save_files_falls_back_to_full_save(rom, rom_path, writer, tmp_path):
+    saved_id = set_file(rom, writer, 'a.bin', b'\x05' * 0x201)
+    set_file(rom, writer, 'c.bin', b'\x06' * 0x10)
+
+    assert not writer.save_files(str(rom_path), [saved_id])
+    assert_equivalent_to_full_save(rom, rom_path, tmp_path)
+    assert writer.dirty_file_ids == set()
+
+
+@pytest.mark.benchmark
+def test_benchmark_save_single_file(tmp_path, measure):
+    """Saving one changed file of a ROM with 2000 files (~32 MiB), in place vs. re-building the ROM."""
+    path = tmp_path / 'big.nds'
+    rom = NintendoDSRom()
+    rom.filenames = Folder(files=[f'{i}.bin' for i in range(2000)], firstID=0)
+    rom.files = [bytes([i % 256]) * 0x4000 for i in range(2000)]
+    rom.saveToFile(str(path))
+    writer = IncrementalRomWriter(rom, str(path))
+
+    def save_single():
+        rom.files[1000] = b'\x05' * 0x3000
+        writer.save_files(str(path), [1000])
+
+    single = measure(save_single)
+    full = measure(lambda: rom.saveToFile(str(path)))
+    print(f'\nSaving one file of 2000: in place {single * 1000:.1f}ms, full re-build {full * 1000:.1f}ms')
@@ -0,0 +1,325 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import pytest
+
+pytest.importorskip('gi')
+cairo = pytest.importorskip('cairo')
+
+from skytemple.module.map_bg import drawer as drawer_module
+from skytemple.module.map_bg.drawer import Drawer, FPS
+from skytemple_files.graphics.bma.model import Bma
+from skytemple_files.graphics.bpc.model import BPC_TILE_DIM
+
+
+class FakeGLib:
+    """Replaces the GLib timeouts with a fake clock, that only advances when told to."""
+    def __init__(self):
+        self.now = 0
+        self._next_id = 1
+        # source id -> (time due in ms, callback)
+        self.sources = {}
+
+    def timeout_add(self, interval, callback):
+        source_id = self._next_id
+        self._next_id += 1
+        self.sources[source_id] = (self.now + interval, callback)
+        return source_id
+
+    def source_remove(self, source_id):
+        del self.sources[source_id]
+
+    def run_for(self, ms):
+        """Advance the clock, running all timeouts that are due in order."""
+        end = self.now + ms
+        while True:
+            due = [(time, source_id) for source_id, (time, _) in self.sources.items() if time <= end]
+            if len(due) < 1:
+                break
+            time, source_id = min(due)
+            _, callback = self.sources.pop(source_id)
+            self.now = time
+            if callback():
+                self.sources[source_id] = (self.now, callback)
+        self.now = end
+
+
+class FakeDrawArea:
+    def __init__(self):
+        # Number of draws queued by animation ticks.
+        self.draws = 0
+
+    def get_parent(self):
+        return self
+
+    def queue_draw(self):
+        self.draws += 1
+
+    def queue_draw_area(self, x, y, w, h):
+        self.draws += 1
+
+    def get_size_request(self):
+        return 0, 0
+
+
+class FakeEventManager:
+    @classmethod
+    def instance(cls):
+        return cls()
+
+    def get_if_main_window_has_fous(self):
+        return True
+
+
+@pytest.fixture
+def glib(monkeypatch):
+    glib = FakeGLib()
+    monkeypatch.setattr(drawer_module, 'GLib', glib)
+    monkeypatch.setattr(drawer_module, 'EventManager', FakeEventManager)
+    return glib
+
+
+def ms(ticks):
+    return int(1000 * ticks / FPS)
+
+
+def create_drawer(bpa_durations=10):
+    # One layer with one chunk, that has two BPA frames.
+    drawer = Drawer(FakeDrawArea(), None, bpa_durations, 0, [[[['frame0', 'frame1']]]])
+    drawer.draw_area.draws = 0
+    return drawer
+
+
+def test_tick_is_scheduled_for_next_frame_change(glib):
+    drawer = create_drawer()
+    assert glib.sources == {}
+
+    drawer.start_animation()
+    assert [time for time, _ in glib.sources.values()] == [ms(10)]
+
+    glib.run_for(ms(10))
+    assert drawer.animation_context.current() == [['frame1']]
+    assert drawer.draw_area.draws == 1
+    assert [time for time, _ in glib.sources.values()] == [ms(10) * 2]
+
+
+def test_stopped_drawer_does_not_tick(glib):
+    drawer = create_drawer()
+    drawer.start_animation()
+    drawer.stop()
+
+    assert glib.sources == {}
+    glib.run_for(ms(100))
+    assert drawer.animation_context.current() == [['frame0']]
+    assert drawer.draw_area.draws == 0
+
+
+def test_restarted_drawer_is_rescheduled_once(glib):
+    drawer = create_drawer()
+    drawer.start_animation()
+    glib.run_for(ms(5))
+    drawer.stop()
+    drawer.start_animation()
+    drawer.start_animation()
+
+    assert len(glib.sources) == 1
+    glib.run_for(ms(10))
+    assert drawer.animation_context.current() == [['frame1']]
+    assert drawer.draw_area.draws == 1
+
+
+def test_reset_reschedules_for_new_durations(glib):
+    drawer = create_drawer(bpa_durations=10)
+    drawer.start_animation()
+    drawer.reset(None, 30, 0, [[[['frame0', 'frame1']]]])
+    drawer.draw_area.draws = 0
+
+    assert [time for time, _ in glib.sources.values()] == [ms(30)]
+    glib.run_for(ms(30) - 1)
+    assert drawer.draw_area.draws == 0
+    glib.run_for(1)
+    assert drawer.animation_context.current() == [['frame1']]
+
+
+def test_reset_without_animations_stops_ticking(glib):
+    drawer = create_drawer()
+    drawer.start_animation()
+    drawer.reset(None, 0, 0, [[[['static']]]])
+
+    assert glib.sources == {}
+
+
+# A map of 64x64 chunks with two layers. One chunk of layer 0 is animated, it is placed 21 times.
+MAP_SIZE_IN_CHUNKS = 64
+NUMBER_CHUNKS = 200
+ANIMATED_CHUNK = 1
+CHUNK_DIM = 3 * BPC_TILE_DIM
+
+
+def create_chunk_surface(color):
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, CHUNK_DIM, CHUNK_DIM)
+    ctx = cairo.Context(surface)
+    ctx.set_source_rgb(*color)
+    ctx.paint()
+    return surface
+
+
+def create_chunks_surfaces():
+    layers = []
+    for layer in range(2):
+        chunks = []
+        for chunk_idx in range(NUMBER_CHUNKS):
+            color = (chunk_idx / NUMBER_CHUNKS, layer, 0.5)
+            frames = [create_chunk_surface(color)]
+            if layer == 0 and chunk_idx == ANIMATED_CHUNK:
+                frames.append(create_chunk_surface((color[0], color[1], 1)))
+            chunks.append([frames])
+        layers.append(chunks)
+    return layers
+
+
+def create_bma():
+    bma = Bma.__new__(Bma)
+    bma.tiling_width = 3
+    bma.tiling_height = 3
+    bma.map_width_chunks = MAP_SIZE_IN_CHUNKS
+    bma.map_height_chunks = MAP_SIZE_IN_CHUNKS
+    bma.map_width_camera = MAP_SIZE_IN_CHUNKS * 3
+    bma.map_height_camera = MAP_SIZE_IN_CHUNKS * 3
+    number_positions = MAP_SIZE_IN_CHUNKS * MAP_SIZE_IN_CHUNKS
+    bma.layer0 = [i % NUMBER_CHUNKS for i in range(number_positions)]
+    # Layer 1 leaves every third chunk empty.
+    bma.layer1 = [(i * 7) % NUMBER_CHUNKS if i % 3 else 0 for i in range(number_positions)]
+    bma.collision = [i % 2 == 0 for i in range(bma.map_width_camera * bma.map_height_camera)]
+    bma.collision2 = None
+    bma.unknown_data_block = None
+    return bma
+
+
+def create_map_drawer():
+    return Drawer(FakeDrawArea(), create_bma(), 1, 0, create_chunks_surfaces())
+
+
+def create_target():
+    size = MAP_SIZE_IN_CHUNKS * CHUNK_DIM
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, size, size)
+    return surface, cairo.Context(surface)
+
+
+def draw_every_chunk(drawer, ctx):
+    """Draws the layers like the drawer did before, painting every chunk of every layer on each draw."""
+    ctx.set_antialias(cairo.Antialias.NONE)
+    ctx.set_source_rgb(0, 0, 0)
+    ctx.paint()
+    for layer_idx, chunks_at_frame in enumerate(drawer.animation_context.current()):
+        for i, chunk_at_pos in enumerate(drawer.mappings[layer_idx]):
+            if 0 < chunk_at_pos < len(chunks_at_frame):
+                ctx.set_source_surface(
+                    chunks_at_frame[chunk_at_pos],
+                    i % MAP_SIZE_IN_CHUNKS * CHUNK_DIM, i // MAP_SIZE_IN_CHUNKS * CHUNK_DIM
+                )
+                ctx.get_source().set_filter(cairo.Filter.NEAREST)
+                ctx.paint()
+
+
+def draw_map(drawer):
+    surface, ctx = create_target()
+    drawer.draw(None, ctx)
+    surface.flush()
+    return bytes(surface.get_data())
+
+
+def draw_map_every_chunk(drawer):
+    surface, ctx = create_target()
+    draw_every_chunk(drawer, ctx)
+    surface.flush()
+    return bytes(surface.get_data())
+
+
+def test_draw_matches_drawing_every_chunk(glib):
+    drawer = create_map_drawer()
+
+    assert draw_map(drawer) == draw_map_every_chunk(drawer)
+    assert len(drawer._static_layers[0][2]) == 21
+    assert drawer._static_layers[1][2] == []
+    # The animated chunks are drawn with their current frame.
+    assert drawer.animation_context.advance()
+    assert draw_map(drawer) == draw_map_every_chunk(drawer)
+
+
+def test_static_layers_are_cached_until_mappings_change(glib):
+    drawer = create_map_drawer()
+    draw_map(drawer)
+    static_surfaces = [static_layer[1] for static_layer in drawer._static_layers]
+
+    drawer.animation_context.advance()
+    draw_map(drawer)
+    assert all(static_layer[1] is surface for static_layer, surface in zip(drawer._static_layers, static_surfaces))
+
+    drawer.mappings[0][0] = 5
+    assert draw_map(drawer) == draw_map_every_chunk(drawer)
+    assert drawer._static_layers[0][1] is not static_surfaces[0]
+    assert drawer._static_layers[1][1] is static_surfaces[1]
+
+
+def test_collision_is_only_drawn_in_clip_area(glib):
+    drawer = create_map_drawer()
+    drawer.set_edited_collision(0)
+    full = draw_map(drawer)
+
+    surface, ctx = create_target()
+    ctx.rectangle(0, 0, CHUNK_DIM, CHUNK_DIM)
+    ctx.clip()
+    drawer.draw(None, ctx)
+    surface.flush()
+    stride = surface.get_stride()
+    clipped = bytes(surface.get_data())
+    # Inside the clip area, the result is the same as drawing everything.
+    for row in range(CHUNK_DIM):
+        assert clipped[row * stride:row * stride + CHUNK_DIM * 4] == full[row * stride:row * stride + CHUNK_DIM * 4]
+
+
+@pytest.mark.benchmark
+def test_benchmark_draw_map(glib, measure):
+    """
+    Drawing 60 frames of a 64x64 chunk map with two layers headless: Painting every chunk vs. the drawer
+    (full redraws and redraws of only the animated areas).
+    """
+    drawer = create_map_drawer()
+    surface, ctx = create_target()
+
+    def draw_frames(draw):
+        for _ in range(60):
+            drawer.animation_context.advance()
+            draw()
+
+    def draw_animated_areas():
+        # Like Gtk, which draws all queued areas at once, clipped to them.
+        ctx.save()
+        for static_layer in drawer._static_layers:
+            for i in static_layer[2]:
+                ctx.rectangle(i % MAP_SIZE_IN_CHUNKS * CHUNK_DIM, i // MAP_SIZE_IN_CHUNKS * CHUNK_DIM,
+                              CHUNK_DIM, CHUNK_DIM)
+        ctx.clip()
+        drawer.draw(None, ctx)
+        ctx.restore()
+
+    drawer.draw(None, ctx)
+    every_chunk = measure(lambda: draw_frames(lambda: draw_every_chunk(drawer, ctx)), 3)
+    full = measure(lambda: draw_frames(lambda: drawer.draw(None, ctx)), 3)
+    areas = measure(lambda: draw_frames(draw_animated_areas), 3)
+    print(f'\nDrawing 60 frames of a 64x64 chunk map: every chunk {every_chunk * 1000:.1f}ms, '
+          f'drawer (full) {full * 1000:.1f}ms, drawer (animated areas) {areas * 1000:.1f}ms')
@@ -0,0 +1,95 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+from types import SimpleNamespace
+
+from skytemple.module.map_bg.model_snapshot import snapshot_bma, snapshot_bpc, snapshot_bpl, snapshot_bpas
+
+
+def create_bpc():
+    layer = SimpleNamespace(
+        number_tiles=2, bpas=[0, 1, 0, 0], chunk_tilemap_len=1,
+        tiles=[bytearray(b'\x00' * 32), bytearray(b'\x01' * 32)], tilemap=['a', 'b']
+    )
+    return SimpleNamespace(number_of_layers=1, layers=[layer])
+
+
+def test_snapshot_bpc_is_independent():
+    bpc = create_bpc()
+    snapshot = snapshot_bpc(bpc)
+
+    # Like Bpc.single_chunk_animated_to_pil and the chunk editor do.
+    bpc.layers[0].tiles.append(bytearray(b'\x02' * 32))
+    bpc.layers[0].tiles[0][0] = 0xFF
+    bpc.layers[0].tilemap[0] = 'c'
+    bpc.layers[0].bpas[0] = 5
+
+    layer = snapshot.layers[0]
+    assert layer is not bpc.layers[0]
+    assert layer.tiles == [bytearray(b'\x00' * 32), bytearray(b'\x01' * 32)]
+    assert layer.tilemap == ['a', 'b']
+    assert layer.bpas == [0, 1, 0, 0]
+    assert layer.number_tiles == 2
+
+
+def test_snapshot_bpl_is_independent():
+    spec = SimpleNamespace(duration_per_frame=4, number_of_frames=2)
+    bpl = SimpleNamespace(
+        number_palettes=1, palettes=[[0, 0, 0]], animation_palette=[[1, 1, 1], [2, 2, 2]], animation_specs=[spec]
+    )
+    snapshot = snapshot_bpl(bpl)
+
+    bpl.palettes[0][0] = 255
+    bpl.animation_palette[1][0] = 255
+    spec.duration_per_frame = 8
+
+    assert snapshot.palettes == [[0, 0, 0]]
+    assert snapshot.animation_palette == [[1, 1, 1], [2, 2, 2]]
+    assert snapshot.animation_specs[0].duration_per_frame == 4
+
+
+def test_snapshot_bpas_is_independent():
+    info = SimpleNamespace(duration_per_frame=10, unk2=0)
+    bpa = SimpleNamespace(number_of_tiles=1, number_of_frames=1, tiles=[bytearray(b'\x03' * 32)], frame_info=[info])
+    snapshot = snapshot_bpas([None, bpa, None])
+
+    bpa.tiles[0][0] = 0xFF
+    info.duration_per_frame = 20
+
+    assert snapshot[0] is None and snapshot[2] is None
+    assert snapshot[1].tiles == [bytearray(b'\x03' * 32)]
+    assert snapshot[1].frame_info[0].duration_per_frame == 10
+
+
+def test_snapshot_bma_is_independent():
+    bma = SimpleNamespace(
+        map_width_chunks=2, map_height_chunks=1, layer0=[1, 2], layer1=None,
+        collision=[True, False], collision2=None, unknown_data_block=[0, 3]
+    )
+    snapshot = snapshot_bma(bma)
+
+    # Like Bma.place_chunk, Bma.add_upper_layer and the collision and data layer editing do.
+    bma.layer0[0] = 5
+    bma.layer1 = [0, 0]
+    bma.collision[1] = True
+    bma.unknown_data_block[0] = 7
+
+    assert snapshot.layer0 == [1, 2]
+    assert snapshot.layer1 is None
+    assert snapshot.collision == [True, False]
+    assert snapshot.collision2 is None
+    assert snapshot.unknown_data_block == [0, 3]
+    assert snapshot.map_width_chunks == 2
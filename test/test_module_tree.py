@@ -0,0 +1,178 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import pytest
+
+gi = pytest.importorskip('gi')
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk, GObject
+
+from skytemple.core.module_tree import ModuleTree
+
+
+def create_item_store():
+    return Gtk.TreeStore(str, str, GObject.TYPE_PYOBJECT, GObject.TYPE_PYOBJECT, GObject.TYPE_PYOBJECT,
+                         bool, str, bool)
+
+
+def create_module_class(name, order, depends_on=None):
+    class FakeModule:
+        created = 0
+
+        def __init__(self, project):
+            FakeModule.created += 1
+            if depends_on is not None:
+                project.get_module(depends_on)
+
+        @classmethod
+        def sort_order(cls):
+            return order
+
+        @classmethod
+        def tree_placeholder(cls):
+            return 'icon', name.upper()
+
+        def load_tree_items(self, item_store, root_node):
+            root = item_store.append(root_node, ['icon', name.upper(), self, None, 0, False, name.upper(), True])
+            for i in range(10):
+                item_store.append(root, ['icon', f'{name}{i}', self, None, i, False, f'{name}{i}', True])
+
+    return FakeModule
+
+
+class FakeProject:
+    """Implements the module management of RomProject."""
+    def __init__(self, module_classes, on_module_created=lambda name: None):
+        self._module_classes = module_classes
+        self._loaded_modules = {}
+        self._on_module_created = on_module_created
+
+    def get_module_classes(self):
+        return self._module_classes
+
+    def is_module_loaded(self, name):
+        return name in self._loaded_modules
+
+    def get_module(self, name):
+        if name not in self._loaded_modules:
+            self._loaded_modules[name] = self._module_classes[name](self)
+            self._on_module_created(name)
+        return self._loaded_modules[name]
+
+
+def top_level_titles(item_store, root_node):
+    return [item_store[child][1] for child in item_store[root_node].iterchildren()]
+
+
+def test_fill_does_not_create_modules():
+    classes = {'b': create_module_class('b', 20), 'a': create_module_class('a', 10)}
+    project = FakeProject(classes)
+    item_store = create_item_store()
+    root_node = item_store.append(None, ['icon', 'ROM', None, None, 0, False, 'ROM', True])
+
+    ModuleTree(item_store).fill(project, root_node)
+
+    assert classes['a'].created == 0
+    assert classes['b'].created == 0
+    assert top_level_titles(item_store, root_node) == ['A', 'B']
+
+
+def test_load_module_replaces_placeholder_in_place():
+    classes = {
+        'a': create_module_class('a', 10), 'b': create_module_class('b', 20), 'c': create_module_class('c', 30)
+    }
+    project = FakeProject(classes)
+    item_store = create_item_store()
+    root_node = item_store.append(None, ['icon', 'ROM', None, None, 0, False, 'ROM', True])
+    tree = ModuleTree(item_store)
+    tree.fill(project, root_node)
+
+    placeholder = item_store.iter_nth_child(root_node, 1)
+    assert tree.get_placeholder_name(placeholder) == 'b'
+    node = tree.load_module(project, 'b')
+
+    assert classes['b'].created == 1
+    assert classes['a'].created == 0
+    assert item_store[node][2] is project.get_module('b')
+    assert top_level_titles(item_store, root_node) == ['A', 'B', 'C']
+    assert item_store.iter_n_children(node) == 10
+    assert tree.get_placeholder_name(node) is None
+    assert tree.get_placeholder_names() == ['a', 'c']
+    # Already loaded.
+    assert tree.load_module(project, 'b') is None
+
+
+def test_load_module_with_dependency():
+    classes = {'a': create_module_class('a', 10), 'b': create_module_class('b', 20, depends_on='a')}
+    item_store = create_item_store()
+    root_node = item_store.append(None, ['icon', 'ROM', None, None, 0, False, 'ROM', True])
+    tree = ModuleTree(item_store)
+    # Like MainController.load_module_tree_items, which is called by RomProject for every created module.
+    project = FakeProject(classes, lambda name: tree.load_module(project, name))
+    tree.fill(project, root_node)
+
+    tree.load_module(project, 'b')
+
+    assert top_level_titles(item_store, root_node) == ['A', 'B']
+    assert tree.get_placeholder_names() == []
+    for child in item_store[root_node].iterchildren():
+        assert child[2] is not None
+        assert len(list(child.iterchildren())) == 10
+
+
+def test_fill_with_loaded_modules():
+    classes = {'a': create_module_class('a', 10), 'b': create_module_class('b', 20)}
+    project = FakeProject(classes)
+    project.get_module('b')
+    item_store = create_item_store()
+    root_node = item_store.append(None, ['icon', 'ROM', None, None, 0, False, 'ROM', True])
+    tree = ModuleTree(item_store)
+
+    tree.fill(project, root_node)
+
+    assert tree.get_placeholder_names() == ['a']
+    assert item_store[item_store.iter_nth_child(root_node, 1)][2] is project.get_module('b')
+
+
+@pytest.mark.benchmark
+def test_benchmark_rom_load_to_first_tree_fill(eos_rom_path, measure):
+    """
+    Time from RomProject.load() until the item tree is filled for the first time (see
+    MainController.on_file_opened), creating all modules first (like before) vs. placeholders for them.
+    """
+    from skytemple.core.modules import Modules
+    from skytemple.core.rom_project import RomProject
+    Modules.load()
+
+    def load(eager):
+        project = RomProject(eos_rom_path, lambda treeiter: None)
+        try:
+            project.load()
+            rom_module = project.get_rom_module()
+            rom_module.load_rom_data()
+            item_store = create_item_store()
+            rom_module.load_tree_items(item_store, None)
+            if eager:
+                for name in project.get_module_classes():
+                    project.get_module(name)
+            ModuleTree(item_store).fill(project, rom_module.get_root_node())
+        finally:
+            project.close()
+
+    eager = measure(lambda: load(True), 3)
+    lazy = measure(lambda: load(False), 3)
+    print(f'\nROM load to first tree fill, {len(Modules.all())} modules: '
+          f'all modules created {eager * 1000:.1f}ms, placeholders {lazy * 1000:.1f}ms')
@@ -0,0 +1,192 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import threading
+
+import pytest
+from ndspy.fnt import Folder
+from ndspy.rom import NintendoDSRom
+
+pytest.importorskip('gi')
+
+from skytemple.core.incremental_rom_writer import IncrementalRomWriter
+from skytemple.core.rom_project import RomProject
+
+FILE_SIZE = 0x100
+
+
+class FakeModel:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeHandler:
+    @classmethod
+    def deserialize(cls, data, **kwargs):
+        return FakeModel(data)
+
+    @classmethod
+    def serialize(cls, model, **kwargs):
+        return model.data
+
+
+@pytest.fixture
+def project(tmp_path):
+    rom = NintendoDSRom()
+    rom.filenames = Folder(files=[f'{i}.bin' for i in range(10)], firstID=0)
+    rom.files = [bytes([i]) * FILE_SIZE for i in range(10)]
+    project = RomProject(str(tmp_path / 'rom.nds'), lambda treeiter: None)
+    project._rom = rom
+    project._rom_writer = IncrementalRomWriter(rom, project.filename)
+    project.set_opened_files_cache_limit(FILE_SIZE * 2)
+    return project
+
+
+def open_files(project, *indices):
+    return [project.open_file_in_rom(f'{i}.bin', FakeHandler) for i in indices]
+
+
+def test_least_recently_used_files_are_evicted(project):
+    open_files(project, 0, 1, 2)
+
+    assert not project.is_opened('0.bin')
+    assert project.is_opened('1.bin')
+    assert project.is_opened('2.bin')
+
+
+def test_referenced_but_unpinned_files_are_evicted(project):
+    model, = open_files(project, 0)
+    open_files(project, 1, 2)
+
+    assert not project.is_opened('0.bin')
+    assert open_files(project, 0)[0] is not model
+
+
+def test_modified_files_are_not_evicted(project):
+    model, = open_files(project, 0)
+    project.mark_as_modified(model)
+    open_files(project, 1, 2, 3)
+
+    assert project.is_opened('0.bin')
+
+
+def test_pinned_files_are_not_evicted_until_unpinned(project):
+    owner = object()
+    open_files(project, 0)
+    project.pin_opened_file('0.bin', owner)
+    open_files(project, 1, 2, 3)
+    assert project.is_opened('0.bin')
+
+    project.unpin_opened_files(owner)
+    # 0.bin is the least recently used file again.
+    open_files(project, 4)
+    assert not project.is_opened('0.bin')
+
+
+def test_files_opened_by_the_current_view_are_pinned(project):
+    old_view, new_view = object(), object()
+    project.set_opened_files_view_owner(old_view)
+    open_files(project, 0)
+    project.set_opened_files_view_owner(new_view)
+    open_files(project, 1, 2)
+    assert project.is_opened('0.bin')
+
+    # The old view was closed.
+    project.unpin_opened_files(old_view)
+    assert not project.is_opened('0.bin')
+    assert project.is_opened('1.bin')
+    assert project.is_opened('2.bin')
+
+
+def test_mark_as_modified(project):
+    model_0, model_1 = open_files(project, 0, 1)
+    modified = []
+    project.add_file_modified_listener(modified.append)
+
+    project.mark_as_modified(model_1)
+    project.mark_as_modified('0.bin')
+
+    assert modified == ['1.bin', '0.bin']
+    assert list(project._modified_files) == ['1.bin', '0.bin']
+    assert project.has_modifications()
+    with pytest.raises(ValueError):
+        project.mark_as_modified(FakeModel(b''))
+
+
+def test_mark_as_modified_evicted_model(project):
+    model, = open_files(project, 0)
+    open_files(project, 1, 2)
+    assert not project.is_opened('0.bin')
+
+    # The model was evicted and is not tracked anymore.
+    with pytest.raises(ValueError):
+        project.mark_as_modified(model)
+
+
+def test_opening_files_from_several_threads(project):
+    # The main thread and the AsyncTaskRunner open files at the same time, while views pin and unpin them.
+    errors = []
+
+    def open_all():
+        try:
+            for _ in range(200):
+                for model in open_files(project, *range(10)):
+                    assert isinstance(model, FakeModel)
+        except Exception as ex:
+            errors.append(ex)
+
+    threads = [threading.Thread(target=open_all) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    owner = object()
+    for i in range(200):
+        project.pin_opened_file(f'{i % 10}.bin', owner)
+        project.unpin_opened_files(owner)
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert set(project._opened_files) == set(project._opened_files_sizes)
+    assert set(project._opened_files) <= set(project._file_handlers)
+    assert sum(project._opened_files_sizes.values()) <= FILE_SIZE * 2
+
+
+@pytest.mark.benchmark
+def test_benchmark_mark_5000_models_modified(tmp_path, measure):
+    """Marking 5000 opened models as modified, like a bulk XML import."""
+    rom = NintendoDSRom()
+    rom.filenames = Folder(files=[f'{i}.bin' for i in range(5000)], firstID=0)
+    rom.files = [bytes([i % 256]) * 0x10 for i in range(5000)]
+    project = RomProject(str(tmp_path / 'rom.nds'), lambda treeiter: None)
+    project._rom = rom
+    project._rom_writer = IncrementalRomWriter(rom, project.filename)
+    project.set_opened_files_cache_limit(len(rom.files) * 0x10)
+    models = [project.open_file_in_rom(f'{i}.bin', FakeHandler) for i in range(5000)]
+
+    def mark_linear():
+        # How mark_as_modified looked the filename up before: A linear search over the opened files.
+        for model in models:
+            names, opened = list(project._opened_files.keys()), list(project._opened_files.values())
+            names[opened.index(model)]
+
+    def mark():
+        for model in models:
+            project.mark_as_modified(model)
+
+    linear = measure(mark_linear, 1)
+    indexed = measure(mark)
+    print(f'\nMarking 5000 models modified: linear lookup {linear * 1000:.1f}ms, '
+          f'mark_as_modified {indexed * 1000:.1f}ms')
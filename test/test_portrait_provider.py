@@ -0,0 +1,194 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from ndspy.rom import NintendoDSRom
+try:
+    from PIL import Image
+except ImportError:
+    from pil import Image
+
+pytest.importorskip('gi')
+pytest.importorskip('cairo')
+from skytemple.module.portrait import portrait_provider as portrait_provider_module
+from skytemple.module.portrait.portrait_provider import PortraitProvider
+from skytemple.core.thumbnail_cache import ThumbnailCache
+
+ERROR = object()
+
+
+class FakeKaoImage:
+    def __init__(self, entry_id, sub_id):
+        self.pal_data = bytes([entry_id % 256]) * 48
+        self.compressed_img_data = bytes([sub_id]) * 100
+
+    def get(self):
+        return Image.new('P', (40, 40), 1)
+
+
+class FakeKao:
+    """Only the sub IDs given exist for each entry."""
+    def __init__(self, existing_sub_ids):
+        self.existing_sub_ids = existing_sub_ids
+
+    def get(self, entry_id, sub_id):
+        if sub_id in self.existing_sub_ids:
+            return FakeKaoImage(entry_id, sub_id)
+        return None
+
+
+class FakeTaskRunner:
+    """Collects the tasks, instead of running them."""
+    def __init__(self):
+        self.tasks = []
+
+    def run_task(self, coro):
+        self.tasks.append(coro)
+
+    def run_all(self):
+        tasks, self.tasks = self.tasks, []
+        for task in tasks:
+            asyncio.run(task)
+
+
+@pytest.fixture
+def task_runner(monkeypatch):
+    runner = FakeTaskRunner()
+    monkeypatch.setattr(portrait_provider_module, 'AsyncTaskRunner', SimpleNamespace(instance=lambda: runner))
+    return runner
+
+
+def create_provider(existing_sub_ids=range(0, 40)):
+    provider = PortraitProvider(FakeKao(existing_sub_ids))
+    provider._loader_surface = object()
+    provider._error_surface = ERROR
+    return provider
+
+
+def test_prefetch_loads_all_in_one_task(task_runner):
+    provider = create_provider()
+    callbacks = []
+
+    provider.prefetch([1, 2], range(0, 40), lambda: callbacks.append(True))
+    assert len(task_runner.tasks) == 1
+    # While loading, the loader is returned and no other task is started.
+    assert provider.get(1, 0) is provider.get_loader()
+    assert len(task_runner.tasks) == 1
+
+    task_runner.run_all()
+    assert callbacks == [True]
+    assert len(provider._loaded) == 80
+    assert provider._requests == set()
+    assert provider.get(2, 39) is provider._loaded[(2, 39)]
+    assert task_runner.tasks == []
+
+
+def test_prefetch_publishes_all_portraits_at_once(task_runner):
+    provider = create_provider()
+    provider.prefetch([1], range(0, 40))
+    task = task_runner.tasks[0]
+
+    # Render the first portraits, the task yields after each.
+    for _ in range(3):
+        task.send(None)
+    assert provider._loaded == {}
+    assert len(provider._requests) == 40
+
+    with pytest.raises(StopIteration):
+        while True:
+            task.send(None)
+    assert len(provider._loaded) == 40
+
+
+def test_prefetch_skips_loaded_and_requested(task_runner):
+    provider = create_provider()
+    provider.get(1, 0)
+    task_runner.run_all()
+    provider.get(1, 1)
+    assert len(task_runner.tasks) == 1
+
+    provider.prefetch([1], range(0, 3))
+    assert len(task_runner.tasks) == 2
+    task_runner.run_all()
+    assert set(provider._loaded.keys()) == {(1, 0), (1, 1), (1, 2)}
+
+    # Nothing left to load.
+    provider.prefetch([1], range(0, 3))
+    assert task_runner.tasks == []
+
+
+def test_prefetch_without_fallback(task_runner):
+    provider = create_provider(existing_sub_ids={0})
+    provider.prefetch([600 + 1], range(0, 2), allow_fallback=False)
+    task_runner.run_all()
+
+    assert provider.get(601, 0, allow_fallback=False) is not ERROR
+    assert provider.get(601, 1, allow_fallback=False) is ERROR
+    assert provider._loaded__is_fallback == {(601, 0): False, (601, 1): False}
+
+
+@pytest.mark.benchmark
+def test_benchmark_load_whole_kaomado(eos_rom_path, measure, tmp_path):
+    """
+    Loading all portraits of the kaomado with the AsyncTaskRunner: One task per portrait vs. prefetching them
+    in one batch, without and with a filled thumbnail cache.
+    """
+    # Also needs a skytemple_rust matching skytemple_files.
+    file_types = pytest.importorskip('skytemple_files.common.types.file_types', exc_type=ImportError)
+    from skytemple_files.common.task_runner import AsyncTaskRunner
+    from skytemple.module.portrait.module import PORTRAIT_FILE
+    from skytemple_files.graphics.kao.model import SUBENTRIES
+
+    rom = NintendoDSRom.fromFile(eos_rom_path)
+    kao = file_types.FileType.KAO.deserialize(rom.getFileByName(PORTRAIT_FILE))
+    entry_ids = range(0, kao.toc_len)
+    runner = AsyncTaskRunner.instance()
+    while runner.loop is None:
+        time.sleep(0.01)
+
+    def load_one_by_one(provider):
+        done = threading.Event()
+        remaining = [kao.toc_len * SUBENTRIES]
+
+        def after_load():
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                done.set()
+        for entry_id in entry_ids:
+            for sub_id in range(0, SUBENTRIES):
+                provider.get(entry_id, sub_id, after_load, False)
+        done.wait()
+
+    def prefetch(provider):
+        done = threading.Event()
+        provider.prefetch(entry_ids, range(0, SUBENTRIES), done.set, False)
+        done.wait()
+
+    # Warm up, the Kao keeps the portraits it read from the file.
+    prefetch(PortraitProvider(kao))
+    one_by_one = measure(lambda: load_one_by_one(PortraitProvider(kao)), 3)
+    batch = measure(lambda: prefetch(PortraitProvider(kao)), 3)
+    cache = ThumbnailCache(str(tmp_path), b'benchmark')
+    prefetch(PortraitProvider(kao, cache))
+    batch_cached = measure(lambda: prefetch(PortraitProvider(kao, cache)), 3)
+    print(f'\nLoading the whole kaomado ({kao.toc_len * SUBENTRIES} portraits): one task per portrait '
+          f'{one_by_one * 1000:.1f}ms, one batch {batch * 1000:.1f}ms, '
+          f'one batch from the thumbnail cache {batch_cached * 1000:.1f}ms')
@@ -0,0 +1,63 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import pytest
+from ndspy.fnt import Folder
+
+# Needs all optional dependencies of skytemple_files.
+pytest.importorskip('skytemple_files.common.script_util', exc_type=ImportError)
+from skytemple.module.script.script_file_tree import ScriptFileTree
+
+MAPS = {
+    'D01P11A': ['d01p11a.lsd', 'enter.sse', 'enter00.ssb', 'enter01.ssb', 'm01a0101.ssa', 'm01a0101.ssb',
+                'm01a0102.ssa', 'm01a0102.ssb', 'sub01.sss', 'sub0100.ssb', 'sub0101.ssb'],
+    'G01P01A': ['m02a0101.ssa', 'm02a0101.ssb'],
+}
+
+
+def create_tree():
+    folders = [('COMMON', Folder(files=['unionall.ssb']))]
+    for mapname, files in MAPS.items():
+        folders.append((mapname, Folder(files=files)))
+    return ScriptFileTree(Folder(folders=folders))
+
+
+def test_get_map_and_scripts():
+    tree = create_tree()
+
+    assert tree.get_map('D01P11A')['enter_sse'] == 'enter.sse'
+    assert tree.get_map('NEWMAP') is None
+    assert tree.get_scripts('D01P11A', 'sse', 'enter.sse') == ['enter00.ssb', 'enter01.ssb']
+    assert tree.get_scripts('D01P11A', 'ssa', 'm01a0102.ssa') == ['m01a0102.ssb']
+    assert tree.get_scripts('D01P11A', 'sss', 'sub01.sss') == ['sub0100.ssb', 'sub0101.ssb']
+    with pytest.raises(ValueError):
+        tree.get_scripts('D01P11A', 'xyz', 'other.xyz')
+
+
+def test_add_scripts():
+    tree = create_tree()
+
+    tree.add_script('D01P11A', 'sss', 'sub01.sss', 'sub0102.ssb')
+    tree.add_script('D01P11A', 'sse', 'enter.sse', 'enter02.ssb')
+    # Adding twice does nothing.
+    tree.add_script('D01P11A', 'sss', 'sub01.sss', 'sub0102.ssb')
+
+    assert tree.get_scripts('D01P11A', 'sss', 'sub01.sss') == ['sub0100.ssb', 'sub0101.ssb', 'sub0102.ssb']
+    assert tree.get_map('D01P11A')['enter_ssbs'] == ['enter00.ssb', 'enter01.ssb', 'enter02.ssb']
+
+    with pytest.raises(ValueError):
+        tree.add_script('D01P11A', 'ssa', 'm01a0101.ssa', 'other.ssb')
+    assert tree.get_scripts('D01P11A', 'ssa', 'm01a0101.ssa') == ['m01a0101.ssb']
@@ -0,0 +1,135 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import pytest
+try:
+    from PIL import Image
+except ImportError:
+    from pil import Image
+
+pytest.importorskip('skytemple_tilequant')
+from skytemple.module.portrait.sprite_bot_sheet import SpriteBotSheet, PORTRAIT_SIZE, PORTRAIT_TILE_X, \
+    PORTRAIT_TILE_Y
+
+OPAQUE = (200, 100, 50, 255)
+
+
+def create_sheet(cells, tiles_x=PORTRAIT_TILE_X, tiles_y=PORTRAIT_TILE_Y):
+    """Creates a sheet with fully opaque portraits at the given (x, y) cells."""
+    img = Image.new('RGBA', (tiles_x * PORTRAIT_SIZE, tiles_y * PORTRAIT_SIZE), (0, 0, 0, 0))
+    for x, y in cells:
+        img.paste(OPAQUE, (x * PORTRAIT_SIZE, y * PORTRAIT_SIZE, (x + 1) * PORTRAIT_SIZE, (y + 1) * PORTRAIT_SIZE))
+    return img
+
+
+def verify(img):
+    return SpriteBotSheet._verify_portraits(img, lambda i: f'emotion{i}')
+
+
+def test_valid_sheet():
+    halfway = PORTRAIT_TILE_Y // 2
+    cells = [(0, 0), (2, 1), (4, 3)]
+    occupied = verify(create_sheet(cells + [(x, y + halfway) for x, y in cells]))
+
+    for x in range(PORTRAIT_TILE_X):
+        for y in range(PORTRAIT_TILE_Y):
+            assert occupied[x][y] == ((x, y % halfway) in cells)
+
+
+def test_valid_sheet_without_flipped_portraits():
+    occupied = verify(create_sheet([(0, 0), (1, 0)]))
+
+    assert occupied[0][0] and occupied[1][0]
+    assert not occupied[0][PORTRAIT_TILE_Y // 2]
+
+
+def test_smaller_sheet():
+    occupied = verify(create_sheet([(0, 0)], tiles_x=2, tiles_y=1))
+
+    assert occupied[0][0] is True
+    assert occupied[1][0] is False
+    # Cells outside of the sheet are None.
+    assert occupied[2][0] is None
+    assert occupied[0][1] is None
+
+
+def test_palette_image():
+    img = create_sheet([(0, 0)], tiles_x=1, tiles_y=1).convert('RGB').convert('P')
+
+    assert verify(img)[0][0] is True
+
+
+@pytest.mark.parametrize('size', [(PORTRAIT_SIZE + 1, PORTRAIT_SIZE), (PORTRAIT_SIZE, PORTRAIT_SIZE * 2 - 1)])
+def test_size_not_divisible(size):
+    with pytest.raises(ValueError, match='Not divisble by'):
+        verify(Image.new('RGBA', size))
+
+
+@pytest.mark.parametrize('tiles', [(PORTRAIT_TILE_X + 1, 1), (1, PORTRAIT_TILE_Y + 1)])
+def test_size_exceeding_max(tiles):
+    with pytest.raises(ValueError, match='exceeding max'):
+        verify(Image.new('RGBA', (tiles[0] * PORTRAIT_SIZE, tiles[1] * PORTRAIT_SIZE)))
+
+
+def test_semi_transparent_pixels():
+    img = create_sheet([(0, 0), (1, 0)])
+    img.putpixel((3, 5), (200, 100, 50, 128))
+    img.putpixel((PORTRAIT_SIZE + 7, 2), (200, 100, 50, 1))
+
+    with pytest.raises(ValueError) as exc:
+        verify(img)
+    assert str(exc.value) == f'Semi-transparent pixels found at: {[(3, 5), (PORTRAIT_SIZE + 7, 2)]}'
+
+
+def test_semi_transparent_pixels_are_reported_before_transparent_cells():
+    img = create_sheet([(0, 0)])
+    img.putpixel((0, 1), (200, 100, 50, 128))
+    img.putpixel((1, 0), (0, 0, 0, 0))
+    img.putpixel((2, 0), (200, 100, 50, 128))
+
+    # Pixels are checked column by column, until the first one that differs from the first pixel.
+    with pytest.raises(ValueError, match=r'Semi-transparent pixels found at: \[\(0, 1\)\]$'):
+        verify(img)
+
+
+def test_partly_transparent_cells():
+    img = create_sheet([(0, 0), (1, 0), (0, 4)])
+    # Top left pixel transparent, rest opaque
+    img.putpixel((PORTRAIT_SIZE, 0), (0, 0, 0, 0))
+    # Opaque pixel in an otherwise transparent cell
+    img.putpixel((2 * PORTRAIT_SIZE + 10, PORTRAIT_SIZE + 20), OPAQUE)
+
+    with pytest.raises(ValueError) as exc:
+        verify(img)
+    assert str(exc.value) == f"The following emotions have transparent pixels: {['emotion2', 'emotion14']}"
+
+
+def test_flipped_portraits_without_originals():
+    halfway = PORTRAIT_TILE_Y // 2
+    img = create_sheet([(0, 0), (0, halfway), (1, halfway), (3, 1 + halfway)])
+
+    with pytest.raises(ValueError) as exc:
+        verify(img)
+    assert str(exc.value) == \
+        f"File should have original and flipped versions of emotions: {['emotion3', 'emotion17']}"
+
+
+@pytest.mark.benchmark
+def test_benchmark_verify_full_sheet(measure):
+    """Verifying a full sheet with 40 portraits."""
+    img = create_sheet([(x, y) for x in range(PORTRAIT_TILE_X) for y in range(PORTRAIT_TILE_Y)])
+    duration = measure(lambda: verify(img))
+    print(f'\nVerifying a full SpriteBot sheet: {duration * 1000:.2f}ms')
@@ -0,0 +1,130 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import random
+
+import pytest
+try:
+    from PIL import Image, ImageFilter
+except ImportError:
+    from pil import Image, ImageFilter
+
+pytest.importorskip('gi')
+pytest.importorskip('cairo')
+# Also needs a skytemple_rust matching skytemple_files.
+sprite_provider = pytest.importorskip('skytemple.core.sprite_provider', exc_type=ImportError)
+from skytemple.core.ui_utils import data_dir
+
+# The per pixel reference implementation uses getdata, which newer Pillow versions deprecate.
+pytestmark = pytest.mark.filterwarnings('ignore:Image.Image.getdata:DeprecationWarning')
+
+# Number of actors and the number of different sprites they use as stand-ins.
+NUMBER_ACTORS = 400
+NUMBER_SPRITES = 60
+
+
+def create_provider():
+    """A SpriteProvider that can only generate placeholders."""
+    provider = sprite_provider.SpriteProvider.__new__(sprite_provider.SpriteProvider)
+    provider._stripes = Image.open(os.path.join(data_dir(), 'stripes.png'))
+    provider._stripes_tiled = provider._stripes.convert('RGBA')
+    return provider
+
+
+def create_sprite(seed, width, height):
+    """A sprite with random colors, that is partly transparent."""
+    rand = random.Random(seed)
+    sprite = Image.frombytes('RGBA', (width, height), rand.randbytes(width * height * 4))
+    sprite.putalpha(sprite.getchannel('A').point(lambda v: 255 if v > 96 else 0))
+    return sprite
+
+
+def make_placeholder_per_pixel(stripes, sprite_img):
+    """How placeholders were generated before, pixel by pixel."""
+    alpha_sprite = sprite_img.getchannel('A')
+
+    im_outline = sprite_img.filter(ImageFilter.FIND_EDGES)
+    alpha_outline = im_outline.getchannel('A')
+
+    out_sprite = Image.new('RGBA', im_outline.size)
+    for i in range(0, out_sprite.width, stripes.width):
+        for j in range(0, out_sprite.height, stripes.height):
+            out_sprite.paste(stripes, (i, j))
+
+    im_outline = Image.new('RGBA', im_outline.size, color='white')
+    out_sprite.paste(im_outline, (0, 0, im_outline.width, im_outline.height), alpha_outline)
+
+    out_sprite.putalpha(alpha_sprite)
+    data = out_sprite.getdata()
+    new_data = []
+    for item in data:
+        if item[0] > 200 and item[1] < 200 and item[2] < 200:
+            new_data.append((255, 255, 255, 0))
+        else:
+            new_data.append(item)
+    out_sprite.putdata(new_data)
+    return out_sprite
+
+
+@pytest.mark.parametrize('size', [(8, 8), (40, 56), (97, 33), (200, 150)])
+def test_make_placeholder_matches_per_pixel(size):
+    provider = create_provider()
+    sprite = create_sprite(size[0] * size[1], *size)
+
+    placeholder = provider._make_placeholder(sprite)
+    assert placeholder.mode == 'RGBA'
+    assert placeholder.size == size
+    assert placeholder.tobytes() == make_placeholder_per_pixel(provider._stripes, sprite).tobytes()
+
+
+def test_make_placeholder_after_bigger_placeholder():
+    # The tiled stripes of a bigger placeholder are re-used for smaller ones.
+    provider = create_provider()
+    provider._make_placeholder(create_sprite(1, 200, 150))
+    sprite = create_sprite(2, 40, 56)
+
+    assert provider._make_placeholder(sprite).tobytes() == \
+        make_placeholder_per_pixel(provider._stripes, sprite).tobytes()
+
+
+def test_get_stripes():
+    provider = create_provider()
+    stripes = provider._stripes.convert('RGBA')
+
+    tiled = provider._get_stripes(stripes.width * 2 + 3, stripes.height + 1)
+    assert tiled.size == (stripes.width * 2 + 3, stripes.height + 1)
+    for x, y in ((0, 0), (stripes.width, 0), (stripes.width * 2 + 2, stripes.height)):
+        assert tiled.getpixel((x, y)) == stripes.getpixel((x % stripes.width, y % stripes.height))
+    # Smaller sizes are cropped from the already tiled stripes.
+    assert provider._get_stripes(3, 2).tobytes() == stripes.crop((0, 0, 3, 2)).tobytes()
+
+
+@pytest.mark.benchmark
+def test_benchmark_actor_placeholders(measure):
+    """
+    Generating the placeholders of 400 actors with 60 different stand-in sprites: Pixel by pixel vs. with band
+    operations, for every actor and once per sprite (like the placeholder cache of the SpriteProvider).
+    """
+    provider = create_provider()
+    sprites = [create_sprite(i, 24 + i % 5 * 16, 32 + i % 3 * 16) for i in range(NUMBER_SPRITES)]
+    actor_sprites = [sprites[i % NUMBER_SPRITES] for i in range(NUMBER_ACTORS)]
+
+    per_pixel = measure(lambda: [make_placeholder_per_pixel(provider._stripes, s) for s in actor_sprites], 3)
+    band_ops = measure(lambda: [provider._make_placeholder(s) for s in actor_sprites], 3)
+    cached = measure(lambda: [provider._make_placeholder(s) for s in sprites], 3)
+    print(f'\nPlaceholders for {NUMBER_ACTORS} actors: per pixel {per_pixel * 1000:.1f}ms, '
+          f'band operations {band_ops * 1000:.1f}ms, once per sprite {cached * 1000:.1f}ms')
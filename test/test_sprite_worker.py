@@ -0,0 +1,89 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+from ndspy.rom import NintendoDSRom
+try:
+    from PIL import Image
+except ImportError:
+    from pil import Image
+
+from skytemple.core.worker_pool import WorkerPool
+
+# Also needs a skytemple_rust matching skytemple_files.
+sprite_worker = pytest.importorskip('skytemple.core.sprite_worker', exc_type=ImportError)
+from skytemple_files.common.util import MONSTER_BIN
+from skytemple_files.container.bin_pack.handler import BinPackHandler
+
+
+def test_decoding_workers_started_from_entry_point_dont_import_gtk(skytemple_entry_point, spawn_worker_from):
+    main_file, modules = spawn_worker_from(skytemple_entry_point, 'skytemple.core.sprite_worker')
+
+    assert main_file == skytemple_entry_point
+    assert 'skytemple.core.sprite_worker' in modules
+    assert 'gi' not in modules
+    assert 'skytemple_ssb_debugger' not in modules
+    assert 'skytemple.core.sprite_provider' not in modules
+
+
+@pytest.fixture
+def compressed_sprites(eos_rom_path):
+    rom = NintendoDSRom.fromFile(eos_rom_path)
+    monster_bin = BinPackHandler.deserialize(rom.getFileByName(MONSTER_BIN))
+    return [bytes(monster_bin[i]) for i in range(1, 65)]
+
+
+def test_decode_monster_sprite_in_worker(compressed_sprites):
+    pool = WorkerPool(1)
+    try:
+        raw_img, cx, cy, w, h = pool.submit(sprite_worker.decode_monster_sprite, compressed_sprites[0], 1).result()
+    finally:
+        pool.shutdown()
+
+    expected = sprite_worker.decode_monster_sprite(compressed_sprites[0], 1)
+    assert (raw_img, cx, cy, w, h) == expected
+    assert Image.frombytes('RGBA', (w, h), raw_img).size == (w, h)
+
+
+@pytest.mark.benchmark
+def test_benchmark_decode_monster_sprites(compressed_sprites, measure):
+    """Decoding 64 monster sprites in this process vs. in 1, 2 and 4 worker processes (already started)."""
+    def decode_in_process():
+        for sprite in compressed_sprites:
+            sprite_worker.decode_monster_sprite(sprite, 1)
+
+    results = {0: measure(decode_in_process, 3)}
+    for workers in (1, 2, 4):
+        pool = WorkerPool(workers)
+        try:
+            # Start the worker processes first.
+            for future in [pool.submit(sprite_worker.decode_monster_sprite, compressed_sprites[0], 1)
+                           for _ in range(workers)]:
+                future.result()
+
+            def decode_in_pool():
+                for future in [pool.submit(sprite_worker.decode_monster_sprite, sprite, 1)
+                               for sprite in compressed_sprites]:
+                    future.result()
+
+            results[workers] = measure(decode_in_pool, 3)
+        finally:
+            pool.shutdown()
+    print('\nDecoding 64 monster sprites: ' + ', '.join(
+        f'{workers} workers {duration * 1000:.1f}ms' if workers > 0 else f'in process {duration * 1000:.1f}ms'
+        for workers, duration in results.items()
+    ))
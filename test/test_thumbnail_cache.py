@@ -0,0 +1,144 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import os
+
+import pytest
+try:
+    from PIL import Image
+except ImportError:
+    from pil import Image
+
+from skytemple.core.thumbnail_cache import ThumbnailCache, THUMBNAIL_HEADER
+
+GAME_ID = b'C2SEPOKEDUN_SORA'
+
+
+def create_image(color):
+    return Image.new('RGBA', (40, 40), color)
+
+
+class Decoder:
+    """Decodes images (like the sprite and portrait providers) and counts how often it had to."""
+    def __init__(self, cache: ThumbnailCache):
+        self.cache = cache
+        self.decoded = 0
+
+    def get(self, source: bytes) -> Image.Image:
+        content_hash = self.cache.content_hash(source)
+        cached = self.cache.get('test_v1', content_hash, '0')
+        if cached is not None:
+            return cached[0]
+        self.decoded += 1
+        img = create_image((source[0], source[1], source[2], 255))
+        self.cache.put('test_v1', content_hash, '0', img)
+        return img
+
+
+def test_put_and_get(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), GAME_ID)
+    img = create_image((1, 2, 3, 4))
+    cache.put('ns', 'hash', 'key', img, 5, -6)
+
+    cached_img, x, y = cache.get('ns', 'hash', 'key')
+    assert cached_img.tobytes() == img.tobytes()
+    assert (x, y) == (5, -6)
+    assert cache.get('ns', 'hash', 'other') is None
+    assert cache.get('other', 'hash', 'key') is None
+
+
+def test_new_session_is_served_from_disk(tmp_path):
+    first = Decoder(ThumbnailCache(str(tmp_path), GAME_ID))
+    sources = [bytes([i, i, i]) for i in range(10)]
+    images = [first.get(source) for source in sources]
+    assert first.decoded == 10
+
+    # Like the providers of the next session (or of another project of the same game).
+    second = Decoder(ThumbnailCache(str(tmp_path), GAME_ID))
+    for source, img in zip(sources, images):
+        assert second.get(source).tobytes() == img.tobytes()
+    assert second.decoded == 0
+
+
+def test_modified_source_data_is_decoded_again(tmp_path):
+    first = Decoder(ThumbnailCache(str(tmp_path), GAME_ID))
+    first.get(b'\x01\x01\x01')
+
+    # A ROM hack of the same game with a changed image.
+    second = Decoder(ThumbnailCache(str(tmp_path), GAME_ID))
+    assert second.get(b'\x02\x02\x02').getpixel((0, 0)) == (2, 2, 2, 255)
+    assert second.decoded == 1
+
+
+def test_other_games_do_not_share_entries(tmp_path):
+    Decoder(ThumbnailCache(str(tmp_path), GAME_ID)).get(b'\x01\x01\x01')
+    other = Decoder(ThumbnailCache(str(tmp_path), b'C2SPPOKEDUN_SORA'))
+    other.get(b'\x01\x01\x01')
+    assert other.decoded == 1
+
+
+def test_corrupt_entries_are_misses(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), GAME_ID)
+    cache.put('ns', 'hash', 'key', create_image((1, 2, 3, 4)))
+    with open(cache._path('ns', 'hash', 'key'), 'wb') as f:
+        f.write(b'\x00')
+
+    assert cache.get('ns', 'hash', 'key') is None
+
+
+def test_least_recently_used_entries_are_removed(tmp_path):
+    entry_size = THUMBNAIL_HEADER.size + 40 * 40 * 4
+    cache = ThumbnailCache(str(tmp_path), GAME_ID, max_size=entry_size * 3)
+    for i in range(3):
+        cache.put('ns', str(i), '', create_image((i, 0, 0, 255)))
+    # 0 was used last, 1 is now the least recently used entry.
+    path = cache._path('ns', '0', '')
+    os.utime(path, (os.path.getmtime(path) + 10,) * 2)
+    os.utime(cache._path('ns', '2', ''), (os.path.getmtime(path) + 5,) * 2)
+
+    cache.put('ns', '3', '', create_image((3, 0, 0, 255)))
+
+    assert cache.get('ns', '1', '') is None
+    for i in (0, 2, 3):
+        assert cache.get('ns', str(i), '') is not None
+
+
+def test_portrait_provider_new_session_is_served_from_disk(tmp_path):
+    pytest.importorskip('gi')
+    pytest.importorskip('cairo')
+    from skytemple.module.portrait.portrait_provider import PortraitProvider
+
+    class FakeKaoImage:
+        decoded = 0
+
+        def __init__(self, i):
+            self.pal_data = bytes([i]) * 48
+            self.compressed_img_data = bytes([i]) * 100
+
+        def get(self):
+            FakeKaoImage.decoded += 1
+            return Image.new('P', (40, 40), 1)
+
+    kaos = [FakeKaoImage(i) for i in range(5)]
+    first = PortraitProvider(None, ThumbnailCache(str(tmp_path), GAME_ID))
+    for kao in kaos:
+        first._get_rgba(kao)
+    assert FakeKaoImage.decoded == 5
+
+    second = PortraitProvider(None, ThumbnailCache(str(tmp_path), GAME_ID))
+    for kao in kaos:
+        assert second._get_rgba(kao).size == (40, 40)
+    assert FakeKaoImage.decoded == 5
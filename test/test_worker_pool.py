@@ -0,0 +1,149 @@
+#  Copyright 2020 Parakoopa
+#
+#  This file is part of SkyTemple.
+#
+#  SkyTemple is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  SkyTemple is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with SkyTemple.  If not, see <https://www.gnu.org/licenses/>.
+import multiprocessing
+import os
+import pickle
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from skytemple.core.save_worker import serialize_pickled_model
+from skytemple.core import worker_pool
+from skytemple.core.worker_pool import WorkerPool
+
+
+class FakeHandler:
+    """Serializes a list of ints, like a DataHandler."""
+    @classmethod
+    def serialize(cls, model, repeat=1, **kwargs):
+        data = b''
+        for _ in range(repeat):
+            data = bytes(x % 256 for x in model)
+        return data
+
+
+def worker_info():
+    return os.getpid(), sorted(sys.modules.keys())
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(2)
+    yield pool
+    pool.shutdown()
+
+
+def test_serialize_pickled_model(pool):
+    binary_data, duration = pool.submit(
+        serialize_pickled_model, FakeHandler, pickle.dumps([1, 2, 300]), {}
+    ).result()
+
+    assert binary_data == bytes([1, 2, 44])
+    assert duration >= 0
+
+
+def test_workers_dont_import_gtk(pool):
+    pool.submit(serialize_pickled_model, FakeHandler, pickle.dumps([1]), {}).result()
+    _, modules = pool.submit(worker_info).result()
+
+    assert 'skytemple.core.save_worker' in modules
+    assert 'gi' not in modules
+    assert 'skytemple.core.rom_project' not in modules
+
+
+def test_workers_started_from_entry_point_dont_import_gtk(skytemple_entry_point, spawn_worker_from):
+    main_file, modules = spawn_worker_from(skytemple_entry_point, 'skytemple.core.save_worker')
+
+    assert main_file == skytemple_entry_point
+    assert 'skytemple.core.save_worker' in modules
+    assert 'gi' not in modules
+    assert 'skytemple_ssb_debugger' not in modules
+    assert 'skytemple.core.settings' not in modules
+
+
+def test_pool_is_reused(pool):
+    pool.set_max_workers(1)
+    executor = pool.get_executor()
+    pid, _ = pool.submit(worker_info).result()
+
+    assert pool.get_executor() is executor
+    assert {pool.submit(worker_info).result()[0] for _ in range(4)} == {pid}
+
+
+def test_set_max_workers_restarts_pool(pool):
+    executor = pool.get_executor()
+    pool.set_max_workers(2)
+    assert pool.get_executor() is executor
+
+    pool.set_max_workers(1)
+    assert pool.get_executor() is not executor
+    assert pool.submit(worker_info).result()
+
+    pool.set_max_workers(0)
+    assert pool.get_executor() is None
+    with pytest.raises(ValueError):
+        pool.submit(worker_info)
+
+
+def test_no_workers_without_spawn_support(pool, monkeypatch):
+    # Python < 3.7 can only fork the worker processes.
+    monkeypatch.setattr(worker_pool, 'WORKER_PROCESSES_SUPPORTED', False)
+
+    assert pool.max_workers == 0
+    assert pool.get_executor() is None
+    with pytest.raises(ValueError):
+        pool.submit(worker_info)
+
+
+def test_shutdown_and_discard(pool):
+    executor = pool.get_executor()
+    pool.shutdown()
+    new_executor = pool.get_executor()
+    assert new_executor is not executor
+
+    pool.discard(executor)
+    assert pool.get_executor() is new_executor
+    pool.discard(new_executor)
+    assert pool.get_executor() is not new_executor
+
+
+@pytest.mark.benchmark
+def test_benchmark_save_pool(measure):
+    """Serializing 8 models in worker processes, starting a new pool on every save vs. a long-lived pool."""
+    models = [pickle.dumps(list(range(20000))) for _ in range(8)]
+    workers = min(len(models), os.cpu_count() or 1)
+
+    def save(executor):
+        futures = [executor.submit(serialize_pickled_model, FakeHandler, m, {'repeat': 20}) for m in models]
+        for future in futures:
+            future.result()
+
+    def save_new_pool():
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            save(executor)
+
+    pool = WorkerPool(workers)
+    try:
+        # Started on the first save.
+        first = measure(lambda: save(pool.get_executor()), 1)
+        new_pool = measure(save_new_pool, 3)
+        long_lived = measure(lambda: save(pool.get_executor()), 3)
+    finally:
+        pool.shutdown()
+    print(f'\nSerializing 8 models with {workers} workers: new pool per save {new_pool * 1000:.1f}ms, '
+          f'long-lived pool {long_lived * 1000:.1f}ms (first save {first * 1000:.1f}ms)')